@@ -1,15 +1,14 @@
 import os
-import time
-import shutil
 from lococode.actions.base import BaseTool
+from lococode.snapshots import get_snapshot_store
 
 class BackupTool(BaseTool):
-    """Slash command: /backup  — creates a backup of the current file."""
+    """Slash command: /backup  — snapshots the current file into the snapshot store."""
 
     def __init__(self):
         super().__init__()
         self.name = "backup"
-        self.description = "Create a copy of the current file in the same directory. Usage: /backup"
+        self.description = "Snapshot the current file (or show/prune the snapshot store). Usage: /backup [file|stats|prune]"
         self.pattern = r"/backup(?: *(.*))?"
         self.is_slash = True
         self.intent = "backup"
@@ -17,26 +16,34 @@ class BackupTool(BaseTool):
 
     def execute(self, match, context):
         target_file = context.get("target_file")
-        
+        store = get_snapshot_store(context)
+
         # If user explicitly provided a file to backup
         arg = match.group(1) if len(match.groups()) > 0 else None
-        if arg and arg.strip():
-            target = arg.strip()
-            if os.path.exists(target):
-                target_file = target
-                
+        arg = arg.strip() if arg else ""
+        if arg in ("stats", "prune"):
+            if arg == "prune":
+                dropped, freed = store.prune()
+                print(f"\033[32mPruned {dropped} version(s), freed {freed / 1024:.1f} KB.\033[0m")
+            stats = store.stats()
+            print(f"\033[90mSnapshots: {stats['versions']} version(s) of {stats['files']} file(s) in {stats['blobs']} blob(s), "
+                  f"{stats['bytes'] / 1024:.1f} KB stored ({stats['raw_bytes'] / 1024:.1f} KB uncompressed).\033[0m")
+            return True
+        if arg and os.path.exists(arg):
+            target_file = arg
+
         if not target_file or not os.path.exists(target_file):
             print(f"\033[31mError: No valid file to backup ({target_file}).\033[0m")
             return True
 
-        filename, ext = os.path.splitext(target_file)
-        timestamp = time.strftime("%Y%m%d_%H%M%S")
-        backup_file = f"{filename}_backup_{timestamp}{ext}"
-
         try:
-            shutil.copy2(target_file, backup_file)
-            print(f"\033[32mCreated backup of {os.path.basename(target_file)} at: {os.path.basename(backup_file)}\033[0m")
+            entry = store.snapshot(target_file, reason="backup")
+            versions = store.history(target_file)
+            if entry:
+                print(f"\033[32mSaved snapshot {entry['hash'][:8]} of {os.path.basename(target_file)} (version {len(versions)}).\033[0m")
+            else:
+                print(f"\033[33m{os.path.basename(target_file)} is unchanged since snapshot {versions[-1]['hash'][:8]}.\033[0m")
         except Exception as e:
             print(f"\033[31mError creating backup: {e}\033[0m")
-            
+
         return True
@@ -9,6 +9,8 @@ class BaseTool:
         self.is_slash = False # True for /commands, False for <tags>
         self.intent = None  # Planner intent this tool handles (e.g. "create_file", "file_switch")
         self.arg_description = None  # What argument the LLM should extract (e.g. "search query", "filename"), None if no args needed
+        self.arg_optional = False  # True if the tool also runs without its argument (e.g. /undo on the current file)
+        self.arg_file = None  # "exact", "existing", "any" or "new" if the arg is a filename to validate against the project index
 
     def execute(self, match, context):
         """
@@ -0,0 +1,33 @@
+import re
+from lococode.actions.base import BaseTool
+from lococode.context_budget import ContextBudget, calibration_ratio
+
+class BudgetTool(BaseTool):
+    """Slash command: /budget [tokens] — shows or sets the prompt token budget."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "budget"
+        self.description = "Show or set the prompt token budget used to fit /read context. Usage: /budget [tokens]"
+        self.pattern = r"^/budget(?: *(.*))?$"
+        self.is_slash = True
+        self.intent = None
+        self.arg_description = None
+
+    def execute(self, match, context):
+        budget = context.get('context_budget')
+        if budget is None:
+            budget = context['context_budget'] = ContextBudget()
+
+        arg = (match.group(1) or "").strip()
+        if arg:
+            if not re.match(r'^\d+$', arg):
+                print("\033[31mUsage: /budget [tokens]\033[0m")
+                return True
+            budget.max_tokens = int(arg)
+            print(f"\033[32mPrompt budget set to {budget.max_tokens} tokens.\033[0m")
+        else:
+            pending = len(context.get('search_results', []))
+            print(f"\033[36mPrompt budget: {budget.max_tokens} tokens | {pending} pending context section(s) | "
+                  f"estimate calibration x{calibration_ratio():.2f}\033[0m")
+        return True
@@ -0,0 +1,38 @@
+from lococode.actions.base import BaseTool
+
+class CacheTool(BaseTool):
+    """Slash command: /cache [on|off|clear|stats] — controls the deterministic completion cache."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "cache"
+        self.description = "Toggle or inspect the completion cache for repeated requests. Usage: /cache [on|off|clear|stats]"
+        self.pattern = r"^/cache(?: *(.*))?$"
+        self.is_slash = True
+        self.intent = None
+        self.arg_description = None
+
+    def execute(self, match, context):
+        cache = context.get('completion_cache')
+        if cache is None:
+            print("\033[31mError: Completion cache not available.\033[0m")
+            return True
+
+        arg = (match.group(1) or "").strip().lower()
+        if arg == "on":
+            cache.enabled = True
+            print("\033[32mCompletion cache enabled.\033[0m")
+        elif arg == "off":
+            cache.enabled = False
+            print("\033[33mCompletion cache disabled.\033[0m")
+        elif arg == "clear":
+            cache.clear()
+            print("\033[32mCompletion cache cleared.\033[0m")
+        elif arg in ("", "stats"):
+            stats = cache.stats()
+            state = "on" if stats['enabled'] else "off"
+            print(f"\033[36mCache: {state} | {stats['entries']} entries ({stats['bytes'] / 1024:.1f} KB) | "
+                  f"{stats['hits']} hits, {stats['misses']} misses\033[0m")
+        else:
+            print("\033[31mUsage: /cache [on|off|clear|stats]\033[0m")
+        return True
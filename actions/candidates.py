@@ -0,0 +1,34 @@
+from lococode.actions.base import BaseTool
+from lococode import candidates
+
+class CandidatesTool(BaseTool):
+    """Slash command: /candidates [N|off] — best-of-N code edits generated in parallel."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "candidates"
+        self.description = "Generate N code edit candidates in parallel and keep the one that applies and parses best. Usage: /candidates [N|off]"
+        self.pattern = r"^/candidates(?: *(.*))?$"
+        self.is_slash = True
+        self.intent = None
+        self.arg_description = None
+
+    def execute(self, match, context):
+        arg = (match.group(1) or "").strip().lower()
+        # Kept in the session context, not the module settings, so daemon clients do not change each other's N
+        if not arg:
+            n = candidates.count_for(context)
+            if n > 1:
+                temperatures = ", ".join(str(t) for t, _ in candidates.sampling_for(n))
+                print(f"\033[36mBest of {n} (temperatures {temperatures}).\033[0m")
+            else:
+                print("\033[36mOne candidate per edit.\033[0m")
+        elif arg in ("off", "1"):
+            context["candidates"] = 1
+            print("\033[33mOne candidate per edit.\033[0m")
+        elif arg.isdigit() and 1 < int(arg) <= candidates.MAX_N:
+            context["candidates"] = int(arg)
+            print(f"\033[32mCode edits will request {arg} candidates in parallel (needs free parallel slots on the server).\033[0m")
+        else:
+            print(f"\033[31mUsage: /candidates [2-{candidates.MAX_N}|off]\033[0m")
+        return True
@@ -1,4 +1,5 @@
 import os
+import re
 from lococode.actions.base import BaseTool
 
 
@@ -13,6 +14,7 @@ class CreateFileTool(BaseTool):
         self.is_slash = True
         self.intent = "create_file"
         self.arg_description = "filename to create"
+        self.arg_file = "new"
 
     def execute(self, match, context):
         filename = match.group(1).strip()
@@ -93,6 +95,8 @@ class CreateFileTag(BaseTool):
         try:
             # Create directories if needed
             os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+            if os.path.exists(filename) and 'save_backup' in context:
+                context['save_backup'](context, filename, reason="overwrite")
             with open(filename, "w", encoding="utf-8") as f:
                 f.write(content)
             print(f"\033[32m[create_file] Created {filename} with {len(content)} bytes\033[0m")
@@ -10,13 +10,14 @@ class DeleteFileTool(BaseTool):
         self.is_slash = True
         self.intent = "delete_file"
         self.arg_description = "filename to delete"
+        self.arg_file = "exact"
 
     def execute(self, match, context):
         file_to_del = match.group(1).strip()
         if os.path.exists(file_to_del):
             # Save backup before deletion
             if 'save_backup' in context:
-                context['save_backup'](context, file_to_del)
+                context['save_backup'](context, file_to_del, reason="delete")
             
             try:
                 os.remove(file_to_del)
@@ -0,0 +1,48 @@
+from lococode.actions.base import BaseTool
+from lococode import edit_formats
+from lococode.context_budget import estimate_tokens
+
+class EditFormatTool(BaseTool):
+    """Slash command: /format [auto|<format>|stats] — shows, forces or reports on the edit format."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "edit_format"
+        self.description = "Show or force the edit format, or show per-format token stats. Usage: /format [auto|search_replace|udiff|lines|whole|stats]"
+        self.pattern = r"^/format(?: *(.*))?$"
+        self.is_slash = True
+        self.intent = None
+        self.arg_description = None
+
+    def execute(self, match, context):
+        arg = (match.group(1) or "").strip().lower()
+        settings = edit_formats.settings
+        if not arg:
+            print(f"\033[36mEdit format: {settings['format']}\033[0m")
+            target_file = context.get("target_file")
+            if settings["format"] == "auto" and target_file:
+                try:
+                    with open(target_file, "r", encoding="utf-8") as f:
+                        content = f.read()
+                    fmt = edit_formats.choose_format(content, session=bool(context.get("session_mode")))
+                    print(f"\033[90m{target_file}: {estimate_tokens(content)} tokens -> {fmt.name} for local edits\033[0m")
+                except OSError:
+                    pass
+        elif arg == "auto":
+            settings["format"] = "auto"
+            print("\033[32mEdit format chosen per edit from file and change size.\033[0m")
+        elif arg == "stats":
+            stats = edit_formats.summarize()
+            if not stats:
+                print("\033[33mNo edits recorded yet.\033[0m")
+                return True
+            print(f"\033[36m{'format':<16}{'edits':>7}{'success':>9}{'changes':>9}{'tok/change':>12}{'avg file':>10}\033[0m")
+            for name, s in sorted(stats.items()):
+                per_change = f"{s['tokens_per_change']:.0f}" if s["tokens_per_change"] is not None else "-"
+                print(f"{name:<16}{s['edits']:>7}{s['success_rate']:>8.0%} {s['changes']:>9}{per_change:>12}{s['avg_file_tokens']:>10.0f}")
+        elif edit_formats.resolve(arg):
+            settings["format"] = edit_formats.resolve(arg).name
+            print(f"\033[32mCode edits will use {edit_formats.resolve(arg).label}.\033[0m")
+        else:
+            print(f"\033[31mUnknown format '{arg}'. Choose from: auto, {', '.join(edit_formats.FORMATS)}, stats\033[0m")
+        return True
@@ -10,6 +10,7 @@ class FileSwitchTool(BaseTool):
         self.is_slash = True
         self.intent = "file_switch"
         self.arg_description = "filename to switch to"
+        self.arg_file = "any"
 
     def execute(self, match, context):
         new_file = match.group(1).strip()
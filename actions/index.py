@@ -0,0 +1,48 @@
+import time
+from lococode.actions.base import BaseTool
+from lococode.search_index import get_search_index
+
+class IndexTool(BaseTool):
+    """Slash command: /index [on|off|rebuild|<query>] — project search index and automatic context."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "index"
+        self.description = "Search the project index, or toggle automatic context snippets for edits. Usage: /index [on|off|rebuild|<query>]"
+        self.pattern = r"^/index(?: *(.*))?$"
+        self.is_slash = True
+        self.intent = None
+        self.arg_description = None
+
+    def execute(self, match, context):
+        index = get_search_index(context)
+        if index is None:
+            print("\033[31mError: Project index not available.\033[0m")
+            return True
+
+        arg = (match.group(1) or "").strip()
+        if arg.lower() == "on":
+            start = time.perf_counter()
+            changes = index.update()
+            index.save()
+            context['auto_context'] = True
+            print(f"\033[32mAutomatic context on ({len(index.files)} files, {changes} updated in {time.perf_counter() - start:.2f}s).\033[0m")
+        elif arg.lower() == "off":
+            context['auto_context'] = False
+            print("\033[33mAutomatic context off.\033[0m")
+        elif arg.lower() == "rebuild":
+            start = time.perf_counter()
+            index.rebuild()
+            print(f"\033[32mRebuilt index: {len(index.files)} files, {len(index.chunks)} chunks in {time.perf_counter() - start:.2f}s.\033[0m")
+        elif arg:
+            index.update()
+            start = time.perf_counter()
+            results = index.search(arg, k=10)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            for score, rel, first, last in results:
+                print(f"  \033[92m{score:6.2f}\033[0m {rel}:{first}-{last}")
+            print(f"\033[90m({len(results)} results in {elapsed_ms:.1f} ms)\033[0m")
+        else:
+            state = "on" if context.get('auto_context') else "off"
+            print(f"\033[36mAutomatic context: {state} | {len(index.files)} files, {len(index.chunks)} chunks, {len(index.postings)} terms indexed\033[0m")
+        return True
@@ -1,35 +1,121 @@
+import os
 import re
+import shutil
+import threading
 from lococode.actions.base import BaseTool
+from lococode import tracing
+from lococode import checks
+from lococode import snapshots
+from lococode.cancellation import CancelToken
+from lococode.engine import EditRequest
+
+SPECULATIVE_DIR = os.path.join(".lococode", "speculative")
+
+OPTION_RES = [
+    ("count", re.compile(r"^(\d+)(?:\s+|$)")),
+    ("check", re.compile(r"^--check\s+(?:\"([^\"]*)\"|'([^']*)'|(\S+))(?:\s+|$)")),
+    ("timeout", re.compile(r"^--timeout\s+(\d+(?:\.\d+)?)(?:\s+|$)")),
+    ("speculate", re.compile(r"^--speculate(?:\s+|$)")),
+]
+
+
+def parse_args(full_args):
+    """Leading options of /loop, in any order, then the specifications."""
+    options = {"count": 3, "check": None, "timeout": checks.DEFAULT_TIMEOUT, "speculate": False}
+    rest = full_args.strip()
+    matched = True
+    while matched and rest:
+        matched = False
+        for name, regex in OPTION_RES:
+            m = regex.match(rest)
+            if not m:
+                continue
+            if name == "count":
+                options["count"] = int(m.group(1))
+            elif name == "check":
+                options["check"] = next(g for g in m.groups() if g is not None)
+            elif name == "timeout":
+                options["timeout"] = float(m.group(1))
+            else:
+                options["speculate"] = True
+            rest = rest[m.end():].strip()
+            matched = True
+            break
+    options["specifications"] = rest
+    return options
+
+
+def failure_instruction(specifications, failure):
+    status = f"timed out after {failure.seconds:.0f}s" if failure.timed_out else f"exit code {failure.returncode}"
+    return (f"{specifications}\n\nThe check `{failure.command}` fails ({status}):\n"
+            f"```\n{checks.trim_output(failure.output) or '(no output)'}\n```\n"
+            f"Fix the code so the check passes.")
+
+
+class _Speculation:
+    """Generates the next iteration on a scratch copy of the file while the check runs.
+
+    Its prompt assumes the check fails exactly as it did last time, so it is only
+    used when it does; otherwise it is cancelled.
+    """
+
+    def __init__(self, context, target_file, instruction):
+        self.context = context
+        self.target_file = target_file
+        self.instruction = instruction
+        self.path = os.path.join(SPECULATIVE_DIR, os.path.basename(target_file))
+        self.token = CancelToken()
+        self.result = None
+        self.deferred_tags = []  # Tag tools in the speculative reply; run only if it is adopted
+        self.thread = threading.Thread(target=self._run, daemon=True, name="loop-speculation")
+
+    def start(self):
+        os.makedirs(SPECULATIVE_DIR, exist_ok=True)
+        shutil.copyfile(self.target_file, self.path)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        # No snapshots or edit session for the scratch copy; the real file is snapshotted on adoption
+        scratch = dict(self.context, save_backup=lambda *args, **kwargs: None, session_mode=False, search_results=[],
+                       deferred_tags=self.deferred_tags)
+        request = EditRequest(self.path, self.instruction, plan="code_edit",
+                              model=None if self.context.get('model_router') else self.context.get('model_id'))
+        with tracing.span("loop_speculation", cat="command", file=self.target_file):
+            self.result = self.context['engine'].edit(request, context=scratch, cancel_token=self.token)
+
+    def cancel(self):
+        self.token.cancel("superseded")
+
+    def content(self):
+        """The speculated file content, or None if the generation did not apply."""
+        self.thread.join()
+        if self.result is None or self.result.status != "applied":
+            return None
+        with open(self.path, "r", encoding="utf-8") as f:
+            return f.read()
+
 
 class LoopTool(BaseTool):
-    """Slash command: /loop [count] <specs> — iterates multiple times to refine code."""
+    """Slash command: /loop [count] [--check CMD] <specs> — iterates multiple times to refine code."""
 
     def __init__(self):
         super().__init__()
         self.name = "loop"
-        self.description = "Iterate on code multiple times (default 3). Usage: /loop [count] <specs>"
+        self.description = ("Iterate on code multiple times (default 3); with --check, run CMD after each iteration, "
+                            "feed its failures back and stop once it passes. "
+                            "Usage: /loop [count] [--check \"CMD\"] [--timeout S] [--speculate] <specs>")
         self.pattern = r"^/loop\s+(.+)$"
         self.is_slash = True
         self.intent = "loop"
         self.arg_description = "iteration count (optional) and specifications"
 
     def execute(self, match, context):
-        full_args = match.group(1).strip()
-        
-        # Default defaults
-        count = 3
-        specifications = full_args
-
-        # Check if the first word is a number
-        # Matches "5 some specs" or just "5" (though specs are required below)
-        count_match = re.match(r'^(\d+)\s+(.+)$', full_args, re.DOTALL)
-        if count_match:
-            try:
-                count = int(count_match.group(1))
-                specifications = count_match.group(2).strip()
-            except ValueError:
-                pass # Fallback to default
-        
+        options = parse_args(match.group(1))
+        count = options["count"]
+        specifications = options["specifications"]
+        check = options["check"]
+
         if not specifications:
             print("\033[31mError: Please provide specifications for the loop.\033[0m")
             return True
@@ -42,29 +128,94 @@ class LoopTool(BaseTool):
         registry = context['registry']
         model_id = context['model_id']
         target_file = context['target_file']
+        speculate = options["speculate"] and check and context.get('engine') is not None and not context.get('session_mode')
+        if options["speculate"] and not speculate:
+            print("\033[33m--speculate needs --check and is off in session mode; continuing without it.\033[0m")
+
+        failure = None
+        if check:
+            failure = self._run_check(check, options["timeout"])
+            if failure.passed:
+                print("\033[90m(The check already passes; iterating on the specifications.)\033[0m")
+                failure = None
 
-        for i in range(count):
+        speculated = None
+        speculated_tags = []
+        i = 0
+        while i < count:
             print(f"\033[92m\n--- Loop Iteration {i+1}/{count} ---\033[0m")
-            imp_inst = specifications if i == 0 else f"Iterate on and improve the code further: {specifications}"
-            
-            # call apply_edit with verbose=True to show progress
-            success = apply_edit(
-                target_file, 
-                imp_inst, 
-                model_id, 
-                registry, 
-                context, 
-                verbose=True
-            )
-            
+            if failure is not None:
+                imp_inst = failure_instruction(specifications, failure)
+            else:
+                imp_inst = specifications if i == 0 else f"Iterate on and improve the code further: {specifications}"
+
+            with tracing.span("loop_iteration", cat="command", iteration=i + 1, of=count, speculated=speculated is not None):
+                if speculated is not None:
+                    context.get('save_backup', snapshots.save_backup)(context, target_file)
+                    with open(target_file, 'w', encoding='utf-8') as f:
+                        f.write(speculated)
+                    print(f"\033[32mThe check failed the same way; applied the iteration generated while it ran.\033[0m")
+                    for tool, tag_match in speculated_tags:
+                        with tracing.span(f"tool:{tool.name}", cat="tool"):
+                            tool.execute(tag_match, context)
+                    speculated = None
+                    success = True
+                else:
+                    # call apply_edit with verbose=True to show progress
+                    success = apply_edit(
+                        target_file,
+                        imp_inst,
+                        model_id,
+                        registry,
+                        context,
+                        verbose=True,
+                        # Check-driven iterations are code edits; skipping the planner keeps them comparable
+                        preplanned_intent="code_edit" if check else None
+                    )
+
             if not success:
                 break
-            
-            # If HTML file, open in browser using the browser_open tool
-            if target_file.lower().endswith('.html'):
-                browser_tool = next((t for t in registry.tools if t.name == 'browser_open'), None)
-                if browser_tool:
-                    print(f"\033[90m(Auto-opening {target_file} in browser...)\033[0m")
-                    browser_tool.execute(None, context)
-        
+            i += 1
+
+            if not check:
+                # If HTML file, open in browser using the open_current_html tool
+                if target_file.lower().endswith(('.html', '.htm')):
+                    browser_tool = next((t for t in registry.tools if t.name == 'open_current_html'), None)
+                    if browser_tool:
+                        print(f"\033[90m(Auto-opening {target_file} in browser...)\033[0m")
+                        browser_tool.execute(None, context)
+                continue
+
+            speculation = None
+            if speculate and failure is not None and i < count:
+                speculation = _Speculation(context, target_file, failure_instruction(specifications, failure)).start()
+            result = self._run_check(check, options["timeout"])
+            if result.passed:
+                if speculation:
+                    speculation.cancel()
+                print(f"\033[32mCheck passed after {i} iteration(s).\033[0m")
+                break
+            if speculation:
+                if checks.same_failure(result, failure):
+                    speculated = speculation.content()
+                    speculated_tags = speculation.deferred_tags
+                else:
+                    speculation.cancel()
+            failure = result
+        else:
+            if check and failure is not None:
+                print(f"\033[33mThe check still fails after {count} iteration(s).\033[0m")
+
         return True
+
+    def _run_check(self, command, timeout):
+        print(f"\033[90mRunning check: {command}\033[0m")
+        with tracing.span("loop_check", cat="subprocess", command=command) as trace:
+            result = checks.run_check(command, timeout=timeout)
+            trace.set(returncode=result.returncode, timed_out=result.timed_out)
+        if result.passed:
+            print(f"\033[32mCheck passed ({result.summary()}).\033[0m")
+        else:
+            print(f"\033[31mCheck failed ({result.summary()}):\033[0m")
+            print(f"\033[90m{checks.trim_output(result.output, max_lines=20) or '(no output)'}\033[0m")
+        return result
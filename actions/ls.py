@@ -1,36 +1,45 @@
-import subprocess
 import os
 from lococode.actions.base import BaseTool
+from lococode.project_index import ProjectIndex
 
 class LsTool(BaseTool):
     def __init__(self):
         super().__init__()
         self.name = "ls"
-        self.description = "List all files in the same directory as cli.py. Usage: /ls"
+        self.description = "List files in the working directory (respects .gitignore). Usage: /ls [dir or pattern]"
         self.pattern = r"^/ls(?: *(.*))?"
         self.is_slash = True
         self.intent = "ls"
 
     def execute(self, match, context):
-        # We can get the project root by going up one level from this file's directory.
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        
-        # print(f"\033[34mListing files in: {project_root}\033[0m")
-        
+        index = context.get('project_index')
+        if index is None:
+            index = context['project_index'] = ProjectIndex(os.getcwd())
+
+        arg = (match.group(1) or "").strip() if match else ""
         try:
-            # Run 'dir' command on Windows, 'ls' on others
-            if os.name == 'nt':
-                # cmd /c dir lists files. /b for bare format if we wanted, but the user asked for "dir command"
-                result = subprocess.run("dir", cwd=project_root, capture_output=True, text=True, shell=True)
+            files = index.files()
+            if arg and any(c in arg for c in "*?["):
+                listing = index.glob(arg)
             else:
-                result = subprocess.run(["ls", "-F"], cwd=project_root, capture_output=True, text=True)
-            
-            if result.stdout:
-                # print("\033[32m--- Files ---\033[0m")
-                print(result.stdout)
-            if result.stderr:
-                print(f"\033[31m{result.stderr}\033[0m")
-                
+                prefix = arg.replace("\\", "/").strip("/")
+                prefix = f"{prefix}/" if prefix and prefix != "." else ""
+                # One level deep, like ls -F: files as-is, directories with a trailing slash
+                entries = set()
+                for path in files:
+                    if not path.startswith(prefix):
+                        continue
+                    head, sep, _ = path[len(prefix):].partition("/")
+                    entries.add(head + "/" if sep else head)
+                listing = sorted(entries, key=lambda e: (not e.endswith("/"), e.lower()))
+                if prefix and not listing:
+                    print(f"\033[31mNo such directory in the project: {arg}\033[0m")
+                    return True
+
+            for entry in listing:
+                color = "\033[34m" if entry.endswith("/") else ""
+                print(f"{color}{entry}\033[0m")
+            print(f"\033[90m({len(listing)} entries, {len(files)} files indexed)\033[0m")
         except Exception as e:
             print(f"\033[31mFailed to list files: {e}\033[0m")
             
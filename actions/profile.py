@@ -0,0 +1,32 @@
+from lococode.actions.base import BaseTool
+from lococode import profiling
+
+class ProfileTool(BaseTool):
+    """Slash command: /profile [on [dir]|off] — per-instruction cProfile/tracemalloc reports."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "profile"
+        self.description = "Profile each following instruction (cProfile, animation thread CPU, tracemalloc). Usage: /profile [on [dir]|off]"
+        self.pattern = r"^/profile(?: *(.*))?$"
+        self.is_slash = True
+        self.intent = None
+        self.arg_description = None
+
+    def execute(self, match, context):
+        args = (match.group(1) or "").split(maxsplit=1)
+        profiler = profiling.profiler
+        if not args:
+            if profiler.enabled:
+                print(f"\033[36mProfiling on: {profiler.count} report(s) in {profiler.directory}\033[0m")
+            else:
+                print("\033[36mProfiling off.\033[0m")
+        elif args[0].lower() == "on":
+            directory = profiler.enable(args[1].strip() if len(args) > 1 else None)
+            print(f"\033[32mProfiling instructions to {directory} (starting with the next one).\033[0m")
+        elif args[0].lower() == "off" and len(args) == 1:
+            profiler.disable()
+            print("\033[33mProfiling off.\033[0m")
+        else:
+            print("\033[31mUsage: /profile [on [dir]|off]\033[0m")
+        return True
@@ -1,5 +1,6 @@
 import os
 from lococode.actions.base import BaseTool
+from lococode.context_budget import add_section, estimate_tokens
 
 class ReadTool(BaseTool):
     def __init__(self):
@@ -10,13 +11,20 @@ class ReadTool(BaseTool):
         self.is_slash = True
         self.intent = "read"
         self.arg_description = "filename"
+        self.arg_file = "existing"
 
     def execute(self, match, context):
         filename = match.group(1).strip()
         
-        # We can get the project root by going up one level from this file's directory.
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        file_path = os.path.join(project_root, filename)
+        # Resolve against the working tree index first (handles inexact names from the planner)
+        index = context.get('project_index')
+        resolved = index.resolve(filename) if index else None
+        if resolved:
+            file_path = os.path.join(index.root, resolved)
+        else:
+            # We can get the project root by going up one level from this file's directory.
+            project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            file_path = os.path.join(project_root, filename)
         
         if not os.path.exists(file_path):
             # Try absolute path or relative to CWD
@@ -30,12 +38,9 @@ class ReadTool(BaseTool):
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             
-            # Add to search_results so it gets included in the next prompt
-            if "search_results" not in context:
-                context["search_results"] = []
-            
-            context["search_results"].append(f"Content of {filename}:\n```\n{content}\n```")
-            print(f"\033[32mRead {filename} into context.\033[0m")
+            # Add to search_results so it gets included in the next prompt (re-reading a file replaces it)
+            add_section(context, os.path.abspath(file_path), f"Content of {filename}:\n```\n{content}\n```", priority=1)
+            print(f"\033[32mRead {filename} into context (~{estimate_tokens(content)} tokens).\033[0m")
             
         except Exception as e:
             print(f"\033[31mFailed to read file: {e}\033[0m")
@@ -0,0 +1,28 @@
+from lococode.actions.base import BaseTool
+from lococode.registry import format_reload_report
+
+class ReloadTool(BaseTool):
+    """Slash command: /reload [all] — re-imports changed action plugins without restarting."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "reload"
+        self.description = "Re-import new or changed files in actions/ (all of them with 'all'). Usage: /reload [all]"
+        self.pattern = r"^/reload(?: *(.*))?$"
+        self.is_slash = True
+        self.intent = None
+        self.arg_description = None
+
+    def execute(self, match, context):
+        arg = (match.group(1) or "").strip().lower()
+        if arg not in ("", "all"):
+            print("\033[31mUsage: /reload [all]\033[0m")
+            return True
+        registry = context.get("registry")
+        if registry is None or not hasattr(registry, "reload"):
+            print("\033[31mError: No action registry in this session.\033[0m")
+            return True
+        report = registry.reload(force=arg == "all")
+        print(format_reload_report(report) or "\033[90mNo action changes.\033[0m")
+        print(f"\033[90m{len(registry.tools)} tools loaded (registry version {registry.version}).\033[0m")
+        return True
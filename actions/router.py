@@ -0,0 +1,48 @@
+from lococode.actions.base import BaseTool
+from lococode import intent_router
+
+class RouterTool(BaseTool):
+    """Slash command: /router [on|off|stats|clear] — nearest-neighbor intent routing in front of the planner."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "router"
+        self.description = "Reuse the intent of similar past instructions instead of calling the planner; show its precision and latency. Usage: /router [on|off|stats|clear]"
+        self.pattern = r"^/router(?: *(.*))?$"
+        self.is_slash = True
+        self.intent = None
+        self.arg_description = None
+
+    def execute(self, match, context):
+        arg = (match.group(1) or "").strip().lower()
+        settings = intent_router.settings
+        if arg == "on":
+            settings["enabled"] = True
+            print("\033[32mConfident matches with past instructions now skip the planner.\033[0m")
+        elif arg == "off":
+            settings["enabled"] = False
+            print("\033[33mEvery instruction goes through the planner (the router keeps learning).\033[0m")
+        elif arg == "clear":
+            intent_router.get_intent_router(context).clear()
+            print("\033[33mIntent router index cleared.\033[0m")
+        elif arg in ("", "stats"):
+            s = intent_router.get_intent_router(context).summary()
+            state = "on" if settings["enabled"] else "off"
+            space = ", ".join(s["embedding_models"]) or "hashing vectorizer only"
+            print(f"\033[36mIntent router {state}: {s['entries']} example(s) ({space})\033[0m")
+            if s["intents"]:
+                print("\033[90m" + ", ".join(f"{intent} {count}" for intent, count in sorted(s["intents"].items(), key=lambda x: -x[1])) + "\033[0m")
+
+            def pct(value):
+                return f"{value:.0%}" if value is not None else "-"
+
+            def ms(value):
+                return f"{value:.1f} ms" if value is not None else "-"
+
+            print(f"Lookups {s['lookups']}, routed {s['routed']} | precision {pct(s['precision'])} | "
+                  f"agreement with the planner when not routed {pct(s['shadow_accuracy'])}")
+            print(f"Routed intents (agreed with the planner {intent_router.SHADOW_MIN}+ times): {', '.join(s['trusted']) or 'none yet'}")
+            print(f"Latency: lookup {ms(s['avg_lookup_ms'])} vs planner {ms(s['avg_planner_ms'])} | evicted {s['evicted']}")
+        else:
+            print("\033[31mUsage: /router [on|off|stats|clear]\033[0m")
+        return True
@@ -1,6 +1,10 @@
-import json
 import re
 from lococode.actions.base import BaseTool
+from lococode.generation import budget_for
+from lococode import planner
+from lococode import routing
+from lococode import tracing
+from lococode.project_index import validate_file_arg
 
 class SequenceTool(BaseTool):
     """Slash command: /sequence <prompt> — executes a sequence of 3 actions."""
@@ -29,15 +33,7 @@ class SequenceTool(BaseTool):
         stream_response = context['stream_response']
         apply_edit = context['apply_edit']
         
-        intent_descriptions = {
-            "code_edit": "modify or write code in the current open file",
-            "general_question": "answer a question without modifying any files or taking any other actions"
-        }
-
-        for t in registry.tools:
-            if t.is_slash and t.intent and t.intent != "sequence":
-                arg_desc = f" (requires arg: {t.arg_description})" if t.arg_description else ""
-                intent_descriptions[t.intent] = f"{t.description}{arg_desc}"
+        intent_descriptions = planner.intent_descriptions(registry, exclude="sequence")
 
         intent_list_str = "\n".join([f"  - \"{intent}\": {desc}" for intent, desc in intent_descriptions.items()])
         valid_intents_str = ", ".join([f'"{intent}"' for intent in intent_descriptions.keys()])
@@ -64,21 +60,17 @@ class SequenceTool(BaseTool):
         ]
 
         print("\033[90mPlanning sequence...\033[0m", end="", flush=True)
-        result = stream_response(model_id, messages, silent=True)
+        planner_model = routing.model_for(context, "sequence_planner", instruction=instruction)
+        schema = planner.plan_schema(intent_descriptions, 3)
+        result = stream_response(planner_model, messages, silent=True, budget=budget_for("sequence_planner"), call_site="sequence_planner",
+                                 response_format=planner.response_format("sequence_planner", schema, planner_model))
         if not result:
             print("\n\033[31mFailed to get a response from the model.\033[0m")
             return True
             
-        result = re.sub(r"<think>.*?</think>", "", result, flags=re.DOTALL).strip()
-        json_match = re.search(r'\[.*\]', result, re.DOTALL)
-        
-        plan = None
-        if json_match:
-            try:
-                plan = json.loads(json_match.group())
-            except json.JSONDecodeError:
-                pass
-                
+        result = result.strip()
+        plan = planner.parse_json(result, "array")
+
         if not plan or not isinstance(plan, list) or len(plan) != 3:
             print(f"\n\033[31mFailed to parse exactly 3 actions from the plan. Model returned:\n{result}\033[0m")
             return True
@@ -88,44 +80,50 @@ class SequenceTool(BaseTool):
             print(f"\033[90m  {i+1}. {step.get('intent')} - {step.get('reasoning')}\033[0m")
 
         for i, step in enumerate(plan):
-            intent = step.get('intent')
-            args = step.get('args')
+            with tracing.span("sequence_step", cat="command", step=i + 1, intent=step.get('intent')):
+                intent = step.get('intent')
+                args = step.get('args')
             
-            print(f"\n\033[94m=== SEQUENCE STEP {i+1}/3: {intent} ===\033[0m")
+                print(f"\n\033[94m=== SEQUENCE STEP {i+1}/3: {intent} ===\033[0m")
             
-            matched_tool = registry.find_tool_by_intent(intent)
-            if matched_tool:
-                if matched_tool.arg_description and not args:
-                    if matched_tool.name == "create_file":
-                        intent = "code_edit"
-                        matched_tool = None
-                    else:
-                        print(f"\033[31mSkipping step {i+1}: missing args for {intent}.\033[0m")
-                        continue
-                
+                matched_tool = registry.find_tool_by_intent(intent)
                 if matched_tool:
-                    cmd_match = re.search(r'(/[a-z\d_]+)', matched_tool.pattern)
-                    if cmd_match:
-                        base_cmd = cmd_match.group(1)
-                        fake_input = f"{base_cmd} {args}" if args else base_cmd
-                        fake_match = re.search(matched_tool.pattern, fake_input, re.IGNORECASE | re.DOTALL)
-                        if fake_match:
-                            try:
-                                matched_tool.execute(fake_match, context)
-                            except Exception as e:
-                                print(f"\033[31mError executing {intent}: {e}\033[0m")
+                    if matched_tool.arg_description and not args and not matched_tool.arg_optional:
+                        if matched_tool.name == "create_file":
+                            intent = "code_edit"
+                            matched_tool = None
+                        else:
+                            print(f"\033[31mSkipping step {i+1}: missing args for {intent}.\033[0m")
                             continue
-                    print(f"\033[31mFailed to build command for {matched_tool.name}.\033[0m")
-                    continue
+                
+                    if matched_tool:
+                        if matched_tool.arg_file:
+                            args, arg_error = validate_file_arg(matched_tool, args, context.get('project_index'))
+                            if arg_error:
+                                print(f"\033[31mSkipping step {i+1}: {arg_error}\033[0m")
+                                continue
+                        cmd_match = re.search(r'(/[a-z\d_]+)', matched_tool.pattern)
+                        if cmd_match:
+                            base_cmd = cmd_match.group(1)
+                            fake_input = f"{base_cmd} {args}" if args else base_cmd
+                            fake_match = re.search(matched_tool.pattern, fake_input, re.IGNORECASE | re.DOTALL)
+                            if fake_match:
+                                try:
+                                    matched_tool.execute(fake_match, context)
+                                except Exception as e:
+                                    print(f"\033[31mError executing {intent}: {e}\033[0m")
+                                continue
+                        print(f"\033[31mFailed to build command for {matched_tool.name}.\033[0m")
+                        continue
             
-            if intent in ["code_edit", "general_question"]:
-                step_instruction = args if args else step.get('reasoning', "code edit")
-                try:
-                    pre_intent = {"intent": intent, "args": step_instruction, "tags_needed": [], "reasoning": step.get('reasoning', '')}
-                    apply_edit(context['target_file'], step_instruction, model_id, registry, context, verbose=True, preplanned_intent=pre_intent)
-                except Exception as e:
-                    print(f"\033[31mError applying edit: {e}\033[0m")
-            else:
-                print(f"\033[31mUnknown intent {intent}\033[0m")
+                if intent in ["code_edit", "general_question"]:
+                    step_instruction = args if args else step.get('reasoning', "code edit")
+                    try:
+                        pre_intent = {"intent": intent, "args": step_instruction, "tags_needed": [], "reasoning": step.get('reasoning', '')}
+                        apply_edit(context['target_file'], step_instruction, model_id, registry, context, verbose=True, preplanned_intent=pre_intent)
+                    except Exception as e:
+                        print(f"\033[31mError applying edit: {e}\033[0m")
+                else:
+                    print(f"\033[31mUnknown intent {intent}\033[0m")
         
         return True
@@ -0,0 +1,37 @@
+import os
+from lococode.actions.base import BaseTool
+
+class SessionTool(BaseTool):
+    """Slash command: /session [on|off|reset] — multi-turn editing that sends diffs instead of the whole file."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "session"
+        self.description = "Keep a rolling conversation per file and send only diffs after each edit. Usage: /session [on|off|reset]"
+        self.pattern = r"^/session(?: *(.*))?$"
+        self.is_slash = True
+        self.intent = None
+        self.arg_description = None
+
+    def execute(self, match, context):
+        arg = (match.group(1) or "").strip().lower()
+        sessions = context.setdefault('edit_sessions', {})
+
+        if arg == "on":
+            context['session_mode'] = True
+            print("\033[32mSession mode on. Follow-up edits reuse the conversation and send diffs.\033[0m")
+        elif arg == "off":
+            context['session_mode'] = False
+            sessions.clear()
+            print("\033[33mSession mode off.\033[0m")
+        elif arg == "reset":
+            sessions.pop(os.path.abspath(context.get('target_file', '')), None)
+            print(f"\033[32mSession for {context.get('target_file')} reset; the next edit sends the full file.\033[0m")
+        elif arg == "":
+            state = "on" if context.get('session_mode') else "off"
+            session = sessions.get(os.path.abspath(context.get('target_file', '')))
+            turns = session.turns if session else 0
+            print(f"\033[36mSession mode: {state} | {turns} turn(s) on {context.get('target_file')}\033[0m")
+        else:
+            print("\033[31mUsage: /session [on|off|reset]\033[0m")
+        return True
@@ -0,0 +1,41 @@
+from lococode.actions.base import BaseTool
+from lococode import think_filter
+
+class ThinkTool(BaseTool):
+    """Slash command: /think [hide|dim] | /think budget <n|off|default> — controls <think> reasoning display and budget."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "think"
+        self.description = "Show or hide model reasoning while streaming, or cap reasoning tokens. Usage: /think [hide|dim] | /think budget <n|off|default>"
+        self.pattern = r"^/think(?: *(.*))?$"
+        self.is_slash = True
+        self.intent = None
+        self.arg_description = None
+
+    def execute(self, match, context):
+        args = (match.group(1) or "").strip().lower().split()
+        settings = think_filter.settings
+        if not args:
+            budget = settings["budget"]
+            budget_text = "per call site" if budget == "default" else ("unlimited" if budget is None else f"{budget} tokens")
+            print(f"\033[36mReasoning: {settings['display']} | budget: {budget_text}\033[0m")
+        elif args[0] in ("hide", "dim") and len(args) == 1:
+            settings["display"] = args[0]
+            print(f"\033[32mReasoning will be {'shown dimmed' if args[0] == 'dim' else 'hidden'} while streaming.\033[0m")
+        elif args[0] == "budget" and len(args) == 2:
+            value = args[1]
+            if value == "off":
+                settings["budget"] = None
+                print("\033[33mReasoning budget disabled.\033[0m")
+            elif value == "default":
+                settings["budget"] = "default"
+                print("\033[32mUsing per-call-site reasoning budgets.\033[0m")
+            elif value.isdigit() and int(value) > 0:
+                settings["budget"] = int(value)
+                print(f"\033[32mReasoning budget set to {value} tokens.\033[0m")
+            else:
+                print("\033[31mUsage: /think budget <n|off|default>\033[0m")
+        else:
+            print("\033[31mUsage: /think [hide|dim] | /think budget <n|off|default>\033[0m")
+        return True
@@ -0,0 +1,86 @@
+import os
+import time
+from lococode.actions.base import BaseTool
+from lococode.snapshots import get_snapshot_store
+
+
+class UndoTool(BaseTool):
+    """Slash command: /undo [file]  — steps a file back to its previous snapshot."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "undo"
+        self.description = "Revert the current file (or the given one) to its previous snapshot; repeat to go further back. Usage: /undo [file]"
+        self.pattern = r"^/undo(?:\s+(.+))?$"
+        self.is_slash = True
+        self.intent = "undo"
+        self.arg_description = "file to revert (defaults to the current file)"
+        self.arg_optional = True
+
+    def execute(self, match, context):
+        target_file = (match.group(1) or "").strip() or context.get("target_file")
+        if not target_file:
+            print("\033[31mError: No file to undo.\033[0m")
+            return True
+        try:
+            entry = get_snapshot_store(context).undo(target_file)
+        except Exception as e:
+            print(f"\033[31mError restoring {target_file}: {e}\033[0m")
+            return True
+        if entry is None:
+            print(f"\033[33mNothing to undo for {target_file}.\033[0m")
+        else:
+            print(f"\033[32mReverted {target_file} to snapshot {entry['hash'][:8]} from {time.strftime('%H:%M:%S', time.localtime(entry['time']))}.\033[0m")
+        return True
+
+
+class RestoreTool(BaseTool):
+    """Slash command: /restore [file] [version]  — lists or restores a file's snapshots."""
+
+    def __init__(self):
+        super().__init__()
+        self.name = "restore"
+        self.description = "List the current file's snapshots, or restore one by number or hash prefix. Usage: /restore [file] [version]"
+        self.pattern = r"^/restore(?:\s+(.+))?$"
+        self.is_slash = True
+        self.intent = "restore"
+        self.arg_description = "optional file, then a version number or hash prefix"
+        self.arg_optional = True
+
+    def execute(self, match, context):
+        store = get_snapshot_store(context)
+        parts = (match.group(1) or "").split()
+        target_file = context.get("target_file")
+        ref = None
+        if parts and (len(parts) > 1 or os.path.exists(parts[0]) or store.history(parts[0])):
+            target_file = parts[0]
+            parts = parts[1:]
+        if parts:
+            ref = parts[0]
+        if not target_file:
+            print("\033[31mError: No file selected.\033[0m")
+            return True
+
+        versions = store.history(target_file)
+        if not versions:
+            print(f"\033[33mNo snapshots of {target_file}.\033[0m")
+            return True
+
+        if ref is None:
+            print(f"\033[36mSnapshots of {target_file}:\033[0m")
+            for i, entry in enumerate(versions, 1):
+                when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["time"]))
+                print(f"  \033[33m{i:>3}\033[0m  {entry['hash'][:8]}  {when}  {entry['size']:>8} B  \033[90m{entry['reason']}\033[0m")
+            print(f"\033[90mRestore with /restore <number|hash>.\033[0m")
+            return True
+
+        index = store.find(target_file, ref)
+        if index is None:
+            print(f"\033[31mError: No snapshot '{ref}' of {target_file}.\033[0m")
+            return True
+        try:
+            entry = store.restore(target_file, index)
+            print(f"\033[32mRestored {target_file} to version {index + 1} ({entry['hash'][:8]}). /undo reverts this.\033[0m")
+        except Exception as e:
+            print(f"\033[31mError restoring {target_file}: {e}\033[0m")
+        return True
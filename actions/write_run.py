@@ -1,7 +1,9 @@
 import sys
-import subprocess
 import os
+import threading
 from lococode.actions.base import BaseTool
+from lococode import tracing
+from lococode.interpreter_pool import InterpreterPool, DEFAULT_TIMEOUT, DEFAULT_MEMORY_MB
 
 class WriteRunTool(BaseTool):
     """Slash command: /write_run <prompt> — writes and executes a python script."""
@@ -51,22 +53,47 @@ class WriteRunTool(BaseTool):
             registry,
             context,
             verbose=True,
-            preplanned_intent={"intent": "code_edit", "args": None, "tags_needed": [], "reasoning": "Preplanned code editing for write_run action"}
+            preplanned_intent={"intent": "code_edit", "args": None, "tags_needed": [], "reasoning": "Preplanned code editing for write_run action"},
+            call_site="write_run"
         )
         
         if success:
             print(f"\n\033[92mExecuting {target_file}...\033[0m")
             try:
-                # Use sys.executable to ensure we use the same Python environment
-                result = subprocess.run([sys.executable, target_file], capture_output=True, text=True)
-                
-                if result.stdout:
-                    print("\033[32m--- Output ---\033[0m")
-                    print(result.stdout)
-                
-                if result.stderr:
-                    print("\033[31m--- Errors ---\033[0m")
-                    print(result.stderr)
+                # Warm interpreters from the shared pool skip Python startup
+                if not context.get('interpreter_pool'):
+                    context['interpreter_pool'] = InterpreterPool()
+                pool = context['interpreter_pool']
+                timeout = context.get('run_timeout', DEFAULT_TIMEOUT)
+                print_lock = threading.Lock()
+                last_char = ["\n"]
+
+                def show(text, color):
+                    with print_lock:
+                        sys.stdout.write(f"{color}{text}\033[0m")
+                        sys.stdout.flush()
+                        last_char[0] = text[-1]
+
+                print("\033[32m--- Output ---\033[0m")
+                with tracing.span("write_run_exec", cat="subprocess", file=target_file) as trace:
+                    result = pool.run(
+                        target_file,
+                        timeout=timeout,
+                        memory_mb=context.get('run_memory_mb', DEFAULT_MEMORY_MB),
+                        on_stdout=lambda text: show(text, ""),
+                        on_stderr=lambda text: show(text, "\033[31m"),
+                    )
+                    trace.set(returncode=result['returncode'], timed_out=result['timed_out'])
+                if last_char[0] != "\n":
+                    print()
+
+                if result['timed_out']:
+                    print(f"\033[31mKilled {target_file}: exceeded the {timeout:g}s time limit.\033[0m")
+                elif result['interrupted']:
+                    print(f"\033[33mStopped {target_file}.\033[0m")
+                else:
+                    status_color = "\033[90m" if result['returncode'] == 0 else "\033[31m"
+                    print(f"{status_color}(exit code {result['returncode']}, {result['elapsed']:.2f}s)\033[0m")
                     
             except Exception as e:
                 print(f"\033[31mError executing script: {e}\033[0m")
@@ -0,0 +1,171 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from lococode.engine import EditRequest, EditResult
+from lococode.presenter import TerminalPresenter
+from lococode import tracing
+
+ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+
+
+class ThreadOutput:
+    """sys.stdout replacement that gives each batch worker thread its own buffer.
+
+    Threads that called capture() write into their buffer; everything else goes to
+    the real stream, so the main thread can keep reporting progress.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+
+    def capture(self):
+        self._local.buffer = io.StringIO()
+
+    def release(self):
+        buffer = getattr(self._local, "buffer", None)
+        self._local.buffer = None
+        return buffer.getvalue() if buffer else ""
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer or self.stream).write(text)
+
+    def flush(self):
+        if getattr(self._local, "buffer", None) is None:
+            self.stream.flush()
+
+    def isatty(self):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def read_jobs(source):
+    """Parses batch instructions from a JSONL file path or '-' for stdin.
+
+    Each line is {"file": ..., "instruction": ..., "intent": optional, "id": optional}.
+    "intent" may be an intent name or a full plan dict and skips the planner.
+    Malformed lines become jobs with an 'error' so they still get a result.
+    """
+    handle = sys.stdin if source == "-" else open(source, "r", encoding="utf-8")
+    jobs = []
+    try:
+        for line_no, line in enumerate(handle, 1):
+            if not line.strip() or line.lstrip().startswith("#"):
+                continue
+            job = {"index": len(jobs), "line": line_no}
+            try:
+                data = json.loads(line)
+                job["id"] = data.get("id", job["index"])
+                job["file"] = data.get("file") or data.get("target_file")
+                job["instruction"] = data["instruction"]
+                job["intent"] = data.get("intent")
+                if not job["file"]:
+                    raise KeyError("file")
+            except (ValueError, KeyError, AttributeError, TypeError) as e:
+                job["id"] = job.get("id", job["index"])
+                job["error"] = f"Invalid instruction on line {line_no}: {e}"
+            jobs.append(job)
+    finally:
+        if handle is not sys.stdin:
+            handle.close()
+    return jobs
+
+
+def run_job(job, context):
+    """Runs one instruction through the engine with its own context copy; returns its JSON-ready result."""
+    start = time.time()
+    trace = tracing.span("job", cat="batch", id=job.get("id"), file=job.get("file"))
+    if job.get("error"):
+        edit = EditResult(status="error", file=job.get("file"), error=job["error"])
+    else:
+        job_context = dict(context)
+        job_context["target_file"] = job["file"]
+        job_context["search_results"] = []
+        instruction = job["instruction"]
+        edit = EditResult(status="error", file=job["file"])
+        try:
+            if instruction.startswith("/"):
+                handled = context["registry"].run_slash_command(instruction, job_context)
+                edit.status = "tool" if handled else "error"
+                edit.error = None if handled else "Unknown command."
+            else:
+                if not os.path.exists(job["file"]):
+                    open(job["file"], "w", encoding="utf-8").close()
+                request = EditRequest(job["file"], instruction, plan=job.get("intent"))
+                edit = context["engine"].edit(request, context=job_context, on_event=TerminalPresenter(silent=True))
+        except Exception as e:
+            edit.error = f"{type(e).__name__}: {e}"
+    edit.timings.total = time.time() - start
+    trace.end(status=edit.status)
+    result = {"id": job["id"], "index": job["index"]}
+    result.update(edit.to_dict())
+    result["timings"] = {key: round(value, 3) for key, value in result["timings"].items() if value is not None}
+    if edit.plan is None or edit.plan.intent != "general_question":
+        result.pop("output")
+    return result
+
+
+def run_batch(jobs, context, workers=4, output=None, on_result=None):
+    """Executes jobs and writes one JSON line per result to output as each finishes.
+
+    Jobs for the same file run one after another in input order; different files
+    run in parallel on up to `workers` threads. Each job's printed output is captured
+    (ANSI codes stripped) into its result's 'log'. Returns the results in input order.
+    """
+    output = output or sys.stdout
+    context = dict(context, headless=True)
+    by_file = {}
+    for job in jobs:
+        key = os.path.abspath(job["file"]) if job.get("file") else f"<invalid:{job['index']}>"
+        by_file.setdefault(key, []).append(job)
+
+    real_stdout = sys.stdout
+    capture = ThreadOutput(real_stdout)
+    results = [None] * len(jobs)
+    write_lock = threading.Lock()
+
+    def run_file(file_jobs):
+        for job in file_jobs:
+            capture.capture()
+            try:
+                result = run_job(job, context)
+            finally:
+                log = ANSI_RE.sub("", capture.release()).replace("\r", "\n")
+            result["log"] = "\n".join(line.rstrip() for line in log.splitlines() if line.strip())
+            results[job["index"]] = result
+            with write_lock:
+                output.write(json.dumps(result, ensure_ascii=False) + "\n")
+                output.flush()
+                if on_result:
+                    on_result(result)
+
+    sys.stdout = capture
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for future in [executor.submit(run_file, file_jobs) for file_jobs in by_file.values()]:
+                future.result()
+    finally:
+        sys.stdout = real_stdout
+    return results
+
+
+def summarize(results):
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    tokens = sum(r["usage"]["prompt_tokens"] + r["usage"]["completion_tokens"] for r in results)
+    parts = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+    return f"{len(results)} instruction(s): {parts} | {tokens} tokens"
+
+
+def succeeded(result):
+    return result["status"] in ("applied", "answered", "tool")
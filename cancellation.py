@@ -0,0 +1,178 @@
+import os
+import sys
+import threading
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+try:
+    import termios
+    import tty
+    import select
+except ImportError:
+    termios = None
+
+ESC = b"\x1b"
+
+
+class CancelToken:
+    """Thread-safe cancellation flag with callbacks (e.g. closing an HTTP stream)."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self, reason="cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def on_cancel(self, callback):
+        """Registers callback to run on cancellation (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def wait(self, timeout):
+        return self._event.wait(timeout)
+
+
+def abort_response(response):
+    """Closes a streaming requests response right away, even while another thread is blocked reading it.
+
+    Shutting the socket down wakes a blocked recv(), and the dropped connection tells
+    the server to stop generating and free the slot.
+    """
+    import socket
+    raw = getattr(response, "raw", None)
+    sock = None
+    for path in (("_connection", "sock"), ("_fp", "fp", "raw", "_sock")):
+        obj = raw
+        for attr in path:
+            obj = getattr(obj, attr, None)
+            if obj is None:
+                break
+        if obj is not None:
+            sock = obj
+            break
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    try:
+        response.close()
+    except Exception:
+        pass
+
+
+class KeyWatcher:
+    """Background key listener that works on Windows (msvcrt) and POSIX (termios + select).
+
+    Calls on_key(bytes) for every key press while active. On POSIX the terminal is
+    put in cbreak mode for the duration and restored on exit. Multi-byte escape
+    sequences (arrow keys etc.) are delivered as one key, so a bare ESC can be told
+    apart from them. Does nothing when stdin is not an interactive terminal or when
+    used off the main thread.
+    """
+
+    def __init__(self, on_key, poll_interval=0.05):
+        self.on_key = on_key
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._saved_attrs = None
+        self._fd = None
+
+    def _enabled(self):
+        if threading.current_thread() is not threading.main_thread():
+            return False
+        try:
+            return sys.stdin is not None and sys.stdin.isatty()
+        except (ValueError, OSError):
+            return False
+
+    def __enter__(self):
+        if not self._enabled():
+            return self
+        if msvcrt:
+            self._thread = threading.Thread(target=self._run_windows, daemon=True)
+        elif termios:
+            try:
+                self._fd = sys.stdin.fileno()
+                self._saved_attrs = termios.tcgetattr(self._fd)
+                tty.setcbreak(self._fd)
+            except (termios.error, OSError, ValueError):
+                self._saved_attrs = None
+                return self
+            self._thread = threading.Thread(target=self._run_posix, daemon=True)
+        if self._thread:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=1.0)
+        if self._saved_attrs is not None:
+            try:
+                termios.tcsetattr(self._fd, termios.TCSADRAIN, self._saved_attrs)
+            except (termios.error, OSError):
+                pass
+        return False
+
+    def _run_windows(self):
+        while not self._stop.is_set():
+            if msvcrt.kbhit():
+                key = msvcrt.getch()
+                if key in (b"\x00", b"\xe0") and msvcrt.kbhit():
+                    key += msvcrt.getch()  # Extended key (arrows, F-keys)
+                self.on_key(key)
+            else:
+                self._stop.wait(self.poll_interval)
+
+    def _run_posix(self):
+        fd = self._fd
+        while not self._stop.is_set():
+            try:
+                ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                if not ready:
+                    continue
+                key = os.read(fd, 1)
+                if key == ESC:
+                    # A real escape sequence arrives in one burst; a lone ESC does not
+                    while select.select([fd], [], [], 0.03)[0]:
+                        more = os.read(fd, 32)
+                        if not more:
+                            break
+                        key += more
+            except (OSError, ValueError):
+                return
+            if key:
+                self.on_key(key)
+
+
+def esc_cancels(token):
+    """KeyWatcher that cancels token when a bare ESC is pressed."""
+    def on_key(key):
+        if key == ESC:
+            token.cancel("esc")
+    return KeyWatcher(on_key)
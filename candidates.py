@@ -0,0 +1,173 @@
+import os
+import re
+import ast
+import json
+import difflib
+from html.parser import HTMLParser
+from dataclasses import dataclass
+from typing import Optional
+
+from lococode import edit_formats
+
+# n > 1 requests that many code edit candidates in parallel and keeps the best one; a session's
+# context['candidates'] (set by /candidates) overrides this process-wide default from --candidates
+settings = {"n": 1, "max_temperature": 0.8}
+
+MAX_N = 8
+
+# Elements that never take a closing tag
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+# Closing tags HTML lets authors leave out
+OPTIONAL_CLOSE = {"p", "li", "dt", "dd", "tr", "td", "th", "thead", "tbody", "tfoot", "option", "optgroup", "colgroup",
+                  "html", "head", "body", "rt", "rp"}
+
+
+def count_for(context):
+    """Candidates per code edit for this session (or daemon/batch job context)."""
+    return (context or {}).get("candidates") or settings["n"]
+
+
+def sampling_for(n):
+    """(temperature, seed) per candidate: the greedy reply first, then rising temperatures with fixed seeds."""
+    top = settings["max_temperature"]
+    plans = [(0, None)]
+    for i in range(1, n):
+        plans.append((round(top * i / (n - 1), 2), i))
+    return plans
+
+
+class _TagBalance(HTMLParser):
+    """Counts closing tags that do not match an open element."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.errors = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in VOID_TAGS:
+            self.stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        if tag not in self.stack:
+            self.errors += 1
+            return
+        while self.stack:
+            open_tag = self.stack.pop()
+            if open_tag == tag:
+                break
+            if open_tag not in OPTIONAL_CLOSE:
+                self.errors += 1
+
+
+def syntax_ok(path, content):
+    """True/False when the file type can be checked locally (Python, HTML, JSON), None otherwise."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".py", ".pyw"):
+        try:
+            ast.parse(content)
+            return True
+        except (SyntaxError, ValueError):
+            return False
+    if ext in (".html", ".htm"):
+        parser = _TagBalance()
+        try:
+            parser.feed(content)
+            parser.close()
+        except Exception:
+            return False
+        unclosed = [t for t in parser.stack if t not in OPTIONAL_CLOSE]
+        return parser.errors == 0 and not unclosed
+    if ext == ".json":
+        try:
+            json.loads(content)
+            return True
+        except ValueError:
+            return False
+    return None
+
+
+@dataclass
+class Candidate:
+    """One sampled reply for an edit and how well it applies to the file."""
+    index: int
+    temperature: float
+    seed: Optional[int] = None
+    completion: object = None
+    format: Optional[str] = None
+    applied: int = 0
+    failed: int = 0
+    parses: Optional[bool] = None
+    diff_lines: int = 0
+    content: Optional[str] = None
+
+    @property
+    def sampling(self):
+        params = {"temperature": self.temperature}
+        if self.seed is not None:
+            params["seed"] = self.seed
+        return params
+
+    @property
+    def ok(self):
+        return self.completion is not None and self.completion.ok and bool(self.completion.text)
+
+    @property
+    def clean(self):
+        """Every edit applied, none failed, the result parses and the reply was not cut off."""
+        return (self.ok and self.applied > 0 and self.failed == 0 and self.parses is not False
+                and self.completion.finish_reason != "length")
+
+    def score(self):
+        """Higher is better: parses, then no failed blocks, then more applied, then the smaller diff."""
+        if not self.ok:
+            return (-1,)
+        return (self.parses is not False, self.applied > 0, self.failed == 0, self.applied - self.failed, -self.diff_lines)
+
+    def describe(self):
+        if not self.ok:
+            error = self.completion.error if self.completion is not None else None
+            return "cancelled" if self.completion is not None and self.completion.cancelled else (error or "no reply")
+        parts = [f"{self.applied} applied", f"{self.failed} failed"]
+        if self.parses is not None:
+            parts.append("parses" if self.parses else "syntax error")
+        parts.append(f"{self.diff_lines} changed line(s)")
+        return ", ".join(parts)
+
+
+def evaluate(candidate, fmt, current_content, path):
+    """Applies the candidate's reply to a copy of the file and fills in its score fields."""
+    text = candidate.completion.text
+    if candidate.completion.finish_reason == "length":
+        text = fmt.drop_incomplete(text)
+    reply_fmt = edit_formats.format_for_reply(fmt, text)
+    candidate.format = reply_fmt.name
+    edits = reply_fmt.parse(text)
+    if edits:
+        new_content, candidate.applied, failures = reply_fmt.apply(current_content, edits)
+        candidate.failed = len(failures)
+    elif reply_fmt.attempted(text):
+        new_content, candidate.failed = current_content, 1
+    else:
+        # Same fallback as Engine.edit: a bare code reply replaces the file
+        cleaned = re.sub(r"```[a-z]*\n?", "", text).replace("```", "").strip()
+        if len(cleaned) > 10:
+            new_content, candidate.applied = cleaned, 1
+        else:
+            new_content = current_content
+    candidate.content = new_content
+    if candidate.applied:
+        candidate.parses = syntax_ok(path, new_content)
+    matcher = difflib.SequenceMatcher(None, current_content.splitlines(), new_content.splitlines())
+    candidate.diff_lines = sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal")
+    return candidate
+
+
+def best(candidates):
+    """The highest scoring candidate with a reply (earliest wins ties), or None."""
+    usable = [c for c in candidates if c.ok]
+    if not usable:
+        return None
+    return max(usable, key=lambda c: (c.score(), -c.index))
@@ -0,0 +1,367 @@
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import threading
+from collections import deque
+from urllib.parse import urlparse
+
+from lococode.completion_cache import cache_key
+
+CASSETTE_VERSION = 1
+
+
+def _path_of(url):
+    """'/chat/completions' for 'http://localhost:1234/v1/chat/completions'."""
+    path = urlparse(url).path
+    return path[path.find("/", 1):] if path.startswith("/v1/") else path
+
+
+class Cassette:
+    """A recorded session: one JSON line per HTTP exchange with the LLM server.
+
+    A POST line keeps the exact request payload, the status, the seconds until the
+    response headers arrived and every raw SSE chunk with its offset from the
+    request; a GET line keeps the response body. Lines are appended as each
+    exchange finishes, so a crashed session still leaves a usable cassette.
+    """
+
+    def __init__(self, path, interactions=None, header=None):
+        self.path = path
+        self.interactions = interactions or []
+        self.header = header or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path, **header):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        header = dict(cassette=CASSETTE_VERSION, created=time.strftime("%Y-%m-%dT%H:%M:%S"), **header)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+        return cls(path, header=header)
+
+    @classmethod
+    def load(cls, path):
+        header, interactions = {}, []
+        with open(path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    raise ValueError(f"{path}:{number}: not a JSON line")
+                if "cassette" in entry:
+                    header = entry
+                else:
+                    interactions.append(entry)
+        return cls(path, interactions, header)
+
+    def add(self, entry):
+        with self._lock:
+            self.interactions.append(entry)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def completions(self):
+        return [e for e in self.interactions if e.get("method") == "POST"]
+
+
+# ── Recording ──
+
+class RecordingResponse:
+    """Wraps a streaming requests response and tees its chunks into the cassette."""
+
+    def __init__(self, response, cassette, entry, start):
+        self._response = response
+        self._cassette = cassette
+        self._entry = entry
+        self._start = start
+        self._saved = False
+        self._lock = threading.Lock()
+        entry["status"] = response.status_code
+        entry["headers_after"] = round(time.perf_counter() - start, 6)
+        entry["chunks"] = []
+
+    def __getattr__(self, name):
+        # raw, headers, json(), ... come from the real response (abort_response needs raw)
+        return getattr(self._response, name)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        complete = False
+        try:
+            for chunk in self._response.iter_content(chunk_size=chunk_size):
+                self._entry["chunks"].append([round(time.perf_counter() - self._start, 6),
+                                              base64.b64encode(chunk).decode("ascii")])
+                yield chunk
+            complete = True
+        finally:
+            self._save(complete)
+
+    def close(self):
+        self._save(False)
+        self._response.close()
+
+    def _save(self, complete):
+        with self._lock:
+            if self._saved:
+                return
+            self._saved = True
+        if not self._entry["chunks"] and self._response.status_code != 200:
+            # Error responses are read whole (e.g. the 400 that triggers the schema fallback)
+            try:
+                self._entry["chunks"].append([self._entry["headers_after"], base64.b64encode(self._response.content).decode("ascii")])
+            except Exception:
+                pass
+        chunks = self._entry["chunks"]
+        # The engine stops reading at [DONE] rather than draining the stream
+        self._entry["complete"] = complete or bool(chunks and b"[DONE]" in base64.b64decode(chunks[-1][1]))
+        self._cassette.add(self._entry)
+
+
+class RecordingSession:
+    """Drop-in for Engine.http that records every exchange while passing it through."""
+
+    def __init__(self, session, cassette):
+        self.session = session
+        self.cassette = cassette
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def post(self, url, data=None, **kwargs):
+        payload = json.loads(data) if isinstance(data, (str, bytes)) else data
+        entry = {"method": "POST", "path": _path_of(url), "key": cache_key(payload), "payload": payload}
+        start = time.perf_counter()
+        response = self.session.post(url, data=data, **kwargs)
+        return RecordingResponse(response, self.cassette, entry, start)
+
+    def get(self, url, **kwargs):
+        start = time.perf_counter()
+        response = self.session.get(url, **kwargs)
+        self.cassette.add({"method": "GET", "path": _path_of(url), "status": response.status_code,
+                           "headers_after": round(time.perf_counter() - start, 6),
+                           "body": base64.b64encode(response.content).decode("ascii")})
+        return response
+
+
+# ── Replay ──
+
+class ReplayResponse:
+    """Serves (offset, bytes) chunks back through iter_content(), paced by speed (0 = as fast as possible)."""
+
+    def __init__(self, status_code, chunks, speed=1.0, start=None):
+        self.status_code = status_code
+        self.raw = None
+        self.headers = {"Content-Type": "text/event-stream"}
+        self._chunks = chunks
+        self._speed = speed
+        self._start = start if start is not None else time.perf_counter()
+        self._closed = threading.Event()
+
+    @property
+    def content(self):
+        return b"".join(data for _, data in self._chunks)
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        for offset, data in self._chunks:
+            if self._speed:
+                delay = self._start + offset / self._speed - time.perf_counter()
+                if delay > 0 and self._closed.wait(delay):
+                    return
+            if self._closed.is_set():
+                return
+            yield data
+
+    def close(self):
+        self._closed.set()
+
+
+class ReplaySession:
+    """Drop-in for Engine.http that answers from a cassette, with no server running.
+
+    Requests are matched by payload (the completion cache key), so the same
+    request recorded twice is served in recorded order. A request that was never
+    recorded gets a 404 (with strict=False the next unused chat completion is
+    served instead, useful when prompts changed but the replies should still
+    apply; other endpoints such as /embeddings are always matched exactly).
+    """
+
+    def __init__(self, cassette, speed=1.0, strict=True):
+        self.cassette = cassette
+        self.speed = speed
+        self.strict = strict
+        self.served = 0
+        self.misses = []
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self._unused = deque()
+        for entry in cassette.completions():
+            # Decoded once up front so replay timing measures the client, not base64
+            entry["_data"] = [(offset, base64.b64decode(data)) for offset, data in entry.get("chunks", [])]
+            self._by_key.setdefault(entry.get("key"), deque()).append(entry)
+            if entry.get("path", "").endswith("/chat/completions"):
+                self._unused.append(entry)
+        self._used = set()
+
+    def _take(self, payload, path):
+        with self._lock:
+            key = cache_key(payload)
+            queue = self._by_key.get(key)
+            while queue:
+                entry = queue.popleft()
+                if id(entry) not in self._used:
+                    break
+            else:
+                entry = None
+                if not self.strict and path.endswith("/chat/completions"):
+                    while self._unused and id(self._unused[0]) in self._used:
+                        self._unused.popleft()
+                    entry = self._unused.popleft() if self._unused else None
+                if entry is None:
+                    self.misses.append(key)
+                    return None
+            self._used.add(id(entry))
+            self.served += 1
+            return entry
+
+    def post(self, url, data=None, **kwargs):
+        start = time.perf_counter()
+        payload = json.loads(data) if isinstance(data, (str, bytes)) else data
+        entry = self._take(payload, _path_of(url))
+        if entry is None:
+            body = json.dumps({"error": "request not in cassette", "key": cache_key(payload)}).encode("utf-8")
+            return ReplayResponse(404, [(0, body)], speed=0)
+        if self.speed:
+            time.sleep(entry.get("headers_after", 0) / self.speed)
+        return ReplayResponse(entry.get("status", 200), entry["_data"], self.speed, start)
+
+    def get(self, url, **kwargs):
+        path = _path_of(url)
+        entry = next((e for e in self.cassette.interactions if e.get("method") == "GET" and e.get("path") == path), None)
+        if entry is not None:
+            return ReplayResponse(entry.get("status", 200), [(0, base64.b64decode(entry.get("body", "")))], speed=0)
+        if path == "/models":
+            models = sorted({e["payload"].get("model") for e in self.cassette.completions() if e.get("payload")} - {None})
+            body = json.dumps({"data": [{"id": m} for m in models]}).encode("utf-8")
+            return ReplayResponse(200, [(0, body)], speed=0)
+        return ReplayResponse(404, [], speed=0)
+
+    def close(self):
+        pass
+
+
+def record(engine, path):
+    """Records every exchange of engine into a new cassette at path. The completion cache is
+    turned off so each request really reaches the server (and the cassette)."""
+    cassette = Cassette.create(path, base_url=engine.base_url)
+    engine.http = RecordingSession(engine.http, cassette)
+    engine.cache.enabled = False
+    return cassette
+
+
+def replay(engine, path, speed=1.0, strict=True):
+    """Serves engine's requests from the cassette at path. Returns the ReplaySession."""
+    session = ReplaySession(Cassette.load(path), speed=speed, strict=strict)
+    engine.http = session
+    engine.cache.enabled = False
+    return session
+
+
+# ── Offline benchmark ──
+
+def benchmark(path, repeat=3):
+    """Replays every recorded completion through Engine.complete as fast as possible and
+    compares the client-side time with the time the server took when it was recorded."""
+    from lococode.engine import Engine
+
+    cassette = Cassette.load(path)
+    entries = cassette.completions()
+    if not entries:
+        print(f"{path}: no completions recorded")
+        return 1
+    print(f"{path}: {len(entries)} completion(s), best of {repeat}")
+    print(f"  {'#':>3} {'model':<28} {'chunks':>6} {'deltas':>6} {'server':>9} {'client':>9} {'per delta':>10}")
+    totals = {"server": 0.0, "client": 0.0, "deltas": 0}
+    mismatches = 0
+    for number, entry in enumerate(entries, 1):
+        payload = entry["payload"]
+        budget = {"max_tokens": payload.get("max_tokens", -1)}
+        if payload.get("stop"):
+            budget["stop"] = payload["stop"]
+        best, completion = float("inf"), None
+        for _ in range(repeat):
+            engine = Engine()
+            session = ReplaySession(Cassette(path, [entry]), speed=0)
+            engine.http = session
+            start = time.perf_counter()
+            completion = engine.complete(payload.get("model"), payload.get("messages", []), budget,
+                                         response_format=payload.get("response_format"), silent=True)
+            best = min(best, time.perf_counter() - start)
+            if session.misses:
+                mismatches += 1
+                break
+        chunks = entry.get("chunks") or [[0, ""]]
+        server = chunks[-1][0]
+        per_delta = f"{best / completion.deltas * 1e6:7.1f} us" if completion.deltas else "-"
+        status = "" if completion.error is None else f"  [{completion.error}]"
+        print(f"  {number:>3} {str(payload.get('model'))[:28]:<28} {len(entry.get('chunks', [])):>6} {completion.deltas:>6} "
+              f"{server * 1000:7.1f}ms {best * 1000:7.2f}ms {per_delta:>10}{status}")
+        totals["server"] += server
+        totals["client"] += best
+        totals["deltas"] += completion.deltas
+    share = totals["client"] / totals["server"] * 100 if totals["server"] else 0
+    print(f"  total: server {totals['server']:.2f}s, client {totals['client'] * 1000:.1f} ms "
+          f"({share:.2f}% of server time) over {totals['deltas']} deltas")
+    return 1 if mismatches else 0
+
+
+def info(path):
+    cassette = Cassette.load(path)
+    print(f"{path}: created {cassette.header.get('created', '?')}, base URL {cassette.header.get('base_url', '?')}")
+    for number, entry in enumerate(cassette.interactions, 1):
+        if entry.get("method") == "GET":
+            print(f"  {number:>3} GET  {entry.get('path')} -> {entry.get('status')}")
+            continue
+        payload = entry.get("payload") or {}
+        chunks = entry.get("chunks", [])
+        nbytes = sum(len(base64.b64decode(data)) for _, data in chunks)
+        duration = chunks[-1][0] if chunks else entry.get("headers_after", 0)
+        flag = "" if entry.get("complete", True) else "  (cut off)"
+        print(f"  {number:>3} POST {entry.get('path')} -> {entry.get('status')}  {payload.get('model')}, "
+              f"{len(payload.get('messages', []))} message(s), {len(chunks)} chunk(s), {nbytes} bytes, {duration:.2f}s{flag}")
+    return 0
+
+
+def main(argv=None):
+    """python -m lococode.cassettes <info|bench> CASSETTE"""
+    parser = argparse.ArgumentParser(prog="cassettes", description="Inspect and benchmark recorded LOCOCODE sessions (python cli.py --record FILE)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("info", help="List the recorded exchanges")
+    p.add_argument("cassette")
+    p = sub.add_parser("bench", help="Replay every completion with no pacing and time the client side")
+    p.add_argument("cassette")
+    p.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "info":
+            return info(args.cassette)
+        return benchmark(args.cassette, repeat=max(1, args.repeat))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import os
+import re
+import time
+import signal
+import subprocess
+from dataclasses import dataclass
+
+DEFAULT_TIMEOUT = 120.0
+MAX_FAILURE_LINES = 60       # Lines of check output fed back to the model
+MAX_FAILURE_CHARS = 4000
+HEAD_LINES = 25              # Of those, failure-looking lines from anywhere in the output; the rest is the tail
+
+ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+FAILURE_RE = re.compile(r"(error|fail|assert|traceback|exception|expected|^\s*File \"|^E\s|:\d+:\d*:?\s)", re.I)
+# Parts of the output that change between identical failures (durations, addresses, temp paths)
+VOLATILE_RE = re.compile(r"\d+(?:\.\d+)?\s?(?:ms|s|sec|seconds)\b|0x[0-9a-fA-F]+|/tmp/\S+|\d{4}-\d\d-\d\d[T ][\d:.]+")
+
+
+@dataclass
+class CheckResult:
+    command: str
+    returncode: int
+    output: str
+    seconds: float
+    timed_out: bool = False
+
+    @property
+    def passed(self):
+        return self.returncode == 0 and not self.timed_out
+
+    def summary(self):
+        if self.timed_out:
+            return f"timed out after {self.seconds:.0f}s"
+        return f"exit code {self.returncode} in {self.seconds:.1f}s"
+
+
+def run_check(command, timeout=DEFAULT_TIMEOUT, cwd=None):
+    """Runs a shell command (test runner, linter, build) and captures stdout+stderr.
+
+    On timeout the whole process group is killed, so runners that spawn workers
+    do not linger.
+    """
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, shell=True, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            stdin=subprocess.DEVNULL, text=True, errors="replace", start_new_session=os.name != "nt")
+    timed_out = False
+    try:
+        output, _ = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        try:
+            if os.name != "nt":
+                os.killpg(proc.pid, signal.SIGKILL)
+            else:
+                proc.kill()
+        except OSError:
+            pass
+        output, _ = proc.communicate()
+    except KeyboardInterrupt:
+        proc.kill()
+        proc.communicate()
+        raise
+    return CheckResult(command, proc.returncode, output or "", time.perf_counter() - start, timed_out)
+
+
+def trim_output(output, max_lines=MAX_FAILURE_LINES, max_chars=MAX_FAILURE_CHARS):
+    """The part of a failing check's output worth a prompt: failure-looking lines plus the tail,
+    where test runners and compilers print their summaries."""
+    lines = [line.rstrip() for line in ANSI_RE.sub("", output).splitlines()]
+    lines = [line for line in lines if line.strip()]
+    if len(lines) > max_lines:
+        tail_start = len(lines) - (max_lines - HEAD_LINES)
+        head = [line for line in lines[:tail_start] if FAILURE_RE.search(line)][:HEAD_LINES]
+        lines = head + ["..."] + lines[tail_start:]
+    text = "\n".join(lines)
+    if len(text) > max_chars:
+        text = "...\n" + text[-max_chars:].split("\n", 1)[-1]
+    return text
+
+
+def same_failure(a, b):
+    """True when two failed runs report the same failures (ignoring timings and addresses)."""
+    if a is None or b is None or a.passed or b.passed or a.timed_out != b.timed_out or a.returncode != b.returncode:
+        return False
+    return VOLATILE_RE.sub("", trim_output(a.output)) == VOLATILE_RE.sub("", trim_output(b.output))
@@ -1,6 +1,5 @@
 import sys
 import subprocess
-import shutil
 
 def install_package(package):
     """Installs a python package via pip."""
@@ -20,19 +19,13 @@ except ImportError:
         print("\033[31mError: Failed to install 'requests' automatically. Please run 'pip install requests' manually.\033[0m")
         sys.exit(1)
 
-import json
 import argparse
 import os
 import math
 import time
-import re
-import webbrowser
 import threading
-
-try:
-    import msvcrt
-except ImportError:
-    msvcrt = None
+import atexit
+import contextlib
 
 try:
     from prompt_toolkit import prompt
@@ -55,409 +48,67 @@ except ImportError:
 # Add the parent directory to sys.path so 'lococode' can be imported as a package
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from lococode.registry import ToolRegistry
-
-BASE_URL = "http://localhost:1234/v1"
+from lococode.registry import ToolRegistry, format_reload_report
+from lococode import context_budget
+from lococode.interpreter_pool import InterpreterPool
+from lococode.project_index import ProjectIndex
+from lococode.snapshots import SnapshotStore, save_backup
+from lococode.intent_router import get_intent_router
+from lococode.cancellation import CancelToken, KeyWatcher
+from lococode.engine import Engine, EditRequest
+from lococode.presenter import TerminalPresenter
+from lococode import routing
+from lococode import batch
+from lococode import daemon
+from lococode import tracing
+from lococode import profiling
+from lococode import render
+from lococode import cassettes
+from lococode import candidates
+
+# The embeddable core; this module only presents its events in the terminal
+engine = Engine()
+completion_cache = engine.cache
 
 def get_models():
     """Fetches a list of available models from LM Studio."""
-    try:
-        response = requests.get(f"{BASE_URL}/models")
-        if response.status_code == 200:
-            return response.json().get('data', [])
-        else:
-            print(f"Error fetching models: {response.status_code}")
-            return []
-    except requests.exceptions.ConnectionError:
-        return None
-
-BRACKET_RE = re.compile(r'([()\[\]{}<>])')
-
-def stream_response(model_id, messages, silent=False, color="\033[92m"):
-    """Sends a chat completion request with streaming enabled."""
-    payload = {"model": model_id, "messages": messages, "stream": True, "temperature": 0, "max_tokens": -1}
-    
-    try:
-        response = requests.post(f"{BASE_URL}/chat/completions", headers={"Content-Type": "application/json"}, data=json.dumps(payload), stream=True)
-        if response.status_code != 200: return None
-
-        content_list = []
-        is_generating = [True]
-        
-        class AnimState:
-            last_printed_lines = 0
-            wave_pos = 0.0
-            wave_dir = 1
-            last_time = time.time()
-            content_len = -1
-            display_text = ""
-            printed_lines = 0
-        state = AnimState()
-        
-        if not silent:
-            print("\033[?25l", end="") # Hide cursor
-
-        def animation_thread():
-            if silent: return
-            
-            while is_generating[0]:
-                if len(content_list) != state.content_len:
-                    state.content_len = len(content_list)
-                    text = "".join(content_list)
-                    
-                    try:
-                        term_width, term_height = os.get_terminal_size()
-                    except:
-                        term_width, term_height = 80, 24
-                    
-                    t_w = max(40, term_width - 2)
-                    max_lines = max(5, term_height - 5)
-                    
-                    full_str = "Assistant: " + text
-                    
-                    lines = []
-                    for paragraph in full_str.split('\n'):
-                        if not paragraph:
-                            lines.append("")
-                        else:
-                            for i in range(0, len(paragraph), t_w):
-                                lines.append(paragraph[i:i+t_w])
-                    
-                    if len(lines) > max_lines:
-                        lines = lines[-max_lines:]
-                        if len(lines[0]) >= 5:
-                            lines[0] = "(...)" + lines[0][5:]
-                        else:
-                            lines[0] = "(...)"
-                    
-                    state.display_text = '\n'.join(lines)
-                    state.printed_lines = len(lines) - 1 if lines else 0
-
-                display_text = state.display_text
-                printed_lines = state.printed_lines
-                current_time = time.time()
-                dt = current_time - state.last_time
-                state.last_time = current_time
-                wave_speed = 60.0 # Characters per second
-                
-                total_len = len(display_text)
-                if total_len > 0:
-                    trip_len = total_len + 15
-                    state.wave_pos += state.wave_dir * wave_speed * dt
-                    
-                    if state.wave_pos >= trip_len:
-                        state.wave_pos = trip_len
-                        state.wave_dir = -1
-                    elif state.wave_pos <= 0:
-                        state.wave_pos = 0
-                        state.wave_dir = 1
-                    wave_pos_int = int(state.wave_pos)
-                else:
-                    wave_pos_int = 0
-                
-                # Optimized coloring: Only color the area near the wave
-                colored_parts = []
-                last_color = None
-                
-                # Define color zones
-                # 0: yellow (dist < 2), 1: dark yellow (dist < 5), 2: brackets, 3: default
-                for i, char in enumerate(display_text):
-                    if char == '\n':
-                        colored_parts.append(char)
-                        last_color = None
-                        continue
-                    
-                    dist = abs(i - wave_pos_int)
-                    current_color = None
-                    
-                    if dist < 2:
-                        current_color = "\033[93m"
-                    elif dist < 5:
-                        current_color = "\033[33m"
-                    elif char in "()[]{}<>":
-                        current_color = "\033[36m"
-                    else:
-                        current_color = color
-                    
-                    if current_color != last_color:
-                        colored_parts.append(current_color)
-                        last_color = current_color
-                    colored_parts.append(char)
-                
-                colored_text = "".join(colored_parts) + "\033[0m"
-                
-                if state.last_printed_lines > 0:
-                    sys.stdout.write(f"\033[{state.last_printed_lines}A\r")
-                else:
-                    sys.stdout.write("\r")
-                sys.stdout.write("\033[J")
-                sys.stdout.write(colored_text)
-                sys.stdout.flush()
-                
-                state.last_printed_lines = printed_lines
-                time.sleep(0.05) # Increased sleep slightly for CPU efficiency
-
-        anim_t = None
-        if not silent:
-            anim_t = threading.Thread(target=animation_thread, daemon=True)
-            anim_t.start()
-            
-        def finalize_output(is_cancelled=False):
-            if not silent:
-                is_generating[0] = False
-                if anim_t: anim_t.join()
-                
-                if state.last_printed_lines > 0:
-                    sys.stdout.write(f"\033[{state.last_printed_lines}A\r\033[J")
-                else:
-                    sys.stdout.write("\r\033[J")
-                
-                final_text = "Assistant: " + "".join(content_list)
-                final_text = BRACKET_RE.sub(rf'\033[36m\1{color}', final_text)
-                print(f"{color}{final_text}\033[0m")
-            
-            if is_cancelled:
-                print("\n\033[1;33m[Cancelled]\033[0m")
-                
-            if not silent:
-                print("\033[?25h", end="", flush=True) # Show cursor
-
-        for line in response.iter_lines():
-            # Check for Escape key to cancel generation
-            if msvcrt and msvcrt.kbhit():
-                if msvcrt.getch() == b'\x1b':
-                    finalize_output(is_cancelled=True)
-                    response.close()
-                    while msvcrt.kbhit():  # Clear remaining key presses
-                        msvcrt.getch()
-                    return None
-
-            if line:
-                decoded = line.decode('utf-8')
-                if decoded.startswith("data: "):
-                    data_str = decoded[6:]
-                    if data_str.strip() == "[DONE]": break
-                    try:
-                        content = json.loads(data_str)['choices'][0].get('delta', {}).get('content', "")
-                        content_list.append(content)
-                    except: continue
-        
-        finalize_output(is_cancelled=False)
-        return "".join(content_list)
-    except: 
-        print("\033[?25h", end="", flush=True)
-        return None
-
-def classify_intent(model_id, instruction, registry):
-    """Planning step: classifies the user's intent, determines tags, and extracts arguments in one pass."""
-    tag_tools = [t for t in registry.tools if not t.is_slash]
-    tag_list = ", ".join([f"<tool:{t.name}> ({t.description})" for t in tag_tools])
-
-    intent_descriptions = {
-        "code_edit": "modify or write code in the current open file",
-        "general_question": "answer a question without modifying any files or taking any other actions"
-    }
-
-    for t in registry.tools:
-        if t.is_slash and t.intent:
-            arg_desc = f" (requires arg: {t.arg_description})" if t.arg_description else ""
-            # Some tool descriptions include "/command" instructions; strip or let it pass, the LLM will understand
-            intent_descriptions[t.intent] = f"{t.description}{arg_desc}"
-
-    intent_list_str = "\n".join([f"  - \"{intent}\": {desc}" for intent, desc in intent_descriptions.items()])
-    valid_intents_str = ", ".join([f'"{intent}"' for intent in intent_descriptions.keys()])
-
-    classify_prompt = (
-        "You are a planning assistant. Analyze the user's instruction and determine the correct action to take.\n\n"
-        "Available actions (intents):\n"
-        f"{intent_list_str}\n\n"
-        "Rules:\n"
-        f"1. You MUST choose exactly one intent from this list: [{valid_intents_str}]\n"
-        "2. Determine 'args': the primary argument required by the chosen intent (e.g. filename, search query, mode), or null if none required. For 'pair' or 'sequence', the arg is the full instruction.\n"
-        "3. Determine 'tags_needed': a list of tool tag names the model should use to fulfill the instruction.\n"
-        "4. Provide 'reasoning': a brief one-sentence explanation for your choice.\n"
-        "5. If the instruction contains EXACTLY TWO distinct steps (e.g. 'create a file then edit it'), you MUST choose the 'pair' intent.\n"
-        "6. If the instruction contains THREE OR MORE distinct steps, you MUST choose the 'sequence' intent.\n\n"
-        f"Available tool tags for 'tags_needed': {tag_list}\n\n"
-        "Respond with ONLY a JSON object. Examples:\n"
-        '{"intent": "code_edit", "args": null, "tags_needed": [], "reasoning": "User wants to modify the current file."}\n'
-        '{"intent": "create_file", "args": "app.py", "tags_needed": ["create_file", "edit_file"], "reasoning": "User wants a new app.py."}\n'
-        '{"intent": "file_switch", "args": "main.py", "tags_needed": [], "reasoning": "User wants to start editing main.py instead."}\n'
-        '{"intent": "pair", "args": "Create a new file called app.js and make it print hello world", "tags_needed": [], "reasoning": "Instruction involves exactly 2 distinct steps."}\n'
-        '{"intent": "sequence", "args": "Create app.py, add a route, and then run it", "tags_needed": [], "reasoning": "Instruction involves 3 or more distinct steps."}\n'
-        '{"intent": "ls", "args": null, "tags_needed": [], "reasoning": "User wants to list files in the directory."}'
-    )
-
-    messages = [
-        {"role": "system", "content": classify_prompt},
-        {"role": "user", "content": instruction}
-    ]
-
-    result = stream_response(model_id, messages, silent=True)
-    if not result:
-        return None
-
-    # Strip <think> blocks if present
-    result = re.sub(r"<think>.*?</think>", "", result, flags=re.DOTALL).strip()
-    # Try to extract JSON from the response
-    json_match = re.search(r'\{.*\}', result, re.DOTALL)
-    if json_match:
-        try:
-            return json.loads(json_match.group())
-        except json.JSONDecodeError:
-            return None
-    return None
-
-def apply_edit(target_file, instruction, model_id, registry, context, verbose=False, preplanned_intent=None):
-    """Reads the target file, sends instruction to model using SEARCH/REPLACE blocks, and updates the file."""
-    try:
-        with open(target_file, 'r', encoding='utf-8') as f:
-            current_content = f.read()
-    except Exception as e:
-        print(f"\033[31mError: {e}\033[0m")
-        return False
-
-    tool_prompt = registry.get_system_prompt_segment()
-    
-    if preplanned_intent:
-        intent_info = preplanned_intent
-        is_preplanned = True
-    else:
-        print(f"\033[90mPlanning...\033[0m", end="", flush=True)
-        intent_info = classify_intent('google/gemma-3n-e4b', instruction, registry)
-        is_preplanned = False
-        
-    if intent_info is None:
-        return False
-    
-    intent_context = ""
-    if intent_info:
-        intent = intent_info.get("intent", "code_edit")
-        tags_needed = intent_info.get("tags_needed", [])
-        reasoning = intent_info.get("reasoning", "")
-        arg = intent_info.get("args")
-        
-        if is_preplanned:
-            print(f"\033[90mPlan: {intent}", end="")
-        else:
-            print(f"\r\033[90mPlan: {intent}", end="")
-            
-        if tags_needed:
-            print(f" | Tags: {', '.join(tags_needed)}", end="")
-        print(f"\033[0m")
-        
-        plan_str = f"Plan: {intent}" + (f" | Tags: {', '.join(tags_needed)}" if tags_needed else "")
-
-
-        # ── Handle tool intents directly (Unified Planner) ──
-        matched_tool = registry.find_tool_by_intent(intent)
-        if matched_tool:
-            if matched_tool.arg_description:
-                if not arg:
-                    if matched_tool.name == "create_file":
-                        print(f"\033[33mNo filename specified, falling back to code editing.\033[0m")
-                        matched_tool = None
-                        intent = "code_edit"
-                    else:
-                        print(f"\033[31mCould not extract {matched_tool.arg_description} from instruction.\033[0m")
-                        return False
-                
-                if matched_tool:
-                    cmd_match = re.search(r'(/[a-z\d_]+)', matched_tool.pattern)
-                    if cmd_match:
-                        base_cmd = cmd_match.group(1)
-                        fake_input = f"{base_cmd} {arg}" if arg else base_cmd
-                        fake_match = re.search(matched_tool.pattern, fake_input, re.IGNORECASE | re.DOTALL)
-                        if fake_match:
-                            matched_tool.execute(fake_match, context)
-                            return True
-                    print(f"\033[31mFailed to build command for {matched_tool.name}.\033[0m")
-                    return False
-            else:
-                fake_match = re.match(matched_tool.pattern, matched_tool.pattern, re.IGNORECASE | re.DOTALL)
-                matched_tool.execute(fake_match, context)
-                return True
-
-        intent_context = f"\n\nPLAN: Intent={intent}."
-        if tags_needed:
-            intent_context += f" You MUST use these tool tags: {', '.join(['<tool:' + t + '>' for t in tags_needed])}."
-        if reasoning:
-            intent_context += f" ({reasoning})"
-                
-    else:
-        print(f"\r\033[90mPlan: default (code_edit)\033[0m")
-
-    research_section = ""
-    search_results = context.get("search_results", [])
-    if search_results:
-        research_section = "\n\nRESEARCH:\n" + "\n".join(search_results)
-        context["search_results"] = []
-
-    # SEARCH/REPLACE System Prompt
-    diff_system = (
-        f"You are an expert developer updating {target_file}. "
-        "To make changes, use SEARCH/REPLACE blocks. This is faster and uses fewer tokens.\n\n"
-        "Format:\n"
-        "<<<< SEARCH\n[exact code to find]\n====\n[replacement code]\n>>>> REPLACE\n\n"
-        "Rules:\n"
-        "1. SEARCH block must match the existing file content EXACTLY (including whitespace).\n"
-        "2. Only provide blocks for parts you are changing.\n"
-        "3. Do not output the whole file unless you are replacing it entirely.\n"
-        "4. No conversational filler. No markdown unless requested."
-    )
-
-    prompt = f"INST:\n{instruction}{research_section}\n\nCTX:\n{current_content}"
-    
-    messages = [
-        {"role": "system", "content": f"{diff_system} {tool_prompt}{intent_context}"},
-        {"role": "user", "content": prompt}
-    ]
-
-    print(f"\033[92mProcessing...\033[0m")
-    updated_content = stream_response(model_id, messages, color="\033[92m")
-
-    if updated_content:
-        updated_content = re.sub(r"<think>.*?</think>", "", updated_content, flags=re.DOTALL)
-
-        updated_content = registry.process_model_output(updated_content, context)
-
-        # Apply SEARCH/REPLACE blocks
-        blocks = re.findall(r"<<<< SEARCH\n(.*?)\n====\n(.*?)(?:\n>>>> REPLACE|$)", updated_content, re.DOTALL | re.MULTILINE)
-        
-        if blocks:
-            new_content = current_content
-            applied_count = 0
-            for search, replace in blocks:
-                if search in new_content:
-                    new_content = new_content.replace(search, replace, 1)
-                    applied_count += 1
-                else:
-                    print(f"\033[31mError: Search block not found in {target_file}. Check indentation/content.\033[0m")
-            
-            if applied_count > 0:
-                with open(context['target_file'], 'w', encoding='utf-8') as f:
-                    f.write(new_content)
-                print(f"\033[32mApplied {applied_count} change(s) to {context['target_file']}.\033[0m")
-                return True
-        else:
-            if "<<<< SEARCH" in updated_content:
-                print(f"\033[31mError: Model attempted to use SEARCH/REPLACE blocks but formatting was invalid.\033[0m")
-                return False
-                
-            # Fallback if no blocks found but model output content (maybe for general questions or tiny files)
-            cleaned = re.sub(r"```[a-z]*\n?", "", updated_content).replace("```", "").strip()
-            if cleaned and intent == "code_edit":
-                # If model ignored blocks but wrote code, we can overwrite if requested or just warn
-                # For safety/pro-engineer status, let's allow overwrite if it looks like a full file and blocks were missing
-                if len(cleaned) > 10:
-                    with open(context['target_file'], 'w', encoding='utf-8') as f:
-                        f.write(cleaned)
-                    print(f"\033[32mUpdated {context['target_file']} (full file fallback).\033[0m")
-                    return True
-            elif intent == "general_question":
-                return True # Already printed by stream_response
-
-    return False
+    return engine.get_models()
+
+def stream_response(model_id, messages, silent=False, color="\033[92m", stats=None, budget=None, call_site=None, cancel_token=None, response_format=None):
+    """Sends a chat completion request with streaming enabled and renders it.
+
+    See Engine.complete() for budget, reasoning and response_format handling. If a
+    stats dict is given it is filled with 'usage' (as reported by the server),
+    'finish_reason', 'deltas', 'reasoning_tokens', 'malformed' and 'cached'. ESC or
+    Ctrl+C (or cancelling cancel_token) aborts the request and returns None.
+    """
+    token = cancel_token or CancelToken()
+    with profiling.profiler.memory("stream_response"):
+        completion = engine.complete(model_id, messages, budget=budget, call_site=call_site, cancel_token=token,
+                                     response_format=response_format, silent=silent,
+                                     on_event=TerminalPresenter(color, cancel_token=token))
+    if stats is not None:
+        stats.update({"usage": completion.usage, "finish_reason": completion.finish_reason, "deltas": completion.deltas,
+                      "cached": completion.cached, "malformed": completion.malformed, "reasoning_tokens": completion.reasoning_tokens})
+    return completion.text if completion.ok else None
+
+def apply_edit(target_file, instruction, model_id, registry, context, verbose=False, preplanned_intent=None, call_site=None):
+    """Plans and applies an instruction to target_file through the engine, rendering progress.
+
+    When the context has a model_router, the planner and editor models come from it
+    (call_site overrides the edit call site, e.g. "write_run"); otherwise model_id is used.
+    Returns True on success.
+    """
+    context_engine = context.get('engine') or engine
+    request = EditRequest(target_file, instruction, plan=preplanned_intent, call_site=call_site,
+                          model=None if context.get('model_router') else model_id)
+    token = CancelToken()
+    presenter = TerminalPresenter(silent=context.get('headless', False), cancel_token=token)
+    with profiling.profiler.memory("apply_edit"):
+        result = context_engine.edit(request, context=context, cancel_token=token, on_event=presenter)
+    if result.error:
+        print(f"\033[31m{result.error}\033[0m")
+    return result.success
 
 def clear_console():
     """Clears the console window."""
@@ -636,101 +287,233 @@ def print_banner():
         print(line)
 
 
-def main():
+def start_backend(router):
+    """Starts the LM Studio server if needed and loads every model the router can pick."""
+    if isinstance(engine.http, cassettes.ReplaySession):
+        print(f"\n\033[1;34mReplaying {len(engine.http.cassette.completions())} recorded completion(s) from {engine.http.cassette.path}\033[0m")
+        return True
+    print("\n\033[1;34mConnecting to LM Studio and loading models...\033[0m")
+    
+    with tracing.span("server_probe", cat="startup") as trace:
+        models = get_models()
+        if models is None:
+            trace.set(started_server=True)
+            print("\033[90mStarting LM Studio server...\033[0m")
+            subprocess.Popen("lms server start", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+            for _ in range(20):
+                models = get_models()
+                if models is not None:
+                    print("\033[90mServer is up!\033[0m")
+                    break
+                time.sleep(1)
+
+    if models is None:
+        print("\033[31mError: Could not start or connect to LM Studio server.\033[0m")
+        return False
+
+    loaded_model_ids = [m.get('id') for m in models]
+    required_models = router.models()
+    
+    for req_model in required_models:
+        if not any(req_model in m_id for m_id in loaded_model_ids):
+            print(f"\033[90mLoading model {req_model}...\033[0m")
+            with tracing.span("model_load", cat="startup", model=req_model):
+                subprocess.run(f"lms load {req_model} --yes", shell=True)
+            
+    models = get_models()
+    if not models:
+        print("No models found. Please load a model in LM Studio.")
+        return False
+    return True
+
+def make_context(router, registry):
+    """The session state shared by the interactive loop and batch mode."""
+    # Spawn warm interpreters for /write_run in the background while the user types
+    interpreter_pool = InterpreterPool()
+    interpreter_pool.warm()
+    atexit.register(interpreter_pool.shutdown)
+    engine.router = router
+    engine.registry = registry
+    context = engine.context
+    context.update({
+        'model_id': router.default_model,
+        'model_router': router,
+        'stream_response': stream_response,
+        'apply_edit': apply_edit,
+        'completion_cache': completion_cache,
+        'context_budget': context_budget.ContextBudget(),
+        'interpreter_pool': interpreter_pool,
+        'project_index': ProjectIndex(os.getcwd()),
+        'snapshot_store': SnapshotStore(os.getcwd()),
+        'save_backup': save_backup,
+        'registry': registry,
+    })
+    get_intent_router(context)
+    return context
+
+def run_batch_mode(args, router):
+    """Headless mode: runs JSONL instructions from --batch and writes one JSON result per line."""
+    try:
+        jobs = batch.read_jobs(args.batch)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    # Keep stdout clean for results; progress goes to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        if not start_backend(router):
+            return 2
+    context = make_context(router, ToolRegistry())
+    output = sys.stdout if args.output in (None, "-") else open(args.output, "a", encoding="utf-8")
+    try:
+        def progress(result):
+            print(f"[{result['index'] + 1}/{len(jobs)}] {result['status']:<8} {result['file']}", file=sys.stderr)
+        results = batch.run_batch(jobs, context, workers=args.jobs or 4, output=output, on_result=progress)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(batch.summarize(results), file=sys.stderr)
+    return 0 if all(batch.succeeded(r) for r in results) else 1
+
+def run_daemon_mode(args, router):
+    """Keeps the registry, connection pool and indexes warm and serves requests until shut down."""
+    if not start_backend(router):
+        return 2
+    context = make_context(router, ToolRegistry())
+    context['project_index'].refresh(force=True)
+    daemon.serve(context, port=args.port, socket_path=args.socket, concurrency=args.jobs or daemon.DEFAULT_CONCURRENCY)
+    return 0
+
+def show_splash():
+    """Spins the 3D cube under the banner until a key is pressed. Returns the number of frames drawn."""
+    if render.plain_output():
+        print_banner()
+        return 0
     clear_console()
     banner_colored = get_banner_colored()
     
     print("\033[?25l", end="") # Hide cursor
     frame = 0
+    key_pressed = threading.Event()
+    policy = render.FramePolicy(min_interval=0.04)
+    previous_rows = []
     try:
-        while True:
-            try:
-                term_width, term_height = os.get_terminal_size()
-            except:
-                term_width, term_height = 80, 24
+        with KeyWatcher(lambda key: key_pressed.set()):
+            while True:
+                try:
+                    term_width, term_height = os.get_terminal_size()
+                except:
+                    term_width, term_height = 80, 24
                 
-            t_w = max(40, term_width - 1)
-            t_h = max(15, term_height - 1)
+                t_w = max(40, term_width - 1)
+                t_h = max(15, term_height - 1)
 
-            rot = frame * 0.05
-            cube_frame = get_cube_frame(rot, rot * 1.8, t_w, t_h)
-            
-            out = "\033[1;1H"
-            for i in range(t_h):
-                out += cube_frame[i] + "\033[K"
-                if i < t_h - 1:
-                    out += "\n"
+                rot = frame * 0.05
+                cube_frame = get_cube_frame(rot, rot * 1.8, t_w, t_h)
             
-            for i in range(5):
-                out += f"\033[{i+1};1H" + banner_colored[i]
+                rows = [cube_frame[i] + "\033[K" for i in range(t_h)]
+                for i in range(5):
+                    rows[i] += f"\033[{i+1};1H" + banner_colored[i]
                 
-            prompt_text = "Press any key to begin."
-            pad_len = max(0, (t_w - len(prompt_text)) // 2)
-            out += f"\033[{t_h};1H" + " " * pad_len + prompt_text + "\033[K"
+                prompt_text = "Press any key to begin."
+                pad_len = max(0, (t_w - len(prompt_text)) // 2)
+                rows[t_h - 1] = " " * pad_len + prompt_text + "\033[K"
+
+                # Rewrite only the rows that changed since the last frame
+                if len(rows) != len(previous_rows):
+                    previous_rows = []
+                out = "".join(f"\033[{i+1};1H{row}" for i, row in enumerate(rows)
+                              if i >= len(previous_rows) or row != previous_rows[i])
+                previous_rows = rows
+                write_start = time.perf_counter()
+                print(out, end="", flush=True)
+                policy.record_write(time.perf_counter() - write_start, len(out))
             
-            print(out, end="", flush=True)
-            
-            if msvcrt and msvcrt.kbhit():
-                while msvcrt.kbhit():
-                    msvcrt.getch()
-                clear_console()
-                print_banner()
-                break
+                # Any key (or no keyboard at all) moves on
+                if key_pressed.is_set() or not sys.stdin.isatty():
+                    clear_console()
+                    print_banner()
+                    break
                 
-            time.sleep(0.04)
-            frame += 1
+                key_pressed.wait(policy.interval())
+                frame += 1
     finally:
         print("\033[?25h", end="", flush=True)
+    return frame
 
-    print("\n\033[1;34mConnecting to LM Studio and loading models...\033[0m")
-    
-    models = get_models()
-    if models is None:
-        print("\033[90mStarting LM Studio server...\033[0m")
-        subprocess.Popen("lms server start", shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        
-        for _ in range(20):
-            models = get_models()
-            if models is not None:
-                print("\033[90mServer is up!\033[0m")
-                break
-            time.sleep(1)
-            
-    if models is None:
-        print("\033[31mError: Could not start or connect to LM Studio server.\033[0m")
-        sys.exit(1)
+def main():
+    parser = argparse.ArgumentParser(description="LOCOCODE - agentic coding CLI for local LLMs")
+    routing.add_arguments(parser)
+    parser.add_argument("--batch", metavar="FILE", help="Run JSONL instructions from FILE ('-' for stdin) without the interactive UI")
+    parser.add_argument("--jobs", type=int, help="Files edited in parallel in batch mode (default: 4), or concurrent requests in daemon mode (default: 2)")
+    parser.add_argument("--output", metavar="FILE", help="Append batch results as JSONL to FILE (default: stdout)")
+    parser.add_argument("--daemon", action="store_true", help="Serve edit/plan/run requests to thin clients (python daemon.py ...)")
+    parser.add_argument("--port", type=int, default=daemon.DEFAULT_PORT, help=f"Daemon port on localhost (default: {daemon.DEFAULT_PORT})")
+    parser.add_argument("--socket", metavar="PATH", help="Serve the daemon on a Unix socket instead of localhost HTTP")
+    parser.add_argument("--trace", metavar="FILE", help="Write a Chrome trace-event JSON of the session to FILE (open in Perfetto)")
+    parser.add_argument("--plain", action="store_true", help="No animation: stream answers as plain text (default when stdout is not a terminal)")
+    parser.add_argument("--profile", nargs="?", const="", metavar="DIR",
+                        help="Write cProfile/tracemalloc reports per instruction to DIR (default: .lococode/profiles/<time>)")
+    parser.add_argument("--candidates", type=int, metavar="N", help="Generate N code edit candidates in parallel and keep the best (default: 1)")
+    parser.add_argument("--record", metavar="FILE", help="Record every request and raw SSE response, with timing, into the cassette FILE")
+    parser.add_argument("--replay", metavar="FILE", help="Answer from the cassette FILE instead of a server")
+    parser.add_argument("--replay-speed", type=float, default=1.0, metavar="X",
+                        help="Replay pace relative to the recording (default: 1; 0 = as fast as possible)")
+    parser.add_argument("--replay-loose", action="store_true",
+                        help="Serve the next unused recording when a request is not in the cassette (default: HTTP 404)")
+    args = parser.parse_args()
+    if args.trace:
+        tracing.enable(args.trace)
+    if args.plain:
+        render.settings["mode"] = "plain"
+    if args.profile is not None:
+        print(f"\033[90mProfiling to {profiling.profiler.enable(args.profile or None)}\033[0m")
+    if args.candidates is not None:
+        if not 1 <= args.candidates <= candidates.MAX_N:
+            parser.error(f"--candidates must be between 1 and {candidates.MAX_N}")
+        candidates.settings["n"] = args.candidates
+    if args.record and args.replay:
+        parser.error("--record and --replay cannot be combined")
+    try:
+        if args.record:
+            cassettes.record(engine, args.record)
+        elif args.replay:
+            cassettes.replay(engine, args.replay, speed=max(0.0, args.replay_speed), strict=not args.replay_loose)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    try:
+        router = routing.ModelRouter.from_config(args=args)
+    except (ValueError, OSError) as e:
+        parser.error(str(e))
 
-    loaded_model_ids = [m.get('id') for m in models]
-    required_models = ["google/gemma-3n-e4b"]
-    
-    for req_model in required_models:
-        if not any(req_model in m_id for m_id in loaded_model_ids):
-            print(f"\033[90mLoading model {req_model}...\033[0m")
-            subprocess.run(f"lms load {req_model} --yes", shell=True)
-            
-    models = get_models()
-    if not models:
-        print("No models found. Please load a model in LM Studio.")
-        return
+    if args.batch:
+        sys.exit(run_batch_mode(args, router))
+    if args.daemon:
+        sys.exit(run_daemon_mode(args, router))
+
+    with tracing.span("splash", cat="startup") as trace, profiling.profiler.instruction("splash"):
+        trace.set(frames=show_splash())
+
+    if not start_backend(router):
+        sys.exit(1)
 
-    # Default to fast mode model
-    model_id = 'google/gemma-3n-e4b'
+    if len(router.models()) > 1:
+        print(f"\033[90mModel routing:\n{router.describe()}\033[0m")
     registry = ToolRegistry()
+    if registry.errors:
+        print(format_reload_report({"errors": registry.errors}))
     
     def print_status(ctx):
         print(f"\n\033[1;34mEditing Mode: {ctx['target_file']}\033[0m")
         slash_cmds = [t.pattern for t in ctx['registry'].tools if t.is_slash]
         # print(f"\033[90mCommands: {', '.join(slash_cmds)}\033[0m")
 
-    context = {
+    context = make_context(router, registry)
+    context.update({
         'target_file': 'index.html',
-        'model_id': model_id,
-        'stream_response': stream_response,
-        'apply_edit': apply_edit,
-        'registry': registry,
         'print_banner': print_banner,
         'print_status': print_status
-    }
+    })
 
     if not os.path.exists(context['target_file']):
         with open(context['target_file'], 'w', encoding='utf-8') as f:
@@ -754,6 +537,11 @@ def main():
                 instruction = input(f"\n\033[1;37m[{context['target_file']}] Edit Instruction: \033[0m")
                 
             if not instruction.strip(): continue
+
+            # Pick up new or edited action plugins without a restart
+            reload_report = registry.maybe_reload()
+            if reload_report and format_reload_report(reload_report):
+                print(format_reload_report(reload_report))
             
 
 
@@ -772,12 +560,13 @@ def main():
                 continue
 
 
-            # Run via registry (Slash commands)
-            if registry.run_slash_command(instruction, context):
-                continue
+            with tracing.span("instruction", cat="session", text=instruction[:80]), profiling.profiler.instruction(instruction):
+                # Run via registry (Slash commands)
+                if registry.run_slash_command(instruction, context):
+                    continue
 
-            # Apply normal edit
-            apply_edit(context['target_file'], instruction, context['model_id'], registry, context, verbose=False)
+                # Apply normal edit
+                apply_edit(context['target_file'], instruction, context['model_id'], registry, context, verbose=False)
         
         except KeyboardInterrupt: break
         except Exception as e: print(f"\nAn error occurred: {e}")
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+CACHE_DIR = os.path.join(".lococode", "cache")
+
+
+def cache_key(payload):
+    """Content-addressed key for a completion request.
+
+    Only the fields that influence the generated text are hashed (model, messages
+    and sampling params); transport flags like 'stream' are ignored.
+    """
+    keyed = {k: v for k, v in payload.items() if k not in ("stream", "stream_options")}
+    blob = json.dumps(keyed, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """Opt-in, disk-backed LRU cache of deterministic (temperature 0) completions.
+
+    Each entry stores the list of streamed content deltas so a hit can be replayed
+    through the same streaming/rendering path as a live response.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=500, max_bytes=64 * 1024 * 1024, enabled=False):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = None  # OrderedDict key -> size in bytes, least recently used first
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        self._index = OrderedDict()
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith(".json"):
+                st = entry.stat()
+                entries.append((st.st_mtime, entry.name[:-5], st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+
+    def is_cacheable(self, payload):
+        """Only greedy (temperature 0) requests are deterministic enough to cache."""
+        return self.enabled and payload.get("temperature", 1) == 0
+
+    def get(self, payload):
+        """Returns the cached list of content deltas for payload, or None."""
+        if not self.is_cacheable(payload):
+            return None
+        key = cache_key(payload)
+        with self._lock:
+            self._load_index()
+            if key not in self._index:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    deltas = json.load(f)["deltas"]
+            except (OSError, ValueError, KeyError):
+                self._index.pop(key, None)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            try:
+                os.utime(self._path(key))  # Persist recency for the next session
+            except OSError:
+                pass
+            self.hits += 1
+            return deltas
+
+    def put(self, payload, deltas):
+        """Stores a completed response, evicting least recently used entries past the caps."""
+        if not self.is_cacheable(payload) or not deltas:
+            return
+        key = cache_key(payload)
+        record = {"model": payload.get("model"), "created": time.time(), "deltas": deltas}
+        data = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._load_index()
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(self._path(key), "w", encoding="utf-8") as f:
+                    f.write(data)
+            except OSError:
+                return
+            self._index[key] = len(data.encode("utf-8"))
+            self._index.move_to_end(key)
+            self._evict()
+
+    def _evict(self):
+        total = sum(self._index.values())
+        while self._index and (len(self._index) > self.max_entries or total > self.max_bytes):
+            key, size = self._index.popitem(last=False)
+            total -= size
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._load_index()
+            for key in list(self._index):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._index.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            self._load_index()
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._index),
+                "bytes": sum(self._index.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
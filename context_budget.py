@@ -0,0 +1,151 @@
+import re
+import hashlib
+import threading
+
+# Default prompt budget (tokens) shared by the target file, instruction and RESEARCH sections
+DEFAULT_PROMPT_BUDGET = 12000
+# Sections that cannot keep at least this many tokens are dropped instead of truncated
+MIN_SECTION_TOKENS = 200
+
+_PIECE_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]|\n")
+
+_calibration = {"ratio": 1.0, "samples": 0}
+_calibration_lock = threading.Lock()
+
+
+def raw_estimate_tokens(text):
+    """Uncalibrated local token estimate.
+
+    BPE tokenizers split long words into several pieces, so each alphabetic run
+    costs one token per ~5 characters, digits one per ~3, and punctuation and
+    newlines one each. Indentation runs are usually merged into single tokens.
+    """
+    if not text:
+        return 0
+    count = 0
+    for piece in _PIECE_RE.findall(text):
+        c = piece[0]
+        if c.isalpha():
+            count += 1 + (len(piece) - 1) // 5
+        elif c.isdigit():
+            count += 1 + (len(piece) - 1) // 3
+        else:
+            count += 1
+    return count
+
+
+def estimate_tokens(text):
+    """Token estimate scaled by the calibration learned from server-reported usage."""
+    return int(raw_estimate_tokens(text) * _calibration["ratio"] + 0.5)
+
+
+def estimate_messages(messages, raw=False):
+    """Estimates the prompt cost of a chat message list (includes per-message overhead)."""
+    estimate = raw_estimate_tokens if raw else estimate_tokens
+    return sum(estimate(m.get("content") or "") + 4 for m in messages)
+
+
+def calibrate(raw_estimate, actual_tokens):
+    """Updates the estimate ratio from a real tokenizer count (e.g. usage.prompt_tokens).
+
+    Uses an exponential moving average so one odd prompt doesn't swing the ratio.
+    """
+    if not raw_estimate or not actual_tokens or raw_estimate < 50:
+        return
+    sample = actual_tokens / raw_estimate
+    if not 0.2 < sample < 5.0:
+        return
+    with _calibration_lock:
+        n = _calibration["samples"]
+        alpha = 1.0 / (n + 1) if n < 10 else 0.1
+        _calibration["ratio"] += alpha * (sample - _calibration["ratio"])
+        _calibration["samples"] = n + 1
+
+
+def calibration_ratio():
+    return _calibration["ratio"]
+
+
+def add_section(context, key, text, priority=0):
+    """Adds a RESEARCH section to context, replacing any earlier section with the same key."""
+    sections = context.setdefault("search_results", [])
+    sections[:] = [s for s in sections if not (isinstance(s, dict) and s.get("key") == key)]
+    sections.append({"key": key, "text": text, "priority": priority})
+
+
+def _normalize(sections):
+    """Turns context['search_results'] entries (dicts or plain strings) into deduped section dicts."""
+    normalized = {}
+    for order, section in enumerate(sections):
+        if isinstance(section, dict):
+            entry = dict(section)
+        else:
+            text = str(section)
+            entry = {"key": "text:" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:12], "text": text, "priority": 0}
+        entry["order"] = order
+        normalized[entry["key"]] = entry  # Later duplicates win
+    return list(normalized.values())
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Keeps the head and tail of text so that it fits in roughly max_tokens."""
+    total = estimate_tokens(text)
+    if total <= max_tokens:
+        return text
+    keep_chars = int(len(text) * max_tokens / total)
+    head = text[:int(keep_chars * 0.7)]
+    tail = text[len(text) - int(keep_chars * 0.3):]
+    return f"{head}\n[... {total - max_tokens} tokens truncated ...]\n{tail}"
+
+
+class ContextBudget:
+    """Fits RESEARCH sections into whatever is left of the prompt budget.
+
+    Sections are ranked by priority and then recency; the best-ranked ones are kept
+    whole, the first that doesn't fit is truncated, and the rest are dropped.
+    """
+
+    def __init__(self, max_tokens=DEFAULT_PROMPT_BUDGET):
+        self.max_tokens = max_tokens
+
+    def build(self, sections, fixed_text=""):
+        """Returns (research_text, report) for the given sections.
+
+        fixed_text is the part of the prompt that is always sent (system prompt,
+        instruction, target file); its estimated cost is taken off the budget first.
+        """
+        available = max(0, self.max_tokens - estimate_tokens(fixed_text))
+        report = {"available": available, "kept": [], "truncated": [], "dropped": []}
+        entries = _normalize(sections)
+        for entry in entries:
+            entry["tokens"] = estimate_tokens(entry["text"])
+
+        chosen = []
+        for entry in sorted(entries, key=lambda e: (e.get("priority", 0), e["order"]), reverse=True):
+            if entry["tokens"] <= available:
+                chosen.append(entry)
+                available -= entry["tokens"]
+                report["kept"].append((entry["key"], entry["tokens"]))
+            elif available >= MIN_SECTION_TOKENS:
+                trimmed = dict(entry)
+                trimmed["text"] = truncate_to_tokens(entry["text"], available)
+                chosen.append(trimmed)
+                report["truncated"].append((entry["key"], entry["tokens"], available))
+                available = 0
+            else:
+                report["dropped"].append((entry["key"], entry["tokens"]))
+
+        chosen.sort(key=lambda e: e["order"])
+        return "\n".join(e["text"] for e in chosen), report
+
+
+def format_report(report):
+    """One-line summary of what the budget kept, truncated and dropped."""
+    parts = []
+    if report["kept"]:
+        parts.append(f"kept {len(report['kept'])} section(s) ({sum(t for _, t in report['kept'])} tok)")
+    for key, before, after in report["truncated"]:
+        parts.append(f"truncated {key} ({before}->{after} tok)")
+    for key, tokens in report["dropped"]:
+        parts.append(f"dropped {key} ({tokens} tok)")
+    return "Context: " + ", ".join(parts) if parts else ""
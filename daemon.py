@@ -0,0 +1,407 @@
+import os
+import sys
+import json
+import hmac
+import time
+import secrets
+import socket
+import argparse
+import threading
+import http.client
+import socketserver
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_PORT = 8765
+DEFAULT_CONCURRENCY = 2
+MAX_QUEUED_PER_CLIENT = 32
+TOKEN_PATH = os.path.join(".lococode", "daemon.token")
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "[::1]"}
+
+
+def write_token(path=TOKEN_PATH):
+    """Creates a fresh per-session token in a file only the current user can read."""
+    token = secrets.token_urlsafe(32)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)  # A file another user created keeps its mode through O_CREAT
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    return token
+
+
+def find_token(path=None):
+    """The daemon token from path, or from .lococode/daemon.token in this or a parent directory."""
+    if path:
+        candidates = [path]
+    else:
+        directory, candidates = os.getcwd(), []
+        while True:
+            candidates.append(os.path.join(directory, TOKEN_PATH))
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+    for candidate in candidates:
+        try:
+            with open(candidate, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except OSError:
+            continue
+    return None
+
+
+class FairQueue:
+    """Round-robin job queue across clients with a fixed number of worker threads.
+
+    Each client has its own FIFO; workers take one job from each client in turn, so
+    one script submitting a hundred edits cannot starve an editor's single request.
+    At most `concurrency` jobs (and so backend requests) run at once.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, max_queued=MAX_QUEUED_PER_CLIENT):
+        self.concurrency = max(1, concurrency)
+        self.max_queued = max_queued
+        self._queues = OrderedDict()  # client -> deque of (future, fn, submitted); order is the rotation
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.active = 0
+        self.completed = 0
+        self._workers = [threading.Thread(target=self._work, daemon=True) for _ in range(self.concurrency)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, client, fn):
+        """Queues fn() for client. Returns a Future, or None when the client's queue is full."""
+        future = Future()
+        with self._cond:
+            queue = self._queues.get(client)
+            if queue is None:
+                queue = self._queues[client] = deque()
+            if len(queue) >= self.max_queued:
+                return None
+            queue.append((future, fn, time.time()))
+            self._cond.notify()
+        return future
+
+    def _next(self):
+        while not self._stopped:
+            for client in list(self._queues):
+                queue = self._queues.pop(client)
+                job = queue.popleft()
+                if queue:
+                    self._queues[client] = queue  # Back of the rotation
+                return job
+            self._cond.wait()
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next()
+                if job is None:
+                    return
+                self.active += 1
+            future, fn, submitted = job
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(time.time() - submitted))
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._cond:
+                self.active -= 1
+                self.completed += 1
+
+    def stats(self):
+        with self._cond:
+            return {"active": self.active, "completed": self.completed, "concurrency": self.concurrency,
+                    "queued": {client: len(queue) for client, queue in self._queues.items()}}
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+
+class DaemonState:
+    """The warm session shared by every request: engine, registry, indexes and the job queue."""
+
+    def __init__(self, context, concurrency):
+        from lococode.batch import ThreadOutput
+        self.context = dict(context, headless=True)
+        self.queue = FairQueue(concurrency)
+        self.started = time.time()
+        self._file_locks = {}
+        self._locks_lock = threading.Lock()
+        # Route every thread's prints into per-request buffers while serving
+        self.output = ThreadOutput(sys.stdout)
+        sys.stdout = self.output
+
+    def file_lock(self, path):
+        key = os.path.abspath(path) if path else ""
+        with self._locks_lock:
+            return self._file_locks.setdefault(key, threading.Lock())
+
+    def run_job(self, job):
+        """Runs an edit or slash command (serialized per file) and returns its result with the captured log."""
+        from lococode.batch import run_job, ANSI_RE
+        with self.file_lock(job.get("file")):
+            self.output.capture()
+            try:
+                self.reload_actions()
+                result = run_job(job, self.context)
+            finally:
+                log = ANSI_RE.sub("", self.output.release()).replace("\r", "\n")
+        result["log"] = "\n".join(line.rstrip() for line in log.splitlines() if line.strip())
+        return result
+
+    def reload_actions(self):
+        """Picks up edited action plugins between requests, so the daemon never needs a restart for them."""
+        from lococode.registry import format_reload_report
+        report = self.context["registry"].maybe_reload()
+        if report and format_reload_report(report):
+            print(format_reload_report(report))
+
+    def plan(self, instruction):
+        self.context["registry"].maybe_reload()
+        plan = self.context["engine"].plan(instruction, registry=self.context["registry"], router=self.context.get("model_router"))
+        return {"plan": plan.to_dict() if plan else None, "status": "ok" if plan else "error"}
+
+    def status(self):
+        index = self.context.get("project_index")
+        return {
+            "status": "ok",
+            "pid": os.getpid(),
+            "uptime": round(time.time() - self.started, 1),
+            "models": self.context["model_router"].models() if self.context.get("model_router") else [self.context.get("model_id")],
+            "indexed_files": len(index.files()) if index else None,
+            "queue": self.queue.stats(),
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state = None  # Set on the per-server subclass
+    token = None
+
+    def log_message(self, format, *args):
+        pass  # stdout belongs to the per-request capture
+
+    def _send(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _rejected(self):
+        """Sends an error and returns True unless the request comes from a local client holding the token.
+
+        Browsers always send Origin on cross-site POSTs and a page's own Host after DNS
+        rebinding, so either one marks a request a web page made; the token covers the rest.
+        """
+        self.close_connection = True  # Until accepted; a rejected request's body is never read
+        host = (self.headers.get("Host") or "").strip().lower()
+        if host.startswith("["):
+            host = host[:host.find("]") + 1]
+        else:
+            host = host.rsplit(":", 1)[0]
+        if self.headers.get("Origin") is not None or host not in LOCAL_HOSTS:
+            self._send(403, {"status": "error", "error": "Requests from web pages are not accepted."})
+            return True
+        auth = self.headers.get("Authorization") or ""
+        if not (auth.startswith("Bearer ") and hmac.compare_digest(auth[7:].strip().encode(), self.token.encode())):
+            self._send(401, {"status": "error", "error": f"Missing or wrong token (see {TOKEN_PATH})."})
+            return True
+        if self.command == "POST" and (self.headers.get("Content-Type") or "").split(";")[0].strip().lower() != "application/json":
+            self._send(415, {"status": "error", "error": "Content-Type must be application/json."})
+            return True
+        self.close_connection = False
+        return False
+
+    def do_GET(self):
+        if self._rejected():
+            return
+        if self.path == "/status":
+            self._send(200, self.state.status())
+        else:
+            self._send(404, {"status": "error", "error": f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        if self._rejected():
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(body, dict):
+                raise ValueError("Request body must be a JSON object.")
+        except ValueError as e:
+            self._send(400, {"status": "error", "error": str(e)})
+            return
+
+        state = self.state
+        client = self.headers.get("X-Client-Id") or "anonymous"
+        if self.path == "/shutdown":
+            self._send(200, {"status": "ok"})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        if self.path == "/plan":
+            if not body.get("instruction"):
+                self._send(400, {"status": "error", "error": "'instruction' is required."})
+                return
+            task = lambda waited: dict(state.plan(body["instruction"]), queued=round(waited, 3))
+        elif self.path in ("/edit", "/run"):
+            if self.path == "/edit" and not (body.get("file") and body.get("instruction")):
+                self._send(400, {"status": "error", "error": "'file' and 'instruction' are required."})
+                return
+            if self.path == "/run" and not str(body.get("command", "")).startswith("/"):
+                self._send(400, {"status": "error", "error": "'command' must be a slash command."})
+                return
+            job = {"id": body.get("id", 0), "index": 0, "file": body.get("file", ""),
+                   "instruction": body.get("instruction") if self.path == "/edit" else body["command"],
+                   "intent": body.get("intent")}
+
+            def task(waited, job=job):
+                result = state.run_job(job)
+                result["timings"]["queued"] = round(waited, 3)
+                return result
+        else:
+            self._send(404, {"status": "error", "error": f"Unknown endpoint {self.path}"})
+            return
+
+        future = state.queue.submit(client, task)
+        if future is None:
+            self._send(429, {"status": "error", "error": f"Too many queued requests for client '{client}'."})
+            return
+        try:
+            self._send(200, future.result())
+        except Exception as e:
+            self._send(500, {"status": "error", "error": f"{type(e).__name__}: {e}"})
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("local", 0)  # BaseHTTPRequestHandler expects a (host, port) address
+
+
+def serve(context, host="127.0.0.1", port=DEFAULT_PORT, socket_path=None, concurrency=DEFAULT_CONCURRENCY):
+    """Serves edit/plan/run requests from a warm context until /shutdown or Ctrl+C."""
+    state = DaemonState(context, concurrency)
+    token_path = os.path.abspath(TOKEN_PATH)
+    token = write_token(token_path)
+    handler = type("Handler", (_Handler,), {"state": state, "token": token})
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # Stale socket from a previous run
+        server = _UnixHTTPServer(socket_path, handler)
+        where = socket_path
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+        where = f"http://{host}:{port}"
+    print(f"\033[32mLOCOCODE daemon listening on {where} ({state.queue.concurrency} concurrent request(s)).\033[0m", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        state.queue.stop()
+        sys.stdout = state.output.stream
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+        if find_token(token_path) == token:  # Unless a newer daemon has replaced it
+            os.unlink(token_path)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(method, path, payload=None, port=DEFAULT_PORT, socket_path=None, client_id=None, timeout=None, token=None):
+    """Sends one request to a running daemon. Returns (status code, JSON body).
+
+    token defaults to the one the daemon wrote to .lococode/daemon.token.
+    """
+    if socket_path:
+        conn = _UnixHTTPConnection(socket_path, timeout=timeout)
+    else:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    headers = {"Content-Type": "application/json", "X-Client-Id": client_id or f"pid{os.getppid()}",
+               "Authorization": f"Bearer {token or find_token() or ''}"}
+    body = json.dumps(payload).encode("utf-8") if payload is not None else None
+    try:
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    finally:
+        conn.close()
+
+
+def client_main(argv=None):
+    """Thin client: python daemon.py [--port N | --socket PATH] <plan|edit|run|status|shutdown> ..."""
+    parser = argparse.ArgumentParser(prog="daemon.py", description="Client for a running LOCOCODE daemon (python cli.py --daemon)")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("LOCOCODE_PORT", DEFAULT_PORT)))
+    parser.add_argument("--socket", default=os.environ.get("LOCOCODE_SOCKET"), help="Unix socket path instead of localhost HTTP")
+    parser.add_argument("--client-id", default=os.environ.get("LOCOCODE_CLIENT"), help="Fairness key (default: parent process id)")
+    parser.add_argument("--token-file", default=os.environ.get("LOCOCODE_TOKEN_FILE"),
+                        help=f"Daemon token file (default: {TOKEN_PATH} here or in a parent directory)")
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON result")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("plan", help="Classify an instruction")
+    p.add_argument("instruction")
+    p = sub.add_parser("edit", help="Apply an instruction to a file")
+    p.add_argument("file")
+    p.add_argument("instruction")
+    p.add_argument("--intent", help="Skip planning with this intent")
+    p = sub.add_parser("run", help="Run a slash command, e.g. '/ls src'")
+    p.add_argument("slash_command")
+    p.add_argument("--file", default="", help="Target file for the command")
+    sub.add_parser("status", help="Show daemon status")
+    sub.add_parser("shutdown", help="Stop the daemon")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        method, path, payload = "GET", "/status", None
+    elif args.command == "shutdown":
+        method, path, payload = "POST", "/shutdown", {}
+    elif args.command == "plan":
+        method, path, payload = "POST", "/plan", {"instruction": args.instruction}
+    elif args.command == "edit":
+        method, path, payload = "POST", "/edit", {"file": os.path.abspath(args.file), "instruction": args.instruction, "intent": args.intent}
+    else:
+        method, path, payload = "POST", "/run", {"command": args.slash_command, "file": os.path.abspath(args.file) if args.file else ""}
+
+    try:
+        code, result = request(method, path, payload, port=args.port, socket_path=args.socket, client_id=args.client_id,
+                               token=find_token(args.token_file))
+    except OSError as e:
+        print(f"Could not reach the LOCOCODE daemon: {e}. Start it with: python cli.py --daemon", file=sys.stderr)
+        return 2
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+    else:
+        if result.get("log"):
+            print(result["log"])
+        if result.get("error"):
+            print(f"Error: {result['error']}", file=sys.stderr)
+        elif args.command in ("status", "plan"):
+            print(json.dumps(result.get("plan", result), indent=2, ensure_ascii=False))
+    return 0 if code == 200 and result.get("status") in ("ok", "applied", "answered", "tool") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(client_main())
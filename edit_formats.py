@@ -0,0 +1,386 @@
+import os
+import re
+import json
+import time
+import threading
+
+from lococode.context_budget import estimate_tokens
+
+EDIT_FORMAT_LOG = os.path.join(".lococode", "edit_formats.jsonl")
+
+# "auto" picks per edit with choose_format(); any format name forces that format
+settings = {"format": "auto"}
+
+# Selection thresholds (estimated tokens of the target file), tuned from /format stats
+WHOLE_MAX_TOKENS = 400       # Tiny files: rewriting costs less than quoting SEARCH text
+REWRITE_MAX_TOKENS = 1500    # "Rewrite ..." instructions get a whole-file reply up to this size
+LARGE_MIN_TOKENS = 2500      # Large files: line ranges or hunks instead of long SEARCH blocks
+
+REWRITE_RE = re.compile(r"\b(rewrite|from scratch|start over|(?:whole|entire) file|convert (?:it|this|the file) (?:to|into))\b", re.I)
+BROAD_RE = re.compile(r"\b(all|every|each|everywhere|throughout|rename|refactor|across)\b", re.I)
+FENCE_LINE_RE = re.compile(r"^```[a-zA-Z0-9_.+-]*$")
+
+BLOCK_RE = re.compile(r"<<<< SEARCH\n(.*?)\n====\n(.*?)(?:\n>>>> REPLACE|$)", re.DOTALL | re.MULTILINE)
+LINES_RE = re.compile(r"<<<< LINES (\d+)(?:\s*-\s*(\d+))?[ \t]*\n(.*?)\n?>>>> END", re.DOTALL)
+HUNK_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+NUMBERED_RE = re.compile(r"^\s*\d+\| ?")
+
+
+class EditFormat:
+    """How the model is asked to express an edit, and how its reply is parsed and applied.
+
+    parse() returns a list of edits; apply() returns (new_content, applied, failures)
+    where failures is a list of (edit, reason) pairs.
+    """
+
+    name = None
+    label = None
+
+    def system_prompt(self, target_file):
+        raise NotImplementedError
+
+    def render_context(self, content):
+        """The file as shown in CTX."""
+        return content
+
+    def drop_incomplete(self, text):
+        """Strips an edit cut off by the token cap so it is never applied."""
+        return text
+
+    def attempted(self, text):
+        """True when the reply tried to use this format (so an empty parse means it was malformed)."""
+        return False
+
+    def parse(self, text):
+        raise NotImplementedError
+
+    def apply(self, content, edits):
+        raise NotImplementedError
+
+
+class SearchReplaceFormat(EditFormat):
+    name = "search_replace"
+    label = "SEARCH/REPLACE blocks"
+
+    def system_prompt(self, target_file):
+        return (
+            f"You are an expert developer updating {target_file}. "
+            "To make changes, use SEARCH/REPLACE blocks. This is faster and uses fewer tokens.\n\n"
+            "Format:\n"
+            "<<<< SEARCH\n[exact code to find]\n====\n[replacement code]\n>>>> REPLACE\n\n"
+            "Rules:\n"
+            "1. SEARCH block must match the existing file content EXACTLY (including whitespace).\n"
+            "2. Only provide blocks for parts you are changing.\n"
+            "3. Do not output the whole file unless you are replacing it entirely.\n"
+            "4. No conversational filler. No markdown unless requested."
+        )
+
+    def drop_incomplete(self, text):
+        last_block = text.rfind("<<<< SEARCH")
+        if last_block != -1 and ">>>> REPLACE" not in text[last_block:]:
+            return text[:last_block]
+        return text
+
+    def attempted(self, text):
+        return "<<<< SEARCH" in text
+
+    def parse(self, text):
+        return BLOCK_RE.findall(text)
+
+    def apply(self, content, edits):
+        applied, failures = 0, []
+        for search, replace in edits:
+            if search in content:
+                content = content.replace(search, replace, 1)
+                applied += 1
+            else:
+                failures.append((search, "Search block not found in {file}. Check indentation/content."))
+        return content, applied, failures
+
+
+class UnifiedDiffFormat(EditFormat):
+    name = "unified_diff"
+    label = "unified diff hunks"
+
+    def system_prompt(self, target_file):
+        return (
+            f"You are an expert developer updating {target_file}. "
+            "To make changes, reply with a unified diff. Only changed regions are sent, which saves tokens on large files.\n\n"
+            "Format:\n"
+            "```diff\n@@ -12,4 +12,5 @@\n unchanged context line\n-removed line\n+added line\n unchanged context line\n```\n\n"
+            "Rules:\n"
+            "1. Every context (' ') and removed ('-') line must match the file EXACTLY (including whitespace).\n"
+            "2. Keep 1-2 lines of context around each change; use one hunk per changed region.\n"
+            "3. Line numbers in @@ headers are hints; context is what locates the hunk.\n"
+            "4. No conversational filler outside the diff."
+        )
+
+    def drop_incomplete(self, text):
+        # The last hunk may have lost its '+' lines; applying only its removals would delete code
+        if text.rstrip().endswith("```"):
+            return text
+        last_hunk = max(text.rfind("\n@@ "), -1 if not text.startswith("@@ ") else 0)
+        return text[:last_hunk] if last_hunk != -1 else text
+
+    def attempted(self, text):
+        return bool(re.search(r"^@@ ", text, re.M))
+
+    def parse(self, text):
+        hunks = []
+        hunk = None
+        lines = text.split("\n")
+        for i, line in enumerate(lines):
+            header = HUNK_RE.match(line)
+            if header:
+                hunk = {"start": int(header.group(1)), "old": [], "new": []}
+                hunks.append(hunk)
+                continue
+            if hunk is None:
+                continue
+            if line.startswith("```") or (line.startswith("--- ") and i + 1 < len(lines) and lines[i + 1].startswith("+++ ")):
+                hunk = None
+            elif line.startswith("+++ ") and not hunk["old"] and not hunk["new"]:
+                continue
+            elif line.startswith("+"):
+                hunk["new"].append(line[1:])
+            elif line.startswith("-"):
+                hunk["old"].append(line[1:])
+            elif line.startswith(" ") or line == "":
+                hunk["old"].append(line[1:])
+                hunk["new"].append(line[1:])
+            elif line.startswith("\\"):
+                continue  # "\ No newline at end of file"
+            else:
+                hunk = None  # Prose after the diff
+        for hunk in hunks:
+            # Models often pad hunks with blank lines; trailing blank context would rarely match
+            while hunk["old"] and hunk["new"] and hunk["old"][-1] == "" and hunk["new"][-1] == "":
+                hunk["old"].pop()
+                hunk["new"].pop()
+        return [h for h in hunks if h["old"] != h["new"]]
+
+    def _locate(self, lines, old, hint):
+        """Index where old occurs in lines, nearest to hint; whitespace-insensitive as a fallback."""
+        n = len(old)
+        for normalize in (lambda s: s, lambda s: s.strip()):
+            target = [normalize(s) for s in old]
+            positions = [i for i in range(len(lines) - n + 1)
+                         if normalize(lines[i]) == target[0] and [normalize(s) for s in lines[i:i + n]] == target]
+            if positions:
+                return min(positions, key=lambda i: abs(i - hint))
+        return None
+
+    def apply(self, content, edits):
+        lines = content.split("\n")
+        applied, failures = 0, []
+        offset = 0
+        for hunk in edits:
+            hint = max(0, hunk["start"] - 1 + offset)
+            if hunk["old"]:
+                index = self._locate(lines, hunk["old"], hint)
+            else:
+                index = min(hint, len(lines))  # Pure insertion
+            if index is None:
+                failures.append((hunk, f"Hunk @@ -{hunk['start']} @@ does not match {{file}}. Check context lines."))
+                continue
+            lines[index:index + len(hunk["old"])] = hunk["new"]
+            offset += len(hunk["new"]) - len(hunk["old"])
+            applied += 1
+        return "\n".join(lines), applied, failures
+
+
+class LineRangeFormat(EditFormat):
+    name = "line_range"
+    label = "LINES blocks"
+
+    def system_prompt(self, target_file):
+        return (
+            f"You are an expert developer updating {target_file}. "
+            "The file in CTX is shown with line numbers (`12| code`). To make changes, replace line ranges:\n\n"
+            "Format:\n"
+            "<<<< LINES 12-15\n[new code for lines 12 to 15, without line numbers]\n>>>> END\n\n"
+            "Rules:\n"
+            "1. Line numbers refer to the file as shown in CTX; ranges are inclusive and must not overlap.\n"
+            "2. An empty block deletes the lines. To insert, include a neighbouring line in the range and repeat it.\n"
+            "3. Only provide blocks for parts you are changing.\n"
+            "4. No conversational filler. No markdown unless requested."
+        )
+
+    def render_context(self, content):
+        return "\n".join(f"{i}| {line}" for i, line in enumerate(content.split("\n"), 1))
+
+    def drop_incomplete(self, text):
+        last_block = text.rfind("<<<< LINES")
+        if last_block != -1 and ">>>> END" not in text[last_block:]:
+            return text[:last_block]
+        return text
+
+    def attempted(self, text):
+        return "<<<< LINES" in text
+
+    def parse(self, text):
+        edits = []
+        for match in LINES_RE.finditer(text):
+            start = int(match.group(1))
+            end = int(match.group(2) or start)
+            body = match.group(3)
+            new = body.split("\n") if body else []
+            # Drop line-number prefixes the model copied from CTX
+            if new and all(NUMBERED_RE.match(line) for line in new if line.strip()):
+                new = [NUMBERED_RE.sub("", line, count=1) for line in new]
+            edits.append({"start": start, "end": end, "new": new})
+        return edits
+
+    def apply(self, content, edits):
+        lines = content.split("\n")
+        applied, failures = 0, []
+        taken = []
+        # Bottom-up so earlier line numbers stay valid
+        for edit in sorted(edits, key=lambda e: e["start"], reverse=True):
+            start, end = edit["start"], edit["end"]
+            if start < 1 or end < start or end > len(lines):
+                failures.append((edit, f"Line range {start}-{end} is outside {{file}} ({len(lines)} lines)."))
+                continue
+            if any(start <= t_end and t_start <= end for t_start, t_end in taken):
+                failures.append((edit, f"Line range {start}-{end} overlaps another block in {{file}}."))
+                continue
+            lines[start - 1:end] = edit["new"]
+            taken.append((start, end))
+            applied += 1
+        return "\n".join(lines), applied, failures
+
+
+class WholeFileFormat(EditFormat):
+    name = "whole_file"
+    label = "whole-file reply"
+
+    def system_prompt(self, target_file):
+        return (
+            f"You are an expert developer updating {target_file}. "
+            "The file is small: reply with the COMPLETE updated file and nothing else.\n\n"
+            "Rules:\n"
+            "1. Output the entire file content, including unchanged parts.\n"
+            "2. Use at most one code fence around it.\n"
+            "3. No conversational filler."
+        )
+
+    def drop_incomplete(self, text):
+        return ""  # Half a file must never overwrite the whole one
+
+    def parse(self, text):
+        # Only a fence wrapping the whole reply is markup; fences inside it (a README's examples) are content
+        lines = text.strip("\n").rstrip().split("\n")
+        if len(lines) >= 2 and FENCE_LINE_RE.match(lines[0].strip()) and lines[-1].strip() == "```":
+            lines = lines[1:-1]
+        text = "\n".join(lines).strip("\n")
+        return [text + "\n"] if text.strip() else []
+
+    def apply(self, content, edits):
+        return edits[-1], 1, []
+
+
+FORMATS = {fmt.name: fmt for fmt in (SearchReplaceFormat(), UnifiedDiffFormat(), LineRangeFormat(), WholeFileFormat())}
+ALIASES = {"sr": "search_replace", "search": "search_replace", "udiff": "unified_diff", "diff": "unified_diff",
+           "lines": "line_range", "whole": "whole_file", "full": "whole_file"}
+
+
+def resolve(name):
+    """Format for a name or alias, or None."""
+    name = (name or "").strip().lower()
+    return FORMATS.get(ALIASES.get(name, name))
+
+
+def edit_scope(instruction):
+    """'rewrite', 'broad' (many scattered changes) or 'local', guessed from the instruction."""
+    if REWRITE_RE.search(instruction or ""):
+        return "rewrite"
+    if BROAD_RE.search(instruction or ""):
+        return "broad"
+    return "local"
+
+
+def choose_format(content, instruction="", intent="code_edit", session=False):
+    """Picks the edit format for one request from the file size and the expected edit scope.
+
+    Only code edits adapt; other intents (questions, tag-driven replies) keep
+    SEARCH/REPLACE so an answer is never mistaken for a whole file. Session mode
+    sends diffs instead of the numbered file, so it never uses line ranges.
+    """
+    if intent != "code_edit":
+        return FORMATS["search_replace"]
+    forced = resolve(settings["format"])
+    if forced:
+        if forced.name == "line_range" and session:
+            return FORMATS["unified_diff"]
+        return forced
+    tokens = estimate_tokens(content)
+    scope = edit_scope(instruction)
+    if tokens <= WHOLE_MAX_TOKENS or (scope == "rewrite" and tokens <= REWRITE_MAX_TOKENS):
+        return FORMATS["whole_file"]
+    if tokens >= LARGE_MIN_TOKENS:
+        return FORMATS["unified_diff"] if scope == "broad" or session else FORMATS["line_range"]
+    return FORMATS["search_replace"]
+
+
+def format_for_reply(fmt, text):
+    """The format a reply actually uses: models sometimes answer in SEARCH/REPLACE or a
+    diff regardless of what was asked, and a whole-file parse would write those markers
+    into the file. Line ranges are only trusted when the numbered CTX was shown."""
+    if fmt.attempted(text):
+        return fmt
+    for other in (FORMATS["search_replace"], FORMATS["unified_diff"]):
+        if other is not fmt and other.attempted(text):
+            return other
+    return fmt
+
+
+_log_lock = threading.Lock()
+
+
+def record(fmt, file_tokens, output_tokens, applied, failed, status, model=None, requested=None):
+    """Appends one edit's outcome so the selection thresholds can be tuned from real data."""
+    entry = {
+        "ts": time.time(),
+        "format": fmt,
+        "requested": requested or fmt,
+        "model": model,
+        "file_tokens": file_tokens,
+        "output_tokens": output_tokens,
+        "applied": applied,
+        "failed": failed,
+        "status": status,
+    }
+    with _log_lock:
+        try:
+            os.makedirs(os.path.dirname(EDIT_FORMAT_LOG), exist_ok=True)
+            with open(EDIT_FORMAT_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError:
+            pass
+
+
+def summarize(path=EDIT_FORMAT_LOG):
+    """Per-format totals from the log: edits, success rate and output tokens per applied change."""
+    stats = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                s = stats.setdefault(entry["format"], {"edits": 0, "succeeded": 0, "changes": 0, "failed_changes": 0,
+                                                       "output_tokens": 0, "file_tokens": 0})
+                s["edits"] += 1
+                s["succeeded"] += entry["status"] == "applied"
+                s["changes"] += entry["applied"]
+                s["failed_changes"] += entry["failed"]
+                s["output_tokens"] += entry["output_tokens"] or 0
+                s["file_tokens"] += entry["file_tokens"] or 0
+    except OSError:
+        pass
+    for s in stats.values():
+        s["success_rate"] = s["succeeded"] / s["edits"]
+        s["tokens_per_change"] = s["output_tokens"] / s["changes"] if s["changes"] else None
+        s["avg_file_tokens"] = s["file_tokens"] / s["edits"]
+    return stats
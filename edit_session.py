@@ -0,0 +1,87 @@
+import os
+import difflib
+
+from lococode.context_budget import estimate_messages, estimate_tokens
+
+# Re-baseline once the rolling conversation is estimated above this many tokens
+MAX_HISTORY_TOKENS = 8000
+
+
+def compact_diff(before, after, target_file):
+    """Unified diff (2 lines of context) between two versions of a file."""
+    diff = difflib.unified_diff(
+        before.splitlines(keepends=True),
+        after.splitlines(keepends=True),
+        fromfile=f"a/{target_file}",
+        tofile=f"b/{target_file}",
+        n=2,
+    )
+    return "".join(line if line.endswith("\n") else line + "\n" for line in diff)
+
+
+class EditSession:
+    """Rolling multi-turn conversation for one target file.
+
+    The first turn sends the whole file; later turns append only a diff of what the
+    previous turn changed, so the server can reuse the KV cache for the unchanged
+    prefix instead of reprocessing the full file every time.
+    """
+
+    def __init__(self, target_file, system_prompt, content):
+        self.target_file = target_file
+        self.system_prompt = system_prompt
+        self.messages = [{"role": "system", "content": system_prompt}]
+        self.last_content = content
+        self.pending_diff = None  # Diff produced by the previous turn, sent with the next one
+        self.turns = 0
+
+    def is_valid_for(self, system_prompt, current_content, max_history_tokens=MAX_HISTORY_TOKENS):
+        """False when the session must be re-baselined (prompt changed, file edited elsewhere, history too long)."""
+        if system_prompt != self.system_prompt or current_content != self.last_content:
+            return False
+        return estimate_messages(self.messages) <= max_history_tokens
+
+    def user_turn(self, instruction_block):
+        """Builds the next user message. The first turn carries the full file as CTX."""
+        if self.turns == 0:
+            return f"{instruction_block}\n\nCTX:\n{self.last_content}"
+        if self.pending_diff:
+            changes = f"CHANGES APPLIED SINCE YOUR LAST REPLY:\n{self.pending_diff}"
+        else:
+            changes = "CHANGES APPLIED SINCE YOUR LAST REPLY: none (the file is unchanged)."
+        return f"{changes}\n\n{instruction_block}"
+
+    def request_messages(self, user_content):
+        return self.messages + [{"role": "user", "content": user_content}]
+
+    def record(self, user_content, assistant_content, new_content):
+        """Appends the finished turn and remembers the resulting file state."""
+        self.messages.append({"role": "user", "content": user_content})
+        self.messages.append({"role": "assistant", "content": assistant_content})
+        diff = compact_diff(self.last_content, new_content, self.target_file) if new_content != self.last_content else ""
+        self.pending_diff = diff
+        self.last_content = new_content
+        self.turns += 1
+        # A diff that costs as much as the file itself defeats the point; start over next turn
+        if diff and estimate_tokens(diff) > estimate_tokens(new_content) * 0.6:
+            self.system_prompt = None
+
+
+def _print_notice(message):
+    print(f"\033[90m({message})\033[0m")
+
+
+def get_session(context, target_file, system_prompt, current_content, notify=None):
+    """Returns the live session for target_file, re-baselining it when it is stale.
+
+    notify(message) reports the re-baseline; it prints when not given.
+    """
+    sessions = context.setdefault("edit_sessions", {})
+    key = os.path.abspath(target_file)
+    session = sessions.get(key)
+    if session is None or not session.is_valid_for(system_prompt, current_content):
+        if session is not None:
+            (notify or _print_notice)("Session re-baselined with the full file")
+        session = EditSession(target_file, system_prompt, current_content)
+        sessions[key] = session
+    return session
@@ -0,0 +1,789 @@
+import os
+import re
+import json
+import time
+import queue
+import asyncio
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+
+import requests
+
+from lococode.completion_cache import CompletionCache
+from lococode import context_budget
+from lococode.generation import budget_for, JsonStopDetector, log_truncation
+from lococode.edit_session import get_session
+from lococode.project_index import validate_file_arg
+from lococode.search_index import get_search_index
+from lococode.cancellation import CancelToken, abort_response
+from lococode.sse import SSEDecoder, SSE_READ_SIZE
+from lococode.think_filter import ThinkFilter
+from lococode import think_filter
+from lococode import planner
+from lococode import routing
+from lococode import snapshots
+from lococode import edit_formats
+from lococode import candidates
+from lococode import tracing
+from lococode.context_budget import estimate_tokens
+
+BASE_URL = "http://localhost:1234/v1"
+CACHEABLE_FINISH = ("stop", "json_complete")  # Replies that ended on their own (or at the early JSON stop)
+
+
+@dataclass
+class Usage:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    def add(self, usage):
+        self.prompt_tokens += (usage or {}).get("prompt_tokens") or 0
+        self.completion_tokens += (usage or {}).get("completion_tokens") or 0
+
+
+@dataclass
+class Timings:
+    """Seconds spent per phase; None for phases that did not run."""
+    plan: Optional[float] = None
+    generate: Optional[float] = None
+    apply: Optional[float] = None
+    total: Optional[float] = None
+
+
+@dataclass
+class Plan:
+    intent: str = "code_edit"
+    args: Optional[str] = None
+    tags_needed: list = field(default_factory=list)
+    reasoning: str = ""
+    preplanned: bool = False
+
+    @classmethod
+    def from_value(cls, value, preplanned=False):
+        """Builds a Plan from a planner dict, an intent name or a Plan."""
+        if value is None or isinstance(value, cls):
+            return value
+        if isinstance(value, str):
+            return cls(intent=value, preplanned=preplanned)
+        tags = value.get("tags_needed") or []
+        return cls(intent=value.get("intent") or "code_edit", args=value.get("args"),
+                   tags_needed=[t for t in tags if isinstance(t, str)] if isinstance(tags, list) else [],
+                   reasoning=value.get("reasoning") or "", preplanned=preplanned)
+
+    def to_dict(self):
+        return {"intent": self.intent, "args": self.args, "tags_needed": self.tags_needed, "reasoning": self.reasoning}
+
+
+@dataclass
+class Completion:
+    """One chat completion: the visible text plus what the stream reported about itself."""
+    text: Optional[str] = None
+    reasoning: str = ""
+    finish_reason: Optional[str] = None
+    usage: dict = field(default_factory=dict)
+    deltas: int = 0
+    reasoning_tokens: int = 0
+    malformed: int = 0
+    cached: bool = False
+    cancelled: bool = False
+    error: Optional[str] = None
+
+    @property
+    def ok(self):
+        return self.text is not None and not self.cancelled
+
+
+@dataclass
+class EditRequest:
+    """One instruction against one file.
+
+    plan skips the planner (a Plan, a planner dict or an intent name). model
+    forces a model for every call; otherwise the engine's router decides.
+    """
+    file: str
+    instruction: str
+    plan: object = None
+    call_site: Optional[str] = None
+    model: Optional[str] = None
+
+
+@dataclass
+class EditResult:
+    """status is 'applied', 'answered', 'tool', 'no_change', 'failed', 'cancelled' or 'error'."""
+    status: str
+    file: str
+    plan: Optional[Plan] = None
+    blocks_applied: int = 0
+    blocks_failed: int = 0
+    full_file: bool = False
+    edit_format: Optional[str] = None
+    output: Optional[str] = None
+    finish_reason: Optional[str] = None
+    usage: Usage = field(default_factory=Usage)
+    timings: Timings = field(default_factory=Timings)
+    error: Optional[str] = None
+
+    @property
+    def success(self):
+        return self.status in ("applied", "answered", "tool")
+
+    def to_dict(self):
+        data = asdict(self)
+        data["plan"] = self.plan.to_dict() if self.plan else None
+        return data
+
+
+def _ignore_event(name, data):
+    pass
+
+
+def _error_body(response):
+    try:
+        return response.text
+    except Exception:
+        return ""
+
+
+class Engine:
+    """LOCOCODE's planning, streaming and edit logic without any terminal output.
+
+    Progress is reported through on_event(name, data) callbacks (the CLI renders
+    them; embedders may ignore them). Session state that action plugins share
+    (search results, edit sessions, project index...) lives in self.context, and
+    every method also accepts a caller-provided context for per-job state. The
+    a* methods run the same work on a worker thread for asyncio callers.
+    """
+
+    def __init__(self, router=None, registry=None, base_url=BASE_URL, cache=None, context=None, on_event=None):
+        self.router = router or routing.ModelRouter()
+        self.registry = registry
+        self.base_url = base_url
+        self.http = requests.Session()  # Keeps the connection to the local server alive between calls
+        self.cache = cache or CompletionCache()
+        self.on_event = on_event
+        self.context = context if context is not None else {}
+        self._planner_prompt_cache = None  # ((registry id, registry version), prompt parts)
+        self.context.setdefault("engine", self)
+        self.context.setdefault("model_id", self.router.default_model)
+        self.context.setdefault("model_router", self.router)
+        self.context.setdefault("completion_cache", self.cache)
+        self.context.setdefault("context_budget", context_budget.ContextBudget())
+        self.context.setdefault("save_backup", snapshots.save_backup)
+        if registry is not None:
+            self.context.setdefault("registry", registry)
+
+    def _emit(self, on_event, name, **data):
+        handler = on_event or self.on_event
+        if handler:
+            handler(name, data)
+
+    def _notifier(self, on_event, level):
+        """notify(message) callback for helpers that would otherwise print."""
+        return lambda message: self._emit(on_event, "notice", level=level, message=message)
+
+    def get_models(self):
+        """Models the server offers, [] on an error response, None if it is unreachable."""
+        try:
+            response = self.http.get(f"{self.base_url}/models")
+            if response.status_code == 200:
+                return response.json().get('data', [])
+            return []
+        except requests.exceptions.ConnectionError:
+            return None
+
+    # ── Streaming ──
+
+    def _post(self, payload, token):
+        """Starts the streaming POST in a worker thread so cancellation works while the server
+        is still processing the prompt. Returns the response, or None if cancelled first."""
+        result = {}
+        done = threading.Event()
+
+        def run():
+            try:
+                result['response'] = self.http.post(f"{self.base_url}/chat/completions", headers={"Content-Type": "application/json"},
+                                                    data=json.dumps(payload), stream=True)
+            except Exception as e:
+                result['error'] = e
+            finally:
+                done.set()
+                if token.cancelled and 'response' in result:
+                    abort_response(result['response'])  # Nobody is listening anymore; free the server slot
+
+        threading.Thread(target=run, daemon=True).start()
+        try:
+            while not done.wait(0.05):
+                if token.cancelled:
+                    return None
+        except KeyboardInterrupt:
+            token.cancel("interrupt")
+            return None
+        if 'error' in result:
+            raise result['error']
+        return result['response']
+
+    def complete(self, model_id, messages, budget=None, call_site=None, cancel_token=None, response_format=None,
+                 silent=False, on_event=None, sampling=None):
+        """Streams one chat completion and returns a Completion.
+
+        budget is a generation budget from generation.budget_for(). <think> reasoning
+        is split off as it streams; past the budget's reasoning_budget the request is
+        cut off, and retried once with an answer-now prompt if on_reasoning_overflow
+        is "reprompt". Emits 'request_start'/'request_end' around the whole call and
+        'stream_start', 'delta' (with the ThinkFilter) and 'stream_end' around each
+        streamed response; silent is passed along as a display hint. sampling overrides
+        the greedy defaults (e.g. {"temperature": 0.7, "seed": 3}).
+        """
+        token = cancel_token or CancelToken()
+        self._emit(on_event, "request_start", silent=silent)
+        trace = tracing.span("completion", cat="llm", call_site=call_site, model=model_id)
+        completion = None
+        try:
+            completion = self._complete_once(model_id, messages, budget, call_site, token, response_format, silent, on_event, sampling)
+            if completion.finish_reason == "reasoning_budget" and (budget or {}).get("on_reasoning_overflow") == "reprompt":
+                self._emit(on_event, "reprompt", reasoning_tokens=completion.reasoning_tokens)
+                retry_messages = messages + [{"role": "user", "content": think_filter.REPROMPT}]
+                retry_budget = dict(budget, on_reasoning_overflow="cutoff")
+                first = completion
+                completion = self._complete_once(model_id, retry_messages, retry_budget, call_site, token, response_format, silent, on_event,
+                                                 sampling)
+                for key in ("prompt_tokens", "completion_tokens"):
+                    if first.usage.get(key):
+                        completion.usage[key] = completion.usage.get(key, 0) + first.usage[key]
+            return completion
+        finally:
+            if completion is not None:
+                trace.set(finish_reason=completion.finish_reason, cached=completion.cached,
+                          completion_tokens=completion.usage.get("completion_tokens", completion.deltas))
+            trace.end()
+            self._emit(on_event, "request_end")
+
+    def _complete_once(self, model_id, messages, budget, call_site, token, response_format, silent, on_event, sampling=None):
+        budget = budget or {}
+        reasoning_budget = budget.get("reasoning_budget")
+        if think_filter.settings["budget"] != "default":
+            reasoning_budget = think_filter.settings["budget"]
+        payload = {"model": model_id, "messages": messages, "stream": True, "temperature": 0, "max_tokens": budget.get("max_tokens", -1)}
+        if budget.get("stop"):
+            payload["stop"] = budget["stop"]
+        if sampling:
+            payload.update(sampling)
+        if response_format and model_id not in planner._schema_unsupported:
+            payload["response_format"] = response_format
+        json_detector = JsonStopDetector(budget["stop_after_json"]) if budget.get("stop_after_json") else None
+        completion = Completion()
+
+        try:
+            # Identical deterministic requests are replayed from the cache through the same path
+            cached_deltas = self.cache.get(payload)
+            response = None
+            if cached_deltas is None:
+                with tracing.span("http_connect", cat="llm") as trace:
+                    response = self._post(payload, token)
+                    if response is not None and response.status_code == 400 and "response_format" in payload:
+                        # Maybe no structured output on this backend; retry with prompt-only JSON and remember
+                        # the model only when the error names the schema or the retry proves it was the cause
+                        rejected = planner.schema_rejected(_error_body(response))
+                        del payload["response_format"]
+                        response.close()
+                        trace.set(schema_fallback=True)
+                        response = self._post(payload, token)
+                        if rejected or (response is not None and response.status_code == 200):
+                            planner.mark_schema_unsupported(model_id)
+                    trace.set(status=response.status_code if response is not None else None)
+                if response is None:
+                    completion.cancelled = True
+                    self._emit(on_event, "stream_end", completion=completion, silent=silent, started=False)
+                    return completion
+                token.on_cancel(lambda: abort_response(response))
+                if response.status_code != 200:
+                    completion.error = f"HTTP {response.status_code}"
+                    return completion
+            else:
+                tracing.instant("cache_hit", cat="llm", call_site=call_site)
+        except Exception as e:
+            completion.error = f"{type(e).__name__}: {e}"
+            return completion
+
+        content_list = []
+        think = ThinkFilter()
+
+        def iter_deltas():
+            if cached_deltas is not None:
+                completion.cached = True
+                yield from cached_deltas
+                return
+            decoder = SSEDecoder()
+            try:
+                for chunk in response.iter_content(chunk_size=SSE_READ_SIZE):
+                    for data in decoder.feed(chunk):
+                        if data == "[DONE]": return
+                        parsed = decoder.parse_delta(data)
+                        if parsed is None: continue
+                        content, finish_reason, usage, delta = parsed
+                        if usage:
+                            completion.usage = usage
+                        if finish_reason:
+                            completion.finish_reason = finish_reason
+                        if delta:
+                            # Some servers stream reasoning in a separate field instead of <think> tags
+                            think.add_reasoning(delta.get("reasoning_content") or delta.get("reasoning") or "")
+                        yield content
+                for data in decoder.flush():
+                    if data != "[DONE]":
+                        parsed = decoder.parse_delta(data)
+                        if parsed:
+                            yield parsed[0]
+            finally:
+                completion.malformed = decoder.malformed
+
+        self._emit(on_event, "stream_start", think=think, silent=silent, call_site=call_site)
+        # Prompt processing until the first token, then token generation, as consecutive spans
+        stream_trace = tracing.span("wait_first_token", cat="llm")
+        try:
+            for content in iter_deltas():
+                # A key watcher or an external cancel closes the stream from another thread
+                if token.cancelled:
+                    break
+
+                if content:
+                    if completion.deltas == 0:
+                        stream_trace.end()
+                        stream_trace = tracing.span("stream", cat="llm")
+                    content_list.append(content)
+                    completion.deltas += 1
+                    visible = think.feed(content)
+                    self._emit(on_event, "delta", think=think)
+                    if json_detector and visible and json_detector.feed(visible):
+                        # The planner answer is complete; stop paying for trailing tokens
+                        completion.finish_reason = "json_complete"
+                        if response: response.close()
+                        break
+                if reasoning_budget is not None and think.reasoning_deltas > reasoning_budget:
+                    completion.finish_reason = "reasoning_budget"
+                    if response: abort_response(response)
+                    break
+        except KeyboardInterrupt:
+            token.cancel("interrupt")
+        except Exception as e:
+            if not token.cancelled:
+                completion.error = f"{type(e).__name__}: {e}"
+
+        stream_trace.end(deltas=completion.deltas, reasoning_tokens=think.reasoning_deltas)
+        think.finish()
+        completion.reasoning = think.reasoning_text
+        completion.reasoning_tokens = think.reasoning_deltas
+        completion.cancelled = token.cancelled
+        if not completion.cancelled and not completion.error:
+            completion.text = think.visible_text
+        self._emit(on_event, "stream_end", completion=completion, think=think, silent=silent, started=True)
+        if not completion.ok:
+            return completion
+
+        if completion.malformed:
+            self._emit(on_event, "malformed", count=completion.malformed)
+        if completion.finish_reason == "length":
+            completion_tokens = completion.usage.get("completion_tokens", completion.deltas)
+            log_truncation(call_site, model_id, payload["max_tokens"], completion_tokens)
+            self._emit(on_event, "truncated", max_tokens=payload["max_tokens"], call_site=call_site)
+        if cached_deltas is None:
+            # Only finished replies: a hit restores the deltas but not finish_reason, so a cut-off
+            # edit would no longer be recognized as one
+            if completion.finish_reason in CACHEABLE_FINISH:
+                self.cache.put(payload, content_list)
+            prompt_tokens = completion.usage.get("prompt_tokens")
+            if prompt_tokens:
+                context_budget.calibrate(context_budget.estimate_messages(messages, raw=True), prompt_tokens)
+        return completion
+
+    def complete_candidates(self, n, model_id, messages, fmt, current_content, path, budget=None, call_site=None,
+                            cancel_token=None, on_event=None):
+        """Best-of-n: requests n completions in parallel (the greedy one plus rising temperatures
+        and fixed seeds) and scores each locally by how it applies to current_content.
+
+        The first candidate that applies cleanly and parses wins and the others are
+        cancelled; otherwise the best scoring one is picked once all have finished.
+        Returns (winner, candidates); winner is None when no candidate produced a reply.
+        Emits 'candidates_start', 'candidate' per finished candidate and 'candidate_chosen'.
+        """
+        token = cancel_token or CancelToken()
+        pool = [candidates.Candidate(i, temperature, seed) for i, (temperature, seed) in enumerate(candidates.sampling_for(n))]
+        tokens = [CancelToken() for _ in pool]
+        for child in tokens:
+            token.on_cancel(lambda child=child: child.cancel(token.reason))
+        finished = queue.Queue()
+
+        def run(candidate, child):
+            with tracing.span("candidate", cat="llm", index=candidate.index, temperature=candidate.temperature) as trace:
+                try:
+                    # Streams are not displayed; progress is reported per finished candidate
+                    candidate.completion = self.complete(model_id, messages, budget=budget, call_site=call_site, cancel_token=child,
+                                                         silent=True, on_event=_ignore_event, sampling=candidate.sampling)
+                    if candidate.ok:
+                        candidates.evaluate(candidate, fmt, current_content, path)
+                    trace.set(clean=candidate.clean, applied=candidate.applied, failed=candidate.failed)
+                finally:
+                    finished.put(candidate)
+
+        self._emit(on_event, "request_start", silent=True)
+        self._emit(on_event, "candidates_start", count=n, model=model_id)
+        winner = None
+        pending = 0  # Started and not yet finished; an interrupt while starting waits for exactly these
+        try:
+            for candidate, child in zip(pool, tokens):
+                threading.Thread(target=run, args=(candidate, child), daemon=True, name=f"candidate-{candidate.index}").start()
+                pending += 1
+            while pending:
+                try:
+                    candidate = finished.get(timeout=0.05)
+                except queue.Empty:
+                    continue
+                pending -= 1
+                self._emit(on_event, "candidate", candidate=candidate)
+                if winner is None and candidate.clean and not token.cancelled:
+                    winner = candidate
+                    for other, child in zip(pool, tokens):
+                        if other is not candidate:
+                            child.cancel("superseded")
+        except KeyboardInterrupt:
+            token.cancel("interrupt")
+            while pending:
+                finished.get()
+                pending -= 1
+        finally:
+            self._emit(on_event, "request_end")
+        if token.cancelled:
+            return None, pool
+        winner = winner or candidates.best(pool)
+        if winner is not None:
+            self._emit(on_event, "candidate_chosen", candidate=winner, count=n)
+        return winner, pool
+
+    # ── Planning ──
+
+    def _planner_prompt(self, registry):
+        """(classify_prompt, intent_descriptions, tag names) for registry, rebuilt only when its tools change."""
+        key = (id(registry), getattr(registry, "version", None))
+        cached = self._planner_prompt_cache
+        if cached is not None and cached[0] == key and key[1] is not None:
+            return cached[1]
+        tag_tools = [t for t in registry.tools if not t.is_slash]
+        tag_list = ", ".join([f"<tool:{t.name}> ({t.description})" for t in tag_tools])
+
+        intent_descriptions = planner.intent_descriptions(registry)
+        intent_list_str = "\n".join([f"  - \"{intent}\": {desc}" for intent, desc in intent_descriptions.items()])
+        valid_intents_str = ", ".join([f'"{intent}"' for intent in intent_descriptions.keys()])
+
+        classify_prompt = (
+            "You are a planning assistant. Analyze the user's instruction and determine the correct action to take.\n\n"
+            "Available actions (intents):\n"
+            f"{intent_list_str}\n\n"
+            "Rules:\n"
+            f"1. You MUST choose exactly one intent from this list: [{valid_intents_str}]\n"
+            "2. Determine 'args': the primary argument required by the chosen intent (e.g. filename, search query, mode), or null if none required. For 'pair' or 'sequence', the arg is the full instruction.\n"
+            "3. Determine 'tags_needed': a list of tool tag names the model should use to fulfill the instruction.\n"
+            "4. Provide 'reasoning': a brief one-sentence explanation for your choice.\n"
+            "5. If the instruction contains EXACTLY TWO distinct steps (e.g. 'create a file then edit it'), you MUST choose the 'pair' intent.\n"
+            "6. If the instruction contains THREE OR MORE distinct steps, you MUST choose the 'sequence' intent.\n\n"
+            f"Available tool tags for 'tags_needed': {tag_list}\n\n"
+            "Respond with ONLY a JSON object. Examples:\n"
+            '{"intent": "code_edit", "args": null, "tags_needed": [], "reasoning": "User wants to modify the current file."}\n'
+            '{"intent": "create_file", "args": "app.py", "tags_needed": ["create_file", "edit_file"], "reasoning": "User wants a new app.py."}\n'
+            '{"intent": "file_switch", "args": "main.py", "tags_needed": [], "reasoning": "User wants to start editing main.py instead."}\n'
+            '{"intent": "pair", "args": "Create a new file called app.js and make it print hello world", "tags_needed": [], "reasoning": "Instruction involves exactly 2 distinct steps."}\n'
+            '{"intent": "sequence", "args": "Create app.py, add a route, and then run it", "tags_needed": [], "reasoning": "Instruction involves 3 or more distinct steps."}\n'
+            '{"intent": "ls", "args": null, "tags_needed": [], "reasoning": "User wants to list files in the directory."}'
+        )
+
+        value = (classify_prompt, intent_descriptions, [t.name for t in tag_tools])
+        self._planner_prompt_cache = (key, value)
+        return value
+
+    def plan(self, instruction, model=None, registry=None, cancel_token=None, on_event=None, usage=None, router=None):
+        """Classifies the instruction's intent, tags and argument in one pass. Returns a Plan or None.
+
+        router is the session's ModelRouter (context['model_router']); the engine's own by default.
+        """
+        registry = registry or self.registry
+        classify_prompt, intent_descriptions, tag_names = self._planner_prompt(registry)
+
+        messages = [
+            {"role": "system", "content": classify_prompt},
+            {"role": "user", "content": instruction}
+        ]
+
+        model = model or (router or self.router).model_for("planner", instruction=instruction)
+        schema = planner.step_schema(intent_descriptions, tags=tag_names)
+        with tracing.span("classify_intent", cat="plan", model=model) as trace:
+            completion = self.complete(model, messages, budget=budget_for("planner"), call_site="planner", cancel_token=cancel_token,
+                                       response_format=planner.response_format("intent", schema, model), silent=True, on_event=on_event)
+            if usage is not None:
+                usage.update(completion.usage or {})
+            if not completion.ok:
+                return None
+            value = planner.parse_json(completion.text, "object")
+            plan = Plan.from_value(value) if isinstance(value, dict) else None
+            trace.set(intent=plan.intent if plan else None)
+            return plan
+
+    # ── Editing ──
+
+    def _run_tool(self, tool, plan, context, on_event):
+        """Runs a slash tool chosen by the planner. Returns (ran, error)."""
+        arg = plan.args
+        if tool.arg_description:
+            if tool.arg_file:
+                arg, arg_error = validate_file_arg(tool, arg, context.get('project_index'), notify=self._notifier(on_event, "info"))
+                if arg_error:
+                    return False, arg_error
+            cmd_match = re.search(r'(/[a-z\d_]+)', tool.pattern)
+            if cmd_match:
+                base_cmd = cmd_match.group(1)
+                fake_input = f"{base_cmd} {arg}" if arg else base_cmd
+                fake_match = re.search(tool.pattern, fake_input, re.IGNORECASE | re.DOTALL)
+                if fake_match:
+                    tool.execute(fake_match, context)
+                    return True, None
+            return False, f"Failed to build command for {tool.name}."
+        fake_match = re.match(tool.pattern, tool.pattern, re.IGNORECASE | re.DOTALL)
+        tool.execute(fake_match, context)
+        return True, None
+
+    def edit(self, request, context=None, cancel_token=None, on_event=None):
+        """Plans (unless request.plan is given) and carries out one instruction. Returns an EditResult.
+
+        Tool intents run the matching slash tool against the context; code edits are
+        generated in the edit format chosen for the file and written to request.file.
+        """
+        context = self.context if context is None else context
+        registry = context.get('registry') or self.registry
+        router = context.get('model_router') or self.router
+        start = time.time()
+        result = EditResult(status="error", file=request.file)
+        trace = tracing.span("edit", cat="edit", file=request.file)
+        intent_router = context.get('intent_router')
+        route = None
+
+        def finish(status, error=None):
+            result.status = status
+            result.error = error
+            result.timings.total = time.time() - start
+            if route is not None and status != "cancelled":
+                intent_router.confirm(route, result.plan, result.success)
+            trace.end(status=status, intent=result.plan.intent if result.plan else None, edit_format=result.edit_format)
+            return result
+
+        target_file = request.file
+        try:
+            with open(target_file, 'r', encoding='utf-8') as f:
+                current_content = f.read()
+        except Exception as e:
+            return finish("error", str(e))
+
+        tool_prompt = registry.get_system_prompt_segment()
+
+        if request.plan is not None:
+            plan = Plan.from_value(request.plan, preplanned=True)
+        else:
+            # Instructions like ones that went well before skip the planner call
+            if intent_router is not None:
+                with tracing.span("route_intent", cat="plan") as trace_route:
+                    route = intent_router.route(request.instruction, registry)
+                    trace_route.set(space=route.space, guess=route.guess, similarity=route.similarity, routed=route.plan is not None)
+            if route is not None and route.plan is not None:
+                plan = Plan.from_value(route.plan)
+                result.timings.plan = route.seconds
+                self._emit(on_event, "routed", route=route)
+            else:
+                self._emit(on_event, "planning")
+                plan_start = time.time()
+                plan_usage = {}
+                plan = self.plan(request.instruction, model=request.model, registry=registry, cancel_token=cancel_token, router=router,
+                                 on_event=on_event, usage=plan_usage)
+                result.timings.plan = time.time() - plan_start
+                result.usage.add(plan_usage)
+                if cancel_token is not None and cancel_token.cancelled:
+                    return finish("cancelled")
+                if plan is None:
+                    return finish("error", "Planning failed.")
+                if route is not None:
+                    intent_router.observe_planner(route, plan, result.timings.plan)
+        result.plan = plan
+        self._emit(on_event, "plan", plan=plan)
+
+        # ── Handle tool intents directly (Unified Planner) ──
+        intent = plan.intent
+        matched_tool = registry.find_tool_by_intent(intent)
+        if matched_tool:
+            if matched_tool.arg_description and not plan.args and not matched_tool.arg_optional:
+                if matched_tool.name == "create_file":
+                    self._emit(on_event, "notice", level="warning", message="No filename specified, falling back to code editing.")
+                    matched_tool = None
+                    intent = "code_edit"
+                else:
+                    return finish("error", f"Could not extract {matched_tool.arg_description} from instruction.")
+            if matched_tool:
+                ran, error = self._run_tool(matched_tool, plan, context, on_event)
+                return finish("tool" if ran else "error", error)
+
+        intent_context = f"\n\nPLAN: Intent={intent}."
+        if plan.tags_needed:
+            intent_context += f" You MUST use these tool tags: {', '.join(['<tool:' + t + '>' for t in plan.tags_needed])}."
+        if plan.reasoning:
+            intent_context += f" ({plan.reasoning})"
+
+        # The edit format (SEARCH/REPLACE, unified diff, line ranges, whole file) follows file and change size
+        instruction = request.instruction
+        fmt = edit_formats.choose_format(current_content, instruction, intent, session=bool(context.get('session_mode')))
+        routed = route is not None and route.plan is not None
+        if routed and fmt.name == "whole_file":
+            # A misrouted question answered in prose must not become the new file
+            fmt = edit_formats.FORMATS["search_replace"]
+        result.edit_format = fmt.name
+        diff_system = fmt.system_prompt(target_file)
+        ctx_content = fmt.render_context(current_content)
+
+        if context.get('auto_context'):
+            # Pull the most relevant snippets from elsewhere in the project (below explicit /read priority)
+            search_index = get_search_index(context)
+            if search_index:
+                search_index.update()
+                target_rel = os.path.relpath(os.path.abspath(target_file), search_index.project_index.root)
+                for key, text in search_index.snippets(instruction, k=context.get('auto_context_k', 5), exclude=[target_rel]):
+                    context_budget.add_section(context, key, text, priority=-1)
+
+        research_section = ""
+        search_results = context.get("search_results", [])
+        if search_results:
+            budget = context.get("context_budget") or context_budget.ContextBudget()
+            research_text, report = budget.build(search_results, fixed_text=f"{diff_system} {tool_prompt}{intent_context}{instruction}\n{ctx_content}")
+            if report["truncated"] or report["dropped"]:
+                self._emit(on_event, "research_report", report=report)
+            if research_text:
+                research_section = "\n\nRESEARCH:\n" + research_text
+            context["search_results"] = []
+
+        session = None
+        if context.get('session_mode'):
+            # Keep the system prompt stable and put per-turn plan info in the user turn so the server's prefix cache holds
+            session = get_session(context, target_file, f"{diff_system} {tool_prompt}", ctx_content,
+                                  notify=self._notifier(on_event, "info"))
+            prompt = session.user_turn(f"INST:\n{instruction}{intent_context}{research_section}")
+            messages = session.request_messages(prompt)
+        else:
+            prompt = f"INST:\n{instruction}{research_section}\n\nCTX:\n{ctx_content}"
+            messages = [
+                {"role": "system", "content": f"{diff_system} {tool_prompt}{intent_context}"},
+                {"role": "user", "content": prompt}
+            ]
+
+        def record_turn(result_content):
+            if session:
+                session.record(prompt, result.output, result_content)
+
+        call_site = "general_question" if intent == "general_question" else (request.call_site or "code_edit")
+        model = request.model or router.model_for(call_site, current_content, instruction)
+        self._emit(on_event, "generating", call_site=call_site, model=model)
+        generate_start = time.time()
+        budget = budget_for(call_site, current_content, instruction)
+        n = candidates.count_for(context)
+        if intent == "code_edit" and n > 1:
+            winner, pool = self.complete_candidates(n, model, messages, fmt, current_content, target_file, budget=budget,
+                                                    call_site=call_site, cancel_token=cancel_token, on_event=on_event)
+            for candidate in pool:
+                if candidate.completion is not None:
+                    result.usage.add(candidate.completion.usage)
+            completion = winner.completion if winner else next((c.completion for c in pool if c.completion), Completion(cancelled=True))
+            if winner is None and cancel_token is not None and cancel_token.cancelled:
+                completion.cancelled = True
+        else:
+            completion = self.complete(model, messages, budget=budget, call_site=call_site, cancel_token=cancel_token, on_event=on_event)
+            result.usage.add(completion.usage)
+        result.timings.generate = time.time() - generate_start
+        result.finish_reason = completion.finish_reason
+        if completion.cancelled:
+            return finish("cancelled")
+        if not completion.text:
+            return finish("error", completion.error or "Empty response from the model.")
+
+        apply_start = time.time()
+        updated_content = completion.text
+        if completion.finish_reason == "length":
+            # Never apply an edit that was cut off mid-way
+            updated_content = fmt.drop_incomplete(updated_content)
+
+        result.output = updated_content
+        with tracing.span("tag_tools", cat="tool"):
+            updated_content = registry.process_model_output(updated_content, context)
+        status = "no_change"
+        requested_format = fmt.name
+        fmt = edit_formats.format_for_reply(fmt, updated_content)
+        result.edit_format = fmt.name
+
+        with tracing.span("parse_edits", cat="edit", format=fmt.name) as trace_parse:
+            edits = fmt.parse(updated_content)
+            trace_parse.set(edits=len(edits))
+        if edits:
+            with tracing.span("apply_edits", cat="edit", format=fmt.name):
+                new_content, result.blocks_applied, failures = fmt.apply(current_content, edits)
+            result.blocks_failed = len(failures)
+            for edit, reason in failures:
+                self._emit(on_event, "block_failed", file=target_file, search=edit, reason=reason.format(file=target_file))
+            if result.blocks_applied:
+                context.get('save_backup', snapshots.save_backup)(context, target_file, notify=self._notifier(on_event, "warning"))
+                with tracing.span("write_file", cat="io", file=target_file, chars=len(new_content)):
+                    with open(target_file, 'w', encoding='utf-8') as f:
+                        f.write(new_content)
+                result.full_file = fmt.name == "whole_file"
+                self._emit(on_event, "applied", file=target_file, count=result.blocks_applied, full_file=result.full_file)
+                record_turn(new_content)
+                status = "applied"
+            else:
+                record_turn(current_content)
+                status = "failed"
+        elif fmt.attempted(updated_content):
+            self._emit(on_event, "notice", level="error", message=f"Model attempted to use {fmt.label} but formatting was invalid.")
+            record_turn(current_content)
+            status = "failed"
+        else:
+            # Fallback if no blocks found but model output content (maybe for general questions or tiny files)
+            cleaned = re.sub(r"```[a-z]*\n?", "", updated_content).replace("```", "").strip()
+            if cleaned and intent == "code_edit" and len(cleaned) > 10 and routed:
+                # Without the planner's word this may be an answer to a question; never overwrite the file with it
+                self._emit(on_event, "notice", level="warning",
+                           message="The reply has no edits for this routed instruction; the file was left unchanged.")
+                record_turn(current_content)
+                status = "failed"
+            elif cleaned and intent == "code_edit" and len(cleaned) > 10:
+                # The model ignored the block format but wrote code: treat it as the whole file
+                context.get('save_backup', snapshots.save_backup)(context, target_file, notify=self._notifier(on_event, "warning"))
+                with tracing.span("write_file", cat="io", file=target_file, chars=len(cleaned)):
+                    with open(target_file, 'w', encoding='utf-8') as f:
+                        f.write(cleaned)
+                result.full_file = True
+                self._emit(on_event, "applied", file=target_file, count=0, full_file=True)
+                record_turn(cleaned)
+                status = "applied"
+            elif intent == "general_question":
+                record_turn(current_content)
+                status = "answered"
+            else:
+                record_turn(current_content)
+        result.timings.apply = time.time() - apply_start
+        if intent == "code_edit" and not completion.cached:
+            output_tokens = (completion.usage or {}).get("completion_tokens") or estimate_tokens(completion.text)
+            edit_formats.record(fmt.name, estimate_tokens(current_content), output_tokens, result.blocks_applied,
+                                result.blocks_failed, status, model=model, requested=requested_format)
+        return finish(status)
+
+    # ── asyncio wrappers ──
+
+    async def acomplete(self, *args, **kwargs):
+        return await asyncio.to_thread(self.complete, *args, **kwargs)
+
+    async def aplan(self, *args, **kwargs):
+        return await asyncio.to_thread(self.plan, *args, **kwargs)
+
+    async def aedit(self, *args, **kwargs):
+        return await asyncio.to_thread(self.edit, *args, **kwargs)
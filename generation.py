@@ -0,0 +1,128 @@
+import os
+import json
+import time
+import threading
+
+from lococode.context_budget import estimate_tokens
+
+TRUNCATION_LOG = os.path.join(".lococode", "truncations.jsonl")
+
+# Per call-site generation budgets.
+#   max_tokens:      hard cap sent to the server (-1 = unlimited)
+#   stop:            server-side stop sequences
+#   stop_after_json: "object"/"array" closes the stream as soon as the first complete JSON value is out
+#   reasoning_budget: max <think> tokens before the stream is cut off (None = unlimited)
+#   on_reasoning_overflow: "cutoff" returns what was answered so far, "reprompt" retries once asking for the answer
+GENERATION_BUDGETS = {
+    "planner": {"max_tokens": 256, "stop": None, "stop_after_json": "object",
+                "reasoning_budget": 512, "on_reasoning_overflow": "reprompt"},
+    "pair_planner": {"max_tokens": 512, "stop": None, "stop_after_json": "array",
+                     "reasoning_budget": 768, "on_reasoning_overflow": "reprompt"},
+    "sequence_planner": {"max_tokens": 768, "stop": None, "stop_after_json": "array",
+                         "reasoning_budget": 768, "on_reasoning_overflow": "reprompt"},
+    "general_question": {"max_tokens": 2048, "stop": None, "stop_after_json": None,
+                         "reasoning_budget": None, "on_reasoning_overflow": "cutoff"},
+    # Edits are sized adaptively in budget_for(); these are the floor and ceiling
+    "code_edit": {"max_tokens": 2048, "max_cap": 16384, "stop": None, "stop_after_json": None,
+                  "reasoning_budget": None, "on_reasoning_overflow": "reprompt"},
+}
+
+
+def budget_for(call_site, file_text="", instruction=""):
+    """Returns the generation budget for a call site.
+
+    Edit budgets scale with the target file (a full rewrite is the worst case) and
+    the instruction, within the code_edit floor and ceiling.
+    """
+    if call_site == "write_run":
+        call_site = "code_edit"
+    budget = dict(GENERATION_BUDGETS.get(call_site, {"max_tokens": -1, "stop": None, "stop_after_json": None}))
+    if call_site == "code_edit":
+        base = GENERATION_BUDGETS["code_edit"]
+        adaptive = 512 + int(estimate_tokens(file_text) * 1.3) + estimate_tokens(instruction) * 4
+        budget["max_tokens"] = min(base["max_cap"], max(base["max_tokens"], adaptive))
+        if budget.get("reasoning_budget") is not None and budget["max_tokens"] > 0:
+            budget["max_tokens"] += budget["reasoning_budget"]  # Thinking shares the output cap
+    budget.pop("max_cap", None)
+    return budget
+
+
+class JsonStopDetector:
+    """Incrementally scans streamed text and reports when the first complete JSON value has closed.
+
+    Braces inside strings and inside <think>...</think> blocks are ignored.
+    """
+
+    def __init__(self, kind="object"):
+        self.open_char = "{" if kind == "object" else "["
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escape = False
+        self.done = False
+        self._buffer = ""
+        self._pos = 0
+
+    def feed(self, text):
+        if self.done:
+            return True
+        self._buffer += text
+        buf = self._buffer
+        while self._pos < len(buf):
+            if not self.started:
+                think_start = buf.find("<think>", self._pos)
+                opening = buf.find(self.open_char, self._pos)
+                if think_start != -1 and (opening == -1 or think_start < opening):
+                    think_end = buf.find("</think>", think_start)
+                    if think_end == -1:
+                        return False  # Wait for the reasoning block to close
+                    self._pos = think_end + len("</think>")
+                    continue
+                if opening == -1:
+                    # Keep a short tail in case a "<think>" tag is split across deltas
+                    self._pos = max(self._pos, len(buf) - len("<think>"))
+                    return False
+                self.started = True
+                self.depth = 1
+                self._pos = opening + 1
+                continue
+            c = buf[self._pos]
+            self._pos += 1
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif c == "\\":
+                    self.escape = True
+                elif c == '"':
+                    self.in_string = False
+            elif c == '"':
+                self.in_string = True
+            elif c in "{[":
+                self.depth += 1
+            elif c in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.done = True
+                    return True
+        return False
+
+
+_log_lock = threading.Lock()
+
+
+def log_truncation(call_site, model_id, max_tokens, completion_tokens):
+    """Appends a hit-the-cap record so per-site caps can be tuned from real data."""
+    record = {
+        "ts": time.time(),
+        "call_site": call_site,
+        "model": model_id,
+        "max_tokens": max_tokens,
+        "completion_tokens": completion_tokens,
+    }
+    with _log_lock:
+        try:
+            os.makedirs(os.path.dirname(TRUNCATION_LOG), exist_ok=True)
+            with open(TRUNCATION_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError:
+            pass
@@ -0,0 +1,359 @@
+import os
+import re
+import json
+import math
+import time
+import zlib
+import threading
+from array import array
+from dataclasses import dataclass, field
+from typing import Optional
+
+INDEX_PATH = os.path.join(".lococode", "intent_router.json")
+INDEX_VERSION = 2
+
+settings = {
+    "enabled": True,
+    "embedding_model": "text-embedding-nomic-embed-text-v1.5",
+}
+
+MAX_ENTRIES = 2000
+K = 5
+EMBED_THRESHOLD = 0.90     # Cosine similarity a neighbor needs to count, embedding space
+HASH_THRESHOLD = 0.95      # Same for the hashing vectorizer: word overlap cannot tell "fix X" from "explain X"
+SINGLE_MATCH = 0.97        # One neighbor this close is enough; otherwise two must agree
+AGREEMENT = 0.8            # Share of the qualifying neighbors' weight the winning intent needs
+DUPLICATE = 0.99           # A new example this close to a stored one with the same plan just refreshes it
+SHADOW_MIN = 5             # Planner agreements an intent needs in a space before the router may answer for it
+SHADOW_ACCURACY = 0.95     # Share of its shadow guesses (and routed outcomes) that must have been right
+EMBED_TIMEOUT = 2.0
+EMBED_RETRY_AFTER = 300.0  # Seconds before retrying /embeddings after it failed
+HASH_DIM = 1 << 18
+
+# Intents whose plan carries nothing from the instruction itself, so a neighbor's plan can be reused
+ALWAYS_ROUTABLE = {"code_edit", "general_question"}
+
+_WORD_RE = re.compile(r"[a-z0-9_]+(?:\.[a-z0-9]+)*")
+
+
+def hash_vector(text):
+    """Sparse L2-normalized hashing-vectorizer features: words and word bigrams."""
+    words = _WORD_RE.findall(text.lower())
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = {}
+    for feature in features:
+        h = zlib.crc32(feature.encode("utf-8"))
+        index = h % HASH_DIM
+        vector[index] = vector.get(index, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {i: v / norm for i, v in vector.items() if v} if norm else {}
+
+
+def _sparse_dot(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(i, 0.0) for i, v in a.items())
+
+
+def _dense_dot(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def _normalized(values):
+    norm = math.sqrt(sum(v * v for v in values))
+    return array("f", (v / norm for v in values)) if norm else None
+
+
+def _entry_to_json(entry):
+    data = dict(entry, hash={str(i): v for i, v in entry["hash"].items()})
+    if entry.get("embed") is not None:
+        data["embed"] = list(entry["embed"])
+    return data
+
+
+def _entry_from_json(data):
+    """A stored example with its types checked, so a hand-edited file cannot smuggle in odd values."""
+    embed = data.get("embed")
+    return {
+        "instruction": str(data["instruction"]),
+        "intent": str(data["intent"]),
+        "tags": [str(t) for t in data.get("tags", [])],
+        "hash": {int(i): float(v) for i, v in data["hash"].items()},
+        "embed_model": str(data["embed_model"]) if data.get("embed_model") else None,
+        "embed": array("f", (float(v) for v in embed)) if embed is not None else None,
+        "hits": int(data.get("hits", 0)),
+        "misses": int(data.get("misses", 0)),
+        "added": float(data.get("added", 0)),
+        "used": float(data.get("used", 0)),
+    }
+
+
+@dataclass
+class Route:
+    """The router's answer for one instruction. plan is None unless the match was confident."""
+    instruction: str
+    space: str
+    vectors: dict
+    guess: Optional[str] = None
+    similarity: float = 0.0
+    support: int = 0
+    plan: Optional[dict] = None
+    seconds: float = 0.0
+    neighbors: list = field(default_factory=list)  # [(similarity, entry)]
+
+
+class IntentRouter:
+    """Nearest-neighbor intent routing over past instructions, in front of the LLM planner.
+
+    Each instruction is embedded with the backend's /embeddings endpoint (a hashing
+    vectorizer when that is unavailable) and compared with stored examples. When
+    close neighbors agree on an intent that needs no argument, their plan is
+    reused and classify_intent is skipped, but only for intents whose guesses in
+    that vector space have kept matching the planner while it still ran (a routed
+    instruction that fails counts against them). Examples are added only from confirmed
+    outcomes (the edit applied, the question was answered, the tool ran); the
+    index holds at most max_entries, evicting the least recently useful, and is
+    saved as JSON under .lococode between sessions.
+    """
+
+    def __init__(self, engine=None, path=INDEX_PATH, max_entries=MAX_ENTRIES):
+        self.engine = engine
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._embed_failed_at = None
+        self.entries = []
+        self.shadow = {}  # (space, intent) -> [right, judged]
+        self.stats = {"lookups": 0, "routed": 0, "routed_ok": 0, "routed_failed": 0, "shadow": 0, "shadow_agree": 0,
+                      "lookup_seconds": 0.0, "planner_calls": 0, "planner_seconds": 0.0, "evicted": 0}
+        self.dirty = False
+        self._load()
+
+    # ── Persistence ──
+
+    def _load(self):
+        """Restores a saved index; anything unreadable or from another version starts an empty one."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return
+            entries = [_entry_from_json(e) for e in data["entries"]]
+            shadow = {(str(space), str(intent)): [int(right), int(judged)] for space, intent, right, judged in data["shadow"]}
+            stats = {key: type(self.stats[key])(value) for key, value in data["stats"].items() if key in self.stats}
+        except Exception:
+            return
+        self.entries, self.shadow = entries, shadow
+        self.stats.update(stats)
+
+    def save(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            data = {"version": INDEX_VERSION, "entries": [_entry_to_json(e) for e in self.entries],
+                    "shadow": [[space, intent, right, judged] for (space, intent), (right, judged) in self.shadow.items()],
+                    "stats": self.stats}
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp, self.path)
+                self.dirty = False
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self.entries = []
+            self.shadow = {}
+            for key in self.stats:
+                self.stats[key] = 0.0 if isinstance(self.stats[key], float) else 0
+            self.dirty = True
+
+    # ── Vectors ──
+
+    def embed(self, text):
+        """(model, normalized vector) from the backend, or None when it has no embedding model."""
+        engine = self.engine
+        model = settings["embedding_model"]
+        if engine is None or not model:
+            return None
+        if self._embed_failed_at is not None and time.monotonic() - self._embed_failed_at < EMBED_RETRY_AFTER:
+            return None
+        try:
+            response = engine.http.post(f"{engine.base_url}/embeddings", headers={"Content-Type": "application/json"},
+                                        data=json.dumps({"model": model, "input": text}), timeout=EMBED_TIMEOUT)
+            if response.status_code == 200:
+                vector = _normalized(response.json()["data"][0]["embedding"])
+                if vector is not None:
+                    self._embed_failed_at = None
+                    return model, vector
+        except Exception:
+            pass
+        self._embed_failed_at = time.monotonic()
+        return None
+
+    def _vectors(self, text):
+        vectors = {"hash": hash_vector(text)}
+        embedded = self.embed(text)
+        if embedded is not None:
+            vectors["embed_model"], vectors["embed"] = embedded
+        return vectors
+
+    def _neighbors(self, vectors):
+        """(space, [(similarity, entry)] best first). Uses embeddings when the query and entries share a model."""
+        model = vectors.get("embed_model")
+        if model and any(e.get("embed_model") == model for e in self.entries):
+            space = model
+            scored = [(_dense_dot(vectors["embed"], e["embed"]), e) for e in self.entries if e.get("embed_model") == model]
+        else:
+            space = "hashing"
+            scored = [(_sparse_dot(vectors["hash"], e["hash"]), e) for e in self.entries]
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return space, scored[:K]
+
+    # ── Routing ──
+
+    def _routable(self, intent, registry):
+        if intent in ALWAYS_ROUTABLE:
+            return True
+        tool = registry.find_tool_by_intent(intent) if registry is not None else None
+        return tool is not None and not tool.arg_description
+
+    def _trusted(self, space, intent):
+        right, judged = self.shadow.get((space, intent), (0, 0))
+        return right >= SHADOW_MIN and right / judged >= SHADOW_ACCURACY
+
+    def _judge(self, space, intent, right):
+        record = self.shadow.setdefault((space, intent), [0, 0])
+        record[0] += int(right)
+        record[1] += 1
+
+    def route(self, instruction, registry=None):
+        """Looks up instruction; returns a Route whose plan is set when the neighbors are confident."""
+        start = time.perf_counter()
+        vectors = self._vectors(instruction)
+        with self._lock:
+            space, neighbors = self._neighbors(vectors)
+        route = Route(instruction, space, vectors, neighbors=neighbors)
+        threshold = HASH_THRESHOLD if space == "hashing" else EMBED_THRESHOLD
+        close = [(sim, e) for sim, e in neighbors if sim >= threshold]
+        if close:
+            weights = {}
+            for sim, e in close:
+                weights[e["intent"]] = weights.get(e["intent"], 0.0) + sim
+            route.guess = max(weights, key=weights.get)
+            agreeing = [(sim, e) for sim, e in close if e["intent"] == route.guess]
+            route.similarity = agreeing[0][0]
+            route.support = len(agreeing)
+            tags = {tuple(e.get("tags", [])) for _, e in agreeing}
+            confident = (weights[route.guess] / sum(weights.values()) >= AGREEMENT
+                         and (route.support >= 2 or route.similarity >= SINGLE_MATCH)
+                         and len(tags) == 1)
+            if (confident and settings["enabled"] and self._routable(route.guess, registry)
+                    and self._trusted(space, route.guess)):
+                best = agreeing[0][1]
+                route.plan = {"intent": route.guess, "args": None, "tags_needed": list(best.get("tags", [])),
+                              "reasoning": f"Matches {route.support} earlier instruction(s) like \"{best['instruction'][:60]}\" "
+                                           f"(similarity {route.similarity:.2f})."}
+        route.seconds = time.perf_counter() - start
+        with self._lock:
+            self.stats["lookups"] += 1
+            self.stats["lookup_seconds"] += route.seconds
+            if route.plan is not None:
+                self.stats["routed"] += 1
+                now = time.time()
+                for _, e in close:
+                    if e["intent"] == route.guess:
+                        e["used"] = now
+            self.dirty = True
+        return route
+
+    def observe_planner(self, route, plan, seconds):
+        """Records a planner call the router could not answer, and whether its guess would have been right."""
+        with self._lock:
+            self.stats["planner_calls"] += 1
+            self.stats["planner_seconds"] += seconds or 0.0
+            if route is not None and route.guess is not None and plan is not None:
+                self.stats["shadow"] += 1
+                self.stats["shadow_agree"] += int(route.guess == plan.intent)
+                self._judge(route.space, route.guess, route.guess == plan.intent)
+            self.dirty = True
+
+    def confirm(self, route, plan, success):
+        """Learns from a finished instruction: stores confirmed plans and scores routed ones."""
+        if route is None or plan is None:
+            return
+        with self._lock:
+            if route.plan is not None:
+                self.stats["routed_ok" if success else "routed_failed"] += 1
+                for _, e in route.neighbors:
+                    if e["intent"] == route.guess and success:
+                        e["hits"] = e.get("hits", 0) + 1
+                if not success:
+                    self._judge(route.space, route.guess, False)
+                    for _, e in route.neighbors:
+                        if e["intent"] == route.guess:
+                            e["misses"] = e.get("misses", 0) + 1
+                    # Examples that keep misleading the router are dropped
+                    self.entries = [e for e in self.entries if e.get("misses", 0) < 2 or e.get("misses", 0) <= e.get("hits", 0)]
+                    self.dirty = True
+                    return
+            if not success:
+                return
+            self._add(route, plan)
+            self.dirty = True
+
+    def _add(self, route, plan):
+        tags = sorted(plan.tags_needed or [])
+        now = time.time()
+        for sim, e in route.neighbors:
+            if sim >= DUPLICATE and e["intent"] == plan.intent and e.get("tags", []) == tags:
+                e["hits"] = e.get("hits", 0) + 1
+                e["used"] = now
+                return
+        vectors = route.vectors
+        self.entries.append({"instruction": route.instruction, "intent": plan.intent, "tags": tags, "hash": vectors["hash"],
+                             "embed_model": vectors.get("embed_model"), "embed": vectors.get("embed"),
+                             "hits": 1, "misses": 0, "added": now, "used": now})
+        if len(self.entries) > self.max_entries:
+            # Evict the least recently useful examples
+            self.entries.sort(key=lambda e: e.get("used", 0), reverse=True)
+            self.stats["evicted"] += len(self.entries) - self.max_entries
+            del self.entries[self.max_entries:]
+
+    def summary(self):
+        """Counts, precision and latency for /router stats."""
+        with self._lock:
+            s = dict(self.stats)
+            intents = {}
+            for e in self.entries:
+                intents[e["intent"]] = intents.get(e["intent"], 0) + 1
+            models = {e.get("embed_model") for e in self.entries if e.get("embed_model")}
+            entries = len(self.entries)
+            trusted = sorted({intent for (space, intent) in self.shadow if self._trusted(space, intent)})
+        judged = s["routed_ok"] + s["routed_failed"]
+        return {
+            "entries": entries,
+            "intents": intents,
+            "embedding_models": sorted(models),
+            "lookups": s["lookups"],
+            "routed": s["routed"],
+            "precision": s["routed_ok"] / judged if judged else None,
+            "shadow_accuracy": s["shadow_agree"] / s["shadow"] if s["shadow"] else None,
+            "avg_lookup_ms": s["lookup_seconds"] / s["lookups"] * 1000 if s["lookups"] else None,
+            "avg_planner_ms": s["planner_seconds"] / s["planner_calls"] * 1000 if s["planner_calls"] else None,
+            "evicted": s["evicted"],
+            "trusted": trusted,
+        }
+
+
+def get_intent_router(context):
+    """Returns the session's IntentRouter, creating it (and its on-exit save) on first use."""
+    router = context.get("intent_router")
+    if router is None:
+        import atexit
+        router = context["intent_router"] = IntentRouter(context.get("engine"))
+        atexit.register(router.save)
+    return router
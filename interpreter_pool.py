@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import time
+import codecs
+import threading
+import subprocess
+
+# Imported by every worker before it is handed a script, so scripts skip that cost
+PRELOAD_MODULES = [
+    "json", "re", "math", "random", "time", "datetime", "collections", "itertools",
+    "functools", "pathlib", "typing", "dataclasses", "string", "textwrap", "statistics",
+    "csv", "argparse", "subprocess", "traceback", "runpy",
+]
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MEMORY_MB = 1024
+
+
+def _worker_main():
+    """Entry point of a pooled interpreter.
+
+    Preloads common modules, then blocks until the parent sends one JSON job line
+    on stdin and runs that script as __main__. Workers are single-use so every
+    script gets a clean interpreter; the pool keeps spares warm in the background.
+    """
+    for name in PRELOAD_MODULES:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    import runpy
+    import traceback
+
+    line = sys.stdin.readline()
+    if not line:
+        return 0
+    job = json.loads(line)
+    sys.stdin.close()
+    sys.stdin = open(os.devnull, "r")
+
+    memory_mb = job.get("memory_mb")
+    if memory_mb:
+        try:
+            import resource
+            limit = int(memory_mb) * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass  # Not supported on this platform (e.g. Windows)
+
+    os.chdir(job["cwd"])
+    path = job["path"]
+    sys.argv = [path] + job.get("args", [])
+    sys.path[0] = os.path.dirname(os.path.abspath(path))
+    try:
+        runpy.run_path(path, run_name="__main__")
+    except SystemExit as e:
+        code = e.code
+        if code is None:
+            return 0
+        if isinstance(code, int):
+            return code
+        print(code, file=sys.stderr)
+        return 1
+    except MemoryError:
+        print(f"MemoryError: script exceeded the {memory_mb} MB limit", file=sys.stderr)
+        return 1
+    except BaseException:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+class InterpreterPool:
+    """Keeps pre-spawned Python interpreters warm for running generated scripts.
+
+    Scripts run with live stdout/stderr streaming, a wall-clock timeout and (on
+    POSIX) an address-space limit. A used worker is discarded and a replacement
+    is spawned in the background so the next run starts warm.
+    """
+
+    def __init__(self, size=1, python=None):
+        self.size = size
+        self.python = python or sys.executable
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _spawn(self):
+        env = dict(os.environ)
+        env["PYTHONUNBUFFERED"] = "1"
+        env.setdefault("PYTHONIOENCODING", "utf-8")
+        return subprocess.Popen(
+            [self.python, "-u", os.path.abspath(__file__), "--worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+            env=env,
+        )
+
+    def warm(self):
+        """Tops the pool up to `size` idle workers in a background thread."""
+        def fill():
+            while not self._closed:
+                with self._lock:
+                    self._idle = [p for p in self._idle if p.poll() is None]
+                    if len(self._idle) >= self.size:
+                        return
+                proc = self._spawn()
+                with self._lock:
+                    if self._closed:
+                        proc.kill()
+                        return
+                    self._idle.append(proc)
+        threading.Thread(target=fill, daemon=True).start()
+
+    def _take(self):
+        with self._lock:
+            while self._idle:
+                proc = self._idle.pop(0)
+                if proc.poll() is None:
+                    return proc
+        return self._spawn()  # Pool was empty: fall back to a cold start
+
+    def run(self, path, timeout=DEFAULT_TIMEOUT, memory_mb=DEFAULT_MEMORY_MB, args=None, on_stdout=None, on_stderr=None):
+        """Runs a script in a pooled interpreter and returns a result dict.
+
+        on_stdout/on_stderr receive decoded text as soon as the script writes it.
+        Result keys: returncode, stdout, stderr, timed_out, interrupted, elapsed.
+        """
+        proc = self._take()
+        self.warm()
+        start = time.perf_counter()
+        job = {"path": os.path.abspath(path), "cwd": os.getcwd(), "memory_mb": memory_mb, "args": args or []}
+        collected = {"stdout": [], "stderr": []}
+
+        def pump(stream, name, callback):
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            while True:
+                chunk = stream.read(4096)
+                if not chunk:
+                    break
+                text = decoder.decode(chunk)
+                if text:
+                    collected[name].append(text)
+                    if callback:
+                        callback(text)
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                collected[name].append(tail)
+                if callback:
+                    callback(tail)
+
+        readers = [
+            threading.Thread(target=pump, args=(proc.stdout, "stdout", on_stdout), daemon=True),
+            threading.Thread(target=pump, args=(proc.stderr, "stderr", on_stderr), daemon=True),
+        ]
+        for t in readers:
+            t.start()
+
+        timed_out = interrupted = False
+        try:
+            proc.stdin.write((json.dumps(job) + "\n").encode("utf-8"))
+            proc.stdin.close()
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            proc.kill()
+        except KeyboardInterrupt:
+            interrupted = True
+            proc.kill()
+        except OSError:
+            pass  # Worker died before taking the job; its stderr says why
+        proc.wait()
+        for t in readers:
+            t.join(timeout=1.0)
+
+        return {
+            "returncode": proc.returncode,
+            "stdout": "".join(collected["stdout"]),
+            "stderr": "".join(collected["stderr"]),
+            "timed_out": timed_out,
+            "interrupted": interrupted,
+            "elapsed": time.perf_counter() - start,
+        }
+
+    def shutdown(self):
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for proc in idle:
+            try:
+                proc.kill()
+                proc.wait(timeout=1.0)
+            except Exception:
+                pass
+
+
+if __name__ == "__main__" and "--worker" in sys.argv:
+    sys.exit(_worker_main())
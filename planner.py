@@ -0,0 +1,133 @@
+import re
+import json
+
+# Models whose backend rejected response_format with HTTP 400; they get prompt-only JSON
+_schema_unsupported = set()
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+_BARE_LITERAL_RE = re.compile(r"(?<![\w\"])(None|True|False)(?![\w\"])")
+_UNQUOTED_KEY_RE = re.compile(r"([{,]\s*)([A-Za-z_][A-Za-z0-9_]*)(\s*:)")
+SCHEMA_ERROR_RE = re.compile(r"response_format|json_schema|structured output|grammar", re.I)
+
+
+def intent_descriptions(registry, exclude=None):
+    """Intent name -> description for the planner prompt, built from the registry."""
+    descriptions = {
+        "code_edit": "modify or write code in the current open file",
+        "general_question": "answer a question without modifying any files or taking any other actions"
+    }
+    for t in registry.tools:
+        if t.is_slash and t.intent and t.intent != exclude:
+            arg_desc = ""
+            if t.arg_description:
+                arg_desc = f" ({'optional' if t.arg_optional else 'requires'} arg: {t.arg_description})"
+            descriptions[t.intent] = f"{t.description}{arg_desc}"
+    return descriptions
+
+
+def step_schema(intents, tags=None):
+    """JSON schema for one planned action; intent is constrained to the registry's intents."""
+    properties = {
+        "intent": {"type": "string", "enum": list(intents)},
+        "args": {"type": ["string", "null"]},
+    }
+    required = ["intent", "args"]
+    if tags is not None:
+        properties["tags_needed"] = {"type": "array", "items": {"type": "string", "enum": list(tags)}} if tags else {"type": "array", "maxItems": 0}
+        required.append("tags_needed")
+    properties["reasoning"] = {"type": "string"}
+    required.append("reasoning")
+    return {"type": "object", "properties": properties, "required": required, "additionalProperties": False}
+
+
+def plan_schema(intents, steps):
+    """JSON schema for an array of exactly `steps` planned actions."""
+    return {"type": "array", "items": step_schema(intents), "minItems": steps, "maxItems": steps}
+
+
+def response_format(name, schema, model_id=None):
+    """OpenAI-style json_schema response_format, or None when the backend is known not to support it."""
+    if model_id in _schema_unsupported:
+        return None
+    return {"type": "json_schema", "json_schema": {"name": name, "strict": True, "schema": schema}}
+
+
+def schema_rejected(error_body):
+    """True when an error response blames the structured output request itself."""
+    return bool(SCHEMA_ERROR_RE.search(error_body or ""))
+
+
+def mark_schema_unsupported(model_id):
+    _schema_unsupported.add(model_id)
+
+
+def _close_truncated(text):
+    """Appends the closers a cut-off JSON value is missing (and ends an open string)."""
+    stack, in_string, escape = [], False, False
+    for c in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c in "{[":
+            stack.append("}" if c == "{" else "]")
+        elif c in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = text.rstrip().rstrip(",")
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(stack))
+
+
+def _repairs(candidate):
+    """Progressively more aggressive fixes for the usual small-model JSON mistakes."""
+    yield candidate
+    fixed = _TRAILING_COMMA_RE.sub(r"\1", candidate)
+    fixed = _BARE_LITERAL_RE.sub(lambda m: {"None": "null", "True": "true", "False": "false"}[m.group(1)], fixed)
+    fixed = _UNQUOTED_KEY_RE.sub(r'\1"\2"\3', fixed)
+    yield fixed
+    if '"' not in fixed and "'" in fixed:
+        yield fixed.replace("'", '"')
+    yield _close_truncated(fixed)
+
+
+def parse_json(text, kind="object"):
+    """Extracts the first JSON object (or array) from model output, tolerating common mistakes.
+
+    Code fences and surrounding prose are skipped; trailing commas, Python literals,
+    unquoted keys, single quotes and a truncated tail are repaired. Returns None if
+    nothing usable is found.
+    """
+    if not text:
+        return None
+    want = dict if kind == "object" else list
+    open_char = "{" if kind == "object" else "["
+    fenced = _FENCE_RE.findall(text)
+    decoder = json.JSONDecoder()
+    for source in fenced + [text]:
+        start = source.find(open_char)
+        while start != -1:
+            for candidate in _repairs(source[start:]):
+                try:
+                    value, _ = decoder.raw_decode(candidate)
+                except ValueError:
+                    continue
+                if isinstance(value, want):
+                    return value
+            start = source.find(open_char, start + 1)
+    # An array request answered with a single object, or an object wrapped in a list
+    if kind == "array":
+        value = parse_json(text, "object")
+        if isinstance(value, dict):
+            for key in ("steps", "plan", "actions"):
+                if isinstance(value.get(key), list):
+                    return value[key]
+    return None
@@ -0,0 +1,329 @@
+import os
+import re
+import sys
+import time
+import threading
+
+from lococode import context_budget
+from lococode import think_filter
+from lococode import profiling
+from lococode import render
+from lococode.cancellation import esc_cancels
+
+BRACKET_RE = re.compile(r'([()\[\]{}<>])')
+
+
+class TerminalPresenter:
+    """Renders Engine events in the terminal: the streaming wave animation, plan lines and results.
+
+    Pass an instance as on_event. With a cancel token, ESC cancels it while a request
+    is in flight. silent suppresses the streaming display (headless/batch use); the
+    other messages are still printed.
+    """
+
+    def __init__(self, color="\033[92m", silent=False, cancel_token=None):
+        self.color = color
+        self.silent = silent
+        self.cancel_token = cancel_token
+        self._watchers = []
+        self._anim = None
+
+    def __call__(self, name, data):
+        handler = getattr(self, f"on_{name}", None)
+        if handler:
+            handler(**data)
+
+    # ── Requests and streaming ──
+
+    def on_request_start(self, silent=False):
+        if self.cancel_token is not None:
+            watcher = esc_cancels(self.cancel_token)
+            watcher.__enter__()
+            self._watchers.append(watcher)
+
+    def on_request_end(self):
+        if self._watchers:
+            self._watchers.pop().__exit__(None, None, None)
+
+    def on_stream_start(self, think, silent=False, call_site=None):
+        if silent or self.silent:
+            return
+        if render.plain_output():
+            self._anim = _PlainStream(think)
+        else:
+            self._anim = _StreamAnimation(think, self.color)
+        self._anim.start()
+
+    def on_delta(self, think):
+        if self._anim:
+            self._anim.update()
+
+    def on_stream_end(self, completion, silent=False, started=True, think=None):
+        if self._anim:
+            self._anim.finish(think)
+            self._anim = None
+        if completion.cancelled:
+            print("\n\033[1;33m[Cancelled]\033[0m")
+
+    def on_reprompt(self, reasoning_tokens):
+        print(f"\033[90m(Reasoning budget exceeded after {reasoning_tokens} tokens; asking for the answer directly)\033[0m")
+
+    def on_malformed(self, count):
+        print(f"\033[33m[Skipped {count} malformed stream event(s)]\033[0m")
+
+    def on_truncated(self, max_tokens, call_site):
+        print(f"\033[33m[Output truncated at {max_tokens} tokens ({call_site or 'unknown call site'})]\033[0m")
+
+    # ── Edits ──
+
+    def on_planning(self):
+        print(f"\033[90mPlanning...\033[0m", end="", flush=True)
+
+    def on_plan(self, plan):
+        print(f"{'' if plan.preplanned else chr(13)}\033[90mPlan: {plan.intent}", end="")
+        if plan.tags_needed:
+            print(f" | Tags: {', '.join(plan.tags_needed)}", end="")
+        print(f"\033[0m")
+
+    def on_routed(self, route):
+        print(f"\033[90m(Intent from {route.support} similar past instruction(s), similarity {route.similarity:.2f}; planner skipped)\033[0m")
+
+    def on_research_report(self, report):
+        print(f"\033[90m{context_budget.format_report(report)}\033[0m")
+
+    def on_generating(self, call_site=None, model=None):
+        print(f"\033[92mProcessing...\033[0m")
+
+    def on_candidates_start(self, count, model=None):
+        print(f"\033[90mGenerating {count} candidates in parallel...\033[0m")
+
+    def on_candidate(self, candidate):
+        print(f"\033[90m  #{candidate.index + 1} (temperature {candidate.temperature}): {candidate.describe()}\033[0m")
+
+    def on_candidate_chosen(self, candidate, count):
+        print(f"\033[36mUsing candidate #{candidate.index + 1} of {count}.\033[0m")
+
+    def on_block_failed(self, file, search=None, reason=None):
+        print(f"\033[31mError: {reason or f'Search block not found in {file}. Check indentation/content.'}\033[0m")
+
+    def on_applied(self, file, count, full_file=False):
+        if full_file:
+            print(f"\033[32mUpdated {file} (full file fallback).\033[0m")
+        else:
+            print(f"\033[32mApplied {count} change(s) to {file}.\033[0m")
+
+    def on_notice(self, level, message):
+        if level == "error":
+            print(f"\033[31mError: {message}\033[0m")
+        elif level == "info":
+            print(f"\033[90m({message})\033[0m")
+        else:
+            print(f"\033[33m{message}\033[0m")
+
+
+class _PlainStream:
+    """Writes the answer as it arrives with no cursor movement or colors (pipes, logs, dumb terminals)."""
+
+    def __init__(self, think):
+        self.think = think
+        self.show_reasoning = think_filter.settings["display"] == "dim"
+        self.reasoning_written = 0
+        self.visible_written = 0
+
+    def start(self):
+        pass
+
+    def update(self):
+        think = self.think
+        out = []
+        if self.show_reasoning and len(think.reasoning) > self.reasoning_written and not self.visible_written:
+            out.extend(think.reasoning[self.reasoning_written:])
+            self.reasoning_written = len(think.reasoning)
+        if len(think.visible) > self.visible_written:
+            if not self.visible_written:
+                if self.reasoning_written:
+                    out.append("\n")
+                elif think.reasoning:
+                    out.append(f"(thought for {think.reasoning_deltas} tokens)\n")
+                out.append("Assistant: ")
+            out.extend(think.visible[self.visible_written:])
+            self.visible_written = len(think.visible)
+        if out:
+            sys.stdout.write("".join(out))
+            sys.stdout.flush()
+
+    def finish(self, think=None):
+        self.think = think or self.think
+        self.update()  # Text held back while it looked like a partial tag
+        if not self.visible_written and self.think.reasoning and not self.reasoning_written:
+            sys.stdout.write(f"(thought for {self.think.reasoning_deltas} tokens)")
+        sys.stdout.write("\n")
+        sys.stdout.flush()
+
+
+class _StreamAnimation:
+    """Redraws the streamed answer in place with a travelling highlight wave."""
+
+    def __init__(self, think, color):
+        self.think = think
+        self.color = color
+        self.show_reasoning = think_filter.settings["display"] == "dim"
+        self.is_generating = True
+        self.wave_pos = 0.0
+        self.wave_dir = 1
+        self.last_time = time.time()
+        self.content_key = None
+        self.display_text = ""
+        self.text_color = color
+        self.thread = None
+        self.sampler = None
+        self.renderer = render.LineRenderer()
+        self.wake = threading.Event()
+
+    def start(self):
+        print("\033[?25l", end="") # Hide cursor
+        self.sampler = profiling.profiler.thread("animation")
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        if self.sampler:
+            self.sampler.start()
+        try:
+            self._animate()
+        finally:
+            if self.sampler:
+                self.sampler.stop()
+
+    def update(self):
+        self.wake.set()
+
+    def _animate(self):
+        think = self.think
+        policy = self.renderer.policy
+        while self.is_generating:
+            frame_start = time.perf_counter()
+            content_key = (len(think.visible), len(think.reasoning), think.in_think)
+            changed = content_key != self.content_key
+            if changed:
+                self.content_key = content_key
+                if think.in_think or (think.reasoning and not think.visible):
+                    # Reasoning is shown dimmed (tail only) or collapsed to a counter
+                    self.text_color = "\033[90m"
+                    if self.show_reasoning:
+                        text = think.reasoning_text[-2000:]
+                    else:
+                        text = f"[thinking... {think.reasoning_deltas} tokens]"
+                else:
+                    self.text_color = self.color
+                    text = think.visible_text
+
+                try:
+                    term_width, term_height = os.get_terminal_size()
+                except:
+                    term_width, term_height = 80, 24
+
+                t_w = max(40, term_width - 2)
+                max_lines = max(5, term_height - 5)
+
+                full_str = "Assistant: " + text
+
+                lines = []
+                for paragraph in full_str.split('\n'):
+                    if not paragraph:
+                        lines.append("")
+                    else:
+                        for i in range(0, len(paragraph), t_w):
+                            lines.append(paragraph[i:i+t_w])
+
+                if len(lines) > max_lines:
+                    lines = lines[-max_lines:]
+                    if len(lines[0]) >= 5:
+                        lines[0] = "(...)" + lines[0][5:]
+                    else:
+                        lines[0] = "(...)"
+
+                self.display_text = '\n'.join(lines)
+
+            display_text = self.display_text
+            current_time = time.time()
+            dt = current_time - self.last_time
+            self.last_time = current_time
+            wave_speed = 60.0 # Characters per second
+
+            total_len = len(display_text)
+            if total_len > 0:
+                trip_len = total_len + 15
+                self.wave_pos += self.wave_dir * wave_speed * dt
+
+                if self.wave_pos >= trip_len:
+                    self.wave_pos = trip_len
+                    self.wave_dir = -1
+                elif self.wave_pos <= 0:
+                    self.wave_pos = 0
+                    self.wave_dir = 1
+                wave_pos_int = int(self.wave_pos)
+            else:
+                wave_pos_int = 0
+
+            # Optimized coloring: Only color the area near the wave
+            colored_parts = []
+            last_color = None
+
+            # Define color zones
+            # 0: yellow (dist < 2), 1: dark yellow (dist < 5), 2: brackets, 3: default
+            for i, char in enumerate(display_text):
+                if char == '\n':
+                    colored_parts.append(char)
+                    last_color = None
+                    continue
+
+                dist = abs(i - wave_pos_int)
+                current_color = None
+
+                if dist < 2:
+                    current_color = "\033[93m"
+                elif dist < 5:
+                    current_color = "\033[33m"
+                elif char in "()[]{}<>":
+                    current_color = "\033[36m"
+                else:
+                    current_color = self.text_color
+
+                if current_color != last_color:
+                    colored_parts.append(current_color)
+                    last_color = current_color
+                colored_parts.append(char)
+
+            colored_text = "".join(colored_parts) + "\033[0m"
+
+            # Only the lines that differ from the last frame are rewritten
+            if self.renderer.draw(colored_text.split("\n")) and self.sampler:
+                self.sampler.frame()
+
+            # Wake early for new output, but never redraw faster than the terminal keeps up with
+            self.wake.wait(policy.interval(changed=False))
+            self.wake.clear()
+            remaining = policy.interval() - (time.perf_counter() - frame_start)
+            if remaining > 0 and self.is_generating:
+                time.sleep(remaining)
+
+    def finish(self, think=None):
+        """Stops the animation and prints the final answer (and reasoning summary) in place."""
+        think = think or self.think
+        self.is_generating = False
+        self.wake.set()
+        if self.thread: self.thread.join()
+
+        self.renderer.clear()
+
+        if think.reasoning:
+            if self.show_reasoning:
+                print(f"\033[90m{think.reasoning_text.strip()}\033[0m")
+            else:
+                print(f"\033[90m(thought for {think.reasoning_deltas} tokens)\033[0m")
+        color = self.color
+        final_text = "Assistant: " + think.visible_text
+        final_text = BRACKET_RE.sub(rf'\033[36m\1{color}', final_text)
+        print(f"{color}{final_text}\033[0m")
+        print("\033[?25h", end="", flush=True) # Show cursor
@@ -0,0 +1,177 @@
+import io
+import os
+import re
+import time
+import pstats
+import cProfile
+import threading
+import contextlib
+import tracemalloc
+
+PROFILE_DIR = os.path.join(".lococode", "profiles")
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 10
+TRACEMALLOC_FRAMES = 5
+
+
+class Profiler:
+    """Per-instruction cProfile + tracemalloc reports.
+
+    Each profiled instruction writes <n>-<slug>.pstats (main thread), an
+    <n>-<slug>-animation.pstats for the streaming animation thread when it ran, and
+    a <n>-<slug>.txt report with the top functions, the animation thread's CPU cost
+    and the largest allocations inside stream_response/apply_edit.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.count = 0
+        self._current = None
+        self._lock = threading.Lock()
+
+    def enable(self, directory=None):
+        self.directory = directory or os.path.join(PROFILE_DIR, time.strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(self.directory, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.enabled = True
+        return self.directory
+
+    def disable(self):
+        self.enabled = False
+        if tracemalloc.is_tracing() and self._current is None:
+            tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def instruction(self, label):
+        """Profiles the main thread while the block runs and writes the reports afterwards."""
+        if not self.enabled or self._current is not None:
+            yield
+            return
+        record = {"label": label, "threads": {}, "memory": [], "wall": time.perf_counter(), "cpu": time.thread_time()}
+        profile = cProfile.Profile()
+        self._current = record
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (a debugger, or an outer cProfile run) owns the hook
+            self._current = None
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            record["wall"] = time.perf_counter() - record["wall"]
+            record["cpu"] = time.thread_time() - record["cpu"]
+            self._current = None
+            try:
+                path = self._write(record, profile)
+                print(f"\033[90m(Profile written to {path})\033[0m")
+            except OSError as e:
+                print(f"\033[31mError writing profile: {e}\033[0m")
+            if not self.enabled and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+    @contextlib.contextmanager
+    def memory(self, phase):
+        """Records allocation growth and peak across a phase of the current instruction."""
+        record = self._current
+        if record is None or not tracemalloc.is_tracing():
+            yield
+            return
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        start_size, _ = tracemalloc.get_traced_memory()
+        try:
+            yield
+        finally:
+            end_size, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+            with self._lock:
+                record["memory"].append({"phase": phase, "growth": end_size - start_size, "peak": peak - start_size,
+                                         "top": [str(stat) for stat in diff[:TOP_ALLOCATIONS]]})
+
+    def thread(self, name):
+        """A ThreadSampler for a helper thread (e.g. the stream animation), or None when not profiling."""
+        if self._current is None:
+            return None
+        return ThreadSampler(self, name)
+
+    def _add_thread(self, name, profile, cpu, frames):
+        """Accumulates a helper thread's run; an instruction that streams several times adds up per name."""
+        record = self._current
+        if record is not None:
+            with self._lock:
+                thread = record["threads"].setdefault(name, {"profiles": [], "cpu": 0.0, "frames": 0, "runs": 0})
+                if profile is not None:
+                    thread["profiles"].append(profile)
+                thread["cpu"] += cpu
+                thread["frames"] += frames
+                thread["runs"] += 1
+
+    def _write(self, record, profile):
+        with self._lock:
+            self.count += 1
+            slug = re.sub(r"[^A-Za-z0-9]+", "-", record["label"]).strip("-")[:40] or "instruction"
+            base = os.path.join(self.directory, f"{self.count:03d}-{slug}")
+        profile.dump_stats(base + ".pstats")
+
+        out = io.StringIO()
+        out.write(f"Instruction: {record['label']}\n")
+        out.write(f"Wall {record['wall']:.3f}s, main thread CPU {record['cpu']:.3f}s\n")
+        for name, thread in record["threads"].items():
+            per_frame = f", {thread['cpu'] / thread['frames'] * 1000:.2f} ms/frame" if thread["frames"] else ""
+            out.write(f"{name} thread: {thread['cpu']:.3f}s CPU over {thread['frames']} frame(s) in {thread['runs']} run(s){per_frame}\n")
+
+        out.write(f"\n── Main thread, top {TOP_FUNCTIONS} by cumulative time ──\n")
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        for name, thread in record["threads"].items():
+            if not thread["profiles"]:
+                continue
+            stats = pstats.Stats(*thread["profiles"], stream=out)
+            stats.dump_stats(f"{base}-{name}.pstats")
+            out.write(f"\n── {name} thread, top {TOP_FUNCTIONS} by internal time ──\n")
+            stats.sort_stats("tottime").print_stats(TOP_FUNCTIONS)
+
+        if record["memory"]:
+            out.write("\n── Allocations (tracemalloc) ──\n")
+            for phase in record["memory"]:
+                out.write(f"{phase['phase']}: {phase['growth'] / 1024:+.1f} KB retained, peak {phase['peak'] / 1024:.1f} KB above start\n")
+                for line in phase["top"]:
+                    out.write(f"  {line}\n")
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+        return base + ".txt"
+
+
+class ThreadSampler:
+    """Profiles one helper thread: call start() and stop() from inside that thread, frame() per redraw."""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.profile = cProfile.Profile()
+        self.frames = 0
+        self.cpu = 0.0
+
+    def start(self):
+        self.cpu = time.thread_time()
+        try:
+            self.profile.enable()
+        except ValueError:
+            self.profile = None  # Python 3.12+ profiles every thread from one hook; keep the CPU figure only
+
+    def frame(self):
+        self.frames += 1
+
+    def stop(self):
+        if self.profile is not None:
+            self.profile.disable()
+        self.profiler._add_thread(self.name, self.profile, time.thread_time() - self.cpu, self.frames)
+
+
+profiler = Profiler()
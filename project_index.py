@@ -0,0 +1,325 @@
+import os
+import re
+import time
+import difflib
+import fnmatch
+import threading
+
+# Never indexed, regardless of .gitignore
+ALWAYS_IGNORED = {".git", ".hg", ".svn", ".lococode", "__pycache__", "node_modules", ".venv", "venv"}
+
+
+def _glob_to_regex(pattern):
+    """Translates a gitignore glob into a regex matched against a '/'-separated relative path."""
+    i, out = 0, []
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "*":
+            if pattern[i:i + 3] == "**/":
+                out.append("(?:.*/)?")
+                i += 3
+                continue
+            if pattern[i:i + 2] == "**":
+                out.append(".*")
+                i += 2
+                continue
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+class IgnoreRules:
+    """Rules from one .gitignore file, applied to paths below the directory that holds it."""
+
+    def __init__(self, base, lines):
+        self.base = base  # Relative dir of the .gitignore ('' for the root)
+        self.rules = []
+        for raw in lines:
+            line = raw.rstrip("\n").rstrip("\r")
+            if not line.strip() or line.startswith("#"):
+                continue
+            line = line.rstrip(" ") if not line.endswith("\\ ") else line
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            line = line.replace("\\!", "!").replace("\\#", "#")
+            dir_only = line.endswith("/")
+            line = line.strip("/") if dir_only else line
+            anchored = "/" in line.lstrip("/") or line.startswith("/")
+            line = line.lstrip("/")
+            regex = _glob_to_regex(line)
+            regex = f"^{regex}(?:/.*)?$" if anchored else f"^(?:.*/)?{regex}(?:/.*)?$"
+            self.rules.append((re.compile(regex), negate, dir_only))
+
+    def match(self, rel_path, is_dir):
+        """Returns True (ignored), False (re-included) or None (no rule matched)."""
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return None
+            rel_path = rel_path[len(self.base) + 1:]
+        result = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                # Directory-only rules still cover files inside matching directories
+                parent = rel_path.rsplit("/", 1)[0] if "/" in rel_path else None
+                if not parent or not regex.match(parent):
+                    continue
+            if regex.match(rel_path):
+                result = not negate
+        return result
+
+
+class _DirState:
+    __slots__ = ("mtime", "files", "subdirs", "rules")
+
+    def __init__(self, mtime, files, subdirs, rules):
+        self.mtime = mtime
+        self.files = files  # name -> (size, mtime)
+        self.subdirs = subdirs
+        self.rules = rules
+
+
+class ProjectIndex:
+    """In-process index of the files in the working tree.
+
+    Built with os.scandir and respecting .gitignore files. Refreshes are
+    incremental: a directory is only rescanned when its own mtime changes, so a
+    refresh of a large, mostly unchanged tree costs one stat per directory.
+    """
+
+    def __init__(self, root=None, max_age=2.0):
+        self.root = os.path.abspath(root or os.getcwd())
+        self.max_age = max_age
+        self._dirs = {}
+        self._files = None  # Cached sorted list of relative paths
+        self._file_set = set()
+        self._basenames = None  # lowercase basename -> [relative paths]
+        self._trigrams = None  # trigram -> set of lowercase basenames, built on first fuzzy lookup
+        self._last_refresh = 0.0
+        self._lock = threading.RLock()
+
+    def _scan_dir(self, rel_dir, abs_dir, mtime):
+        files, subdirs, rules = {}, [], None
+        try:
+            entries = list(os.scandir(abs_dir))
+        except OSError:
+            return _DirState(mtime, files, subdirs, rules)
+        for entry in entries:
+            if entry.name == ".gitignore" and entry.is_file():
+                try:
+                    with open(entry.path, "r", encoding="utf-8", errors="replace") as f:
+                        rules = IgnoreRules(rel_dir, f.readlines())
+                except OSError:
+                    pass
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in ALWAYS_IGNORED:
+                        subdirs.append(entry.name)
+                elif entry.is_file():
+                    st = entry.stat()
+                    files[entry.name] = (st.st_size, st.st_mtime)
+            except OSError:
+                continue
+        return _DirState(mtime, files, subdirs, rules)
+
+    def refresh(self, force=False):
+        """Brings the index up to date with the disk (throttled to once per max_age seconds)."""
+        with self._lock:
+            now = time.time()
+            if not force and self._dirs and now - self._last_refresh < self.max_age:
+                return False
+            changed = False
+            seen = set()
+            stack = [("", self.root, [])]
+            while stack:
+                rel_dir, abs_dir, inherited = stack.pop()
+                try:
+                    mtime = os.stat(abs_dir).st_mtime
+                except OSError:
+                    continue
+                seen.add(rel_dir)
+                state = self._dirs.get(rel_dir)
+                if state is None or state.mtime != mtime:
+                    state = self._scan_dir(rel_dir, abs_dir, mtime)
+                    self._dirs[rel_dir] = state
+                    changed = True
+                rules = inherited + [state.rules] if state.rules else inherited
+                for name in state.subdirs:
+                    sub_rel = f"{rel_dir}/{name}" if rel_dir else name
+                    if not self._is_ignored(sub_rel, True, rules):
+                        stack.append((sub_rel, os.path.join(abs_dir, name), rules))
+            for rel_dir in list(self._dirs):
+                if rel_dir not in seen:
+                    del self._dirs[rel_dir]
+                    changed = True
+            if changed or self._files is None:
+                self._rebuild_views()
+            self._last_refresh = now
+            return changed
+
+    @staticmethod
+    def _is_ignored(rel_path, is_dir, rules):
+        ignored = False
+        for rule_set in rules:
+            result = rule_set.match(rel_path, is_dir)
+            if result is not None:
+                ignored = result
+        return ignored
+
+    def _rebuild_views(self):
+        files = []
+        rules_by_dir = {}
+        for rel_dir in sorted(self._dirs):
+            parent = rel_dir.rsplit("/", 1)[0] if "/" in rel_dir else ("" if rel_dir else None)
+            inherited = rules_by_dir.get(parent, []) if parent is not None else []
+            state = self._dirs[rel_dir]
+            rules = inherited + [state.rules] if state.rules else inherited
+            rules_by_dir[rel_dir] = rules
+            for name in state.files:
+                rel = f"{rel_dir}/{name}" if rel_dir else name
+                if not self._is_ignored(rel, False, rules):
+                    files.append(rel)
+        files.sort()
+        basenames = {}
+        for rel in files:
+            basenames.setdefault(rel.rsplit("/", 1)[-1].lower(), []).append(rel)
+        self._files = files
+        self._file_set = set(files)
+        self._basenames = basenames
+        self._trigrams = None
+
+    def files(self):
+        """All indexed files as sorted '/'-separated paths relative to the root."""
+        self.refresh()
+        return self._files
+
+    def file_info(self, rel_path):
+        """(size, mtime) for an indexed file, or None."""
+        rel_dir, _, name = rel_path.rpartition("/")
+        state = self._dirs.get(rel_dir)
+        return state.files.get(name) if state else None
+
+    def exists(self, name):
+        self.refresh()
+        return self._normalize(name) in self._file_set
+
+    def _normalize(self, name):
+        path = os.path.normpath(os.path.join(self.root, name)) if not os.path.isabs(name) else os.path.normpath(name)
+        return os.path.relpath(path, self.root).replace(os.sep, "/")
+
+    def candidates(self, name, limit=5):
+        """Ranked (path, score) matches for a possibly inexact filename, best first."""
+        files = self.files()
+        rel = self._normalize(name)
+        if rel in self._file_set:
+            return [(rel, 1.0)]
+        query = name.replace("\\", "/").strip().lower()
+        base = query.rsplit("/", 1)[-1]
+
+        scored = {}
+        for path in self._basenames.get(base, []):
+            # Same basename: prefer paths that also end with the given directories
+            scored[path] = 0.95 if path.lower().endswith(query) else 0.9
+        if not scored:
+            for path in files:
+                lower = path.lower()
+                if lower.endswith(query):
+                    scored[path] = 0.85
+                elif base in lower.rsplit("/", 1)[-1]:
+                    scored[path] = 0.6 + 0.2 * len(base) / max(1, len(lower.rsplit("/", 1)[-1]))
+        if not scored:
+            for match in difflib.get_close_matches(base, self._similar_basenames(base), n=limit, cutoff=0.75):
+                ratio = difflib.SequenceMatcher(None, base, match).ratio()
+                for path in self._basenames[match]:
+                    scored[path] = 0.5 * ratio + 0.25
+        ranked = sorted(scored.items(), key=lambda kv: (-kv[1], len(kv[0]), kv[0]))
+        return ranked[:limit]
+
+    def _similar_basenames(self, base, limit=200):
+        """Basenames sharing the most trigrams with base (keeps difflib off the full list)."""
+        if self._trigrams is None:
+            trigrams = {}
+            for name in self._basenames:
+                for i in range(len(name) - 2):
+                    trigrams.setdefault(name[i:i + 3], set()).add(name)
+            self._trigrams = trigrams
+        counts = {}
+        common = max(50, len(self._basenames) // 10)
+        for i in range(len(base) - 2):
+            names = self._trigrams.get(base[i:i + 3], ())
+            if len(names) > common:
+                continue  # Trigrams like '.py' match nearly everything and say nothing
+            for name in names:
+                counts[name] = counts.get(name, 0) + 1
+        return sorted(counts, key=counts.get, reverse=True)[:limit]
+
+    def resolve(self, name, min_score=0.6):
+        """Best unambiguous match for name, or None.
+
+        A match is ambiguous when the runner-up scores the same as the best.
+        """
+        ranked = self.candidates(name)
+        if not ranked or ranked[0][1] < min_score:
+            return None
+        if len(ranked) > 1 and ranked[1][1] == ranked[0][1] and ranked[0][1] < 1.0:
+            return None
+        return ranked[0][0]
+
+    def glob(self, pattern):
+        return [p for p in self.files() if fnmatch.fnmatch(p, pattern) or fnmatch.fnmatch(p.rsplit("/", 1)[-1], pattern)]
+
+
+def _print_notice(message):
+    print(f"\033[90m({message})\033[0m")
+
+
+def validate_file_arg(tool, arg, index, notify=None):
+    """Checks a planner-supplied filename against the index before the tool runs.
+
+    Returns (arg, error). tool.arg_file decides the policy:
+      "exact"    - must name an indexed file exactly; for destructive tools, close
+                   matches are only suggested in the error
+      "existing" - must resolve to an indexed file (fuzzy matches are accepted)
+      "any"      - resolved when it confidently matches, otherwise passed through
+      "new"      - passed through, but refused when it names a directory
+    notify(message) reports a resolved name; it prints when not given.
+    """
+    kind = getattr(tool, "arg_file", None)
+    if not kind or not arg or index is None:
+        return arg, None
+    name = str(arg).strip().strip("'\"`")
+    if kind == "new":
+        if os.path.isdir(os.path.join(index.root, name)):
+            return None, f"'{name}' is a directory."
+        return name, None
+    if kind == "exact":
+        if index.exists(name):
+            return index._normalize(name), None
+        suggestions = ", ".join(p for p, _ in index.candidates(name, limit=3))
+        hint = f" Did you mean: {suggestions}?" if suggestions else ""
+        return None, f"No file named '{name}' in the project.{hint}"
+    resolved = index.resolve(name)
+    if resolved:
+        if resolved != index._normalize(name):
+            (notify or _print_notice)(f"Resolved '{name}' to {resolved}")
+        return resolved, None
+    if kind == "existing":
+        suggestions = ", ".join(p for p, _ in index.candidates(name, limit=3))
+        hint = f" Did you mean: {suggestions}?" if suggestions else ""
+        return None, f"No file matching '{name}' in the project.{hint}"
+    return name, None
@@ -1,50 +1,165 @@
 import os
-import importlib.util
 import re
+import time
+import threading
+import importlib.util
 from lococode.actions.base import BaseTool
+from lococode import tracing
+
+# Seconds between mtime scans of actions/ by maybe_reload()
+RELOAD_CHECK_INTERVAL = 1.0
+
+ACTIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'actions')
+
+
+def format_reload_report(report):
+    """Colored lines describing a reload() report; empty when nothing changed."""
+    lines = []
+    for key, label, color in (("added", "Loaded", "32"), ("changed", "Reloaded", "32"), ("removed", "Removed", "33")):
+        if report.get(key):
+            lines.append(f"\033[{color}m{label} action(s): {', '.join(report[key])}\033[0m")
+    for name, message in report.get("errors", {}).items():
+        lines.append(f"\033[31mError loading actions/{name} (previous version kept): {message}\033[0m")
+    return "\n".join(lines)
+
+
+class _Snapshot:
+    """One consistent set of loaded tools plus the indexes derived from them.
+
+    Never mutated after construction: a reload builds a new snapshot and swaps it
+    in with a single assignment, so a command running on another thread keeps
+    using the tools it started with.
+    """
+
+    def __init__(self, modules, version):
+        self.modules = modules  # filename -> (mtime_ns, size, [tools])
+        self.version = version
+        self.tools = [tool for name in sorted(modules) for tool in modules[name][2]]
+        self.slash = [(re.compile(t.pattern, re.IGNORECASE | re.DOTALL), t) for t in self.tools
+                      if t.is_slash and (t.pattern.startswith('/') or t.pattern.startswith('^/'))]
+        self.intents = {}
+        for t in self.tools:
+            if t.is_slash and t.intent:
+                self.intents.setdefault(t.intent, t)
+        self.tags = [(re.compile(rf"<tool:{re.escape(t.name)}>(.*?)</tool:{re.escape(t.name)}>", re.DOTALL), t)
+                     for t in self.tools if not t.is_slash]
+        self.prompt_segment = ""
+        if self.tags:
+            self.prompt_segment = "\nAvailable Tools (Use these tags in your output to trigger actions):\n"
+            for _, tool in self.tags:
+                self.prompt_segment += f"  <tool:{tool.name}>input</tool:{tool.name}> - {tool.description}\n"
+
 
 class ToolRegistry:
-    def __init__(self):
-        self.tools = []
-        self.load_actions()
+    """Loads the tools in actions/ and dispatches slash commands, intents and tool tags to them.
+
+    reload() re-imports only the action files whose mtime or size changed and
+    swaps the new tools in atomically; a file that fails to import keeps its
+    previous version. version increases with every swap so callers can key
+    caches derived from the tools (e.g. the planner prompt) on it.
+    """
+
+    def __init__(self, actions_dir=ACTIONS_DIR):
+        self.actions_dir = actions_dir
+        self.errors = {}
+        self._failed = {}  # filename -> (mtime_ns, size) of a version that did not import
+        self._state = _Snapshot({}, 0)
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+        with tracing.span("registry_load", cat="startup") as trace:
+            self.load_actions()
+            trace.set(tools=len(self.tools))
+
+    @property
+    def tools(self):
+        return self._state.tools
+
+    @property
+    def version(self):
+        return self._state.version
 
     def load_actions(self):
-        actions_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'actions')
-        if not os.path.exists(actions_dir):
-            return
-            
-        for filename in os.listdir(actions_dir):
-            if filename.endswith('.py') and filename != 'base.py' and filename != '__init__.py':
-                module_name = f"lococode.actions.{filename[:-3]}"
-                spec = importlib.util.spec_from_file_location(module_name, os.path.join(actions_dir, filename))
-                if spec and spec.loader:
-                    module = importlib.util.module_from_spec(spec)
-                    spec.loader.exec_module(module)
-                    
-                    for attr_name in dir(module):
-                        attr = getattr(module, attr_name)
-                        if isinstance(attr, type) and issubclass(attr, BaseTool) and attr is not BaseTool:
-                            self.tools.append(attr())
+        self.reload(force=True)
+
+    def _scan(self):
+        """filename -> (mtime_ns, size) for every action module on disk."""
+        files = {}
+        if not os.path.isdir(self.actions_dir):
+            return files
+        for entry in os.scandir(self.actions_dir):
+            if entry.name.endswith('.py') and entry.name not in ('base.py', '__init__.py') and entry.is_file():
+                st = entry.stat()
+                files[entry.name] = (st.st_mtime_ns, st.st_size)
+        return files
+
+    def _import(self, filename):
+        module_name = f"lococode.actions.{filename[:-3]}"
+        spec = importlib.util.spec_from_file_location(module_name, os.path.join(self.actions_dir, filename))
+        if not spec or not spec.loader:
+            raise ImportError(f"cannot load {filename}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        tools = []
+        for attr_name in dir(module):
+            attr = getattr(module, attr_name)
+            # Only classes defined here, so an imported base class or helper tool is not registered twice
+            if (isinstance(attr, type) and issubclass(attr, BaseTool) and attr is not BaseTool
+                    and attr.__module__ == module_name):
+                tools.append(attr())
+        return tools
+
+    def reload(self, force=False):
+        """Re-imports changed, new and (with force) all action modules and drops deleted ones.
+
+        Returns {"added", "changed", "removed": [filenames], "errors": {filename: message}}.
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            old = self._state.modules
+            files = self._scan()
+            report = {"added": [], "changed": [], "removed": sorted(set(old) - set(files)), "errors": {}}
+            modules = {name: old[name] for name in files if name in old}
+            for name, (mtime_ns, size) in sorted(files.items()):
+                previous = old.get(name)
+                if not force and ((previous and previous[:2] == (mtime_ns, size)) or self._failed.get(name) == (mtime_ns, size)):
+                    continue  # Unchanged, or the same broken version already reported
+                try:
+                    with tracing.span("action_import", cat="startup", module=name):
+                        tools = self._import(name)
+                except Exception as e:
+                    report["errors"][name] = f"{type(e).__name__}: {e}"
+                    self._failed[name] = (mtime_ns, size)
+                    continue  # The previous version (if any) stays loaded
+                self._failed.pop(name, None)
+                modules[name] = (mtime_ns, size, tools)
+                report["changed" if previous else "added"].append(name)
+            for name, message in report["errors"].items():
+                self.errors[name] = message
+            for name in report["added"] + report["changed"] + [n for n in self.errors if n not in files]:
+                self.errors.pop(name, None)
+                self._failed.pop(name, None)
+            if report["added"] or report["changed"] or report["removed"]:
+                self._state = _Snapshot(modules, self._state.version + 1)
+            return report
+
+    def maybe_reload(self):
+        """reload() if RELOAD_CHECK_INTERVAL has passed since the last scan; None otherwise."""
+        if time.monotonic() - self._last_check < RELOAD_CHECK_INTERVAL:
+            return None
+        return self.reload()
 
     def get_system_prompt_segment(self):
-        tag_tools = [t for t in self.tools if not t.is_slash]
-        if not tag_tools:
-            return ""
-        
-        prompt = "\nAvailable Tools (Use these tags in your output to trigger actions):\n"
-        for tool in tag_tools:
-            prompt += f"  <tool:{tool.name}>input</tool:{tool.name}> - {tool.description}\n"
-        return prompt
+        return self._state.prompt_segment
 
     def get_help_text(self):
         slash_tools = [t for t in self.tools if t.is_slash]
         
         # Define categories and map tools to them
         categories = {
-            "File Operations": ["edit", "file_switch", "create_file", "delete_file", "backup", "ls", "read"],
+            "File Operations": ["edit", "file_switch", "create_file", "delete_file", "backup", "undo", "restore", "ls", "read", "index"],
             "Search & Research": ["open_url", "open_current_html", "music"],
             "Execution": ["write_run"],
-            "System": ["loop", "sequence", "pair", "clear_console"]
+            "System": ["loop", "sequence", "pair", "session", "cache", "budget", "think", "edit_format", "candidates", "router", "profile", "reload", "clear_console"]
         }
         
         # Reverse mapping for quick lookup
@@ -97,37 +212,35 @@ class ToolRegistry:
         cleaned_input = user_input.strip()
         if not cleaned_input.startswith('/'):
             return False
-            
-        # Get the command part (e.g., /undo from "/undo file.txt")
-        cmd_part = cleaned_input.split()[0].lower()
-        
-        for tool in self.tools:
-            if tool.is_slash:
-                # Check if the pattern is a simple slash command or a regex
-                pattern = tool.pattern
-                if pattern.startswith('/') or pattern.startswith('^/'):
-                    # Match exact command or regex
-                    match = re.match(pattern, cleaned_input, re.IGNORECASE | re.DOTALL)
-                    if match:
-                        return tool.execute(match, context)
+
+        for regex, tool in self._state.slash:
+            match = regex.match(cleaned_input)
+            if match:
+                with tracing.span(f"/{tool.name}", cat="command"):
+                    return tool.execute(match, context)
         return False
 
     def find_tool_by_intent(self, intent):
         """Find a slash tool that handles the given planner intent."""
-        for tool in self.tools:
-            if tool.is_slash and tool.intent == intent:
-                return tool
-        return None
+        return self._state.intents.get(intent)
 
     def process_model_output(self, output, context):
+        """Runs the <tool:...> tags in a model reply and returns the reply without them.
+
+        When context has a 'deferred_tags' list, the (tool, match) pairs are appended to
+        it instead of run, for replies that may be thrown away (speculative edits).
+        """
         modified_output = output
-        for tool in self.tools:
-            if not tool.is_slash:
-                tag_pattern = rf"<tool:{tool.name}>(.*?)</tool:{tool.name}>"
-                matches = list(re.finditer(tag_pattern, modified_output, re.DOTALL))
-                for match in reversed(matches):
-                    tool.execute(match, context)
-                    modified_output = modified_output[:match.start()] + modified_output[match.end():]
+        deferred = context.get("deferred_tags")
+        for regex, tool in self._state.tags:
+            matches = list(regex.finditer(modified_output))
+            for match in reversed(matches):
+                if deferred is not None:
+                    deferred.append((tool, match))
+                else:
+                    with tracing.span(f"tool:{tool.name}", cat="tool"):
+                        tool.execute(match, context)
+                modified_output = modified_output[:match.start()] + modified_output[match.end():]
 
         # Strip any remaining <tool:...> tags the LLM produced that don't match a registered tool
         modified_output = re.sub(r"</?tool:[^>]*>", "", modified_output)
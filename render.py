@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+
+# "auto" animates on a terminal and streams plain text otherwise; "animated" and "plain" force a mode
+settings = {"mode": "auto"}
+
+MIN_INTERVAL = 1 / 30    # Fastest redraw, seconds
+MAX_INTERVAL = 0.25      # Slowest redraw while output is arriving
+IDLE_INTERVAL = 0.2      # Redraw rate while nothing new has arrived (the wave keeps moving)
+COST_FACTOR = 4          # Keep terminal writes under ~1/COST_FACTOR of the wall time
+COST_SMOOTHING = 0.3     # EWMA weight of the newest write-cost sample
+
+
+def plain_output(stream=None):
+    """True when streamed text should be written as plain deltas with no cursor movement."""
+    mode = settings["mode"]
+    if mode != "auto":
+        return mode == "plain"
+    stream = stream or sys.stdout
+    try:
+        if not stream.isatty():
+            return True
+    except (AttributeError, ValueError):
+        return True
+    return os.environ.get("TERM") == "dumb"
+
+
+class FramePolicy:
+    """Decides when the next frame is due.
+
+    New output is drawn as soon as it arrives, but never faster than the measured
+    cost of a frame allows: over SSH/tmux a flush can take milliseconds, and
+    redrawing at a fixed 20-25 fps then saturates the link. Without new output
+    the animation drops to IDLE_INTERVAL.
+    """
+
+    def __init__(self, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, idle_interval=IDLE_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_interval = idle_interval
+        self.write_cost = 0.0
+        self.frames = 0
+        self.skipped = 0
+        self.bytes = 0
+
+    def record_write(self, seconds, nbytes):
+        self.frames += 1
+        self.bytes += nbytes
+        if self.frames == 1:
+            self.write_cost = seconds
+        else:
+            self.write_cost += COST_SMOOTHING * (seconds - self.write_cost)
+
+    def interval(self, changed=True):
+        """Seconds to wait between frames, given whether the content changed since the last one."""
+        busy = min(self.max_interval, max(self.min_interval, self.write_cost * COST_FACTOR))
+        return busy if changed else max(busy, self.idle_interval)
+
+
+class LineRenderer:
+    """Redraws a block of lines in place, rewriting only from the first changed line down.
+
+    Lines must already fit the terminal width (no soft wrapping), so the cursor
+    arithmetic holds. Each frame's cost is fed to the FramePolicy.
+    """
+
+    def __init__(self, stream=None, policy=None):
+        self.stream = stream or sys.stdout
+        self.policy = policy or FramePolicy()
+        self.lines = []
+
+    def draw(self, lines):
+        """Updates the block to lines. Returns False (and writes nothing) when nothing changed."""
+        first = 0
+        limit = min(len(lines), len(self.lines))
+        while first < limit and lines[first] == self.lines[first]:
+            first += 1
+        if first == len(lines) == len(self.lines):
+            self.policy.skipped += 1
+            return False
+
+        if first >= len(lines):
+            first = max(0, len(lines) - 1)  # Shrunk: rewrite from the new last line so the cursor ends on it
+        if self.lines and first == len(self.lines):
+            # Only new lines were appended: continue below the cursor
+            data = "\n" + "\n".join(lines[first:])
+        else:
+            up = len(self.lines) - 1 - first if self.lines else 0
+            data = (f"\033[{up}A" if up > 0 else "") + "\r\033[J" + "\n".join(lines[first:])
+
+        start = time.perf_counter()
+        self.stream.write(data)
+        self.stream.flush()
+        self.policy.record_write(time.perf_counter() - start, len(data))
+        self.lines = list(lines)
+        return True
+
+    def clear(self):
+        """Erases the block and leaves the cursor where it started."""
+        if self.lines and len(self.lines) > 1:
+            self.stream.write(f"\033[{len(self.lines) - 1}A\r\033[J")
+        else:
+            self.stream.write("\r\033[J")
+        self.lines = []
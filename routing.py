@@ -0,0 +1,144 @@
+import os
+import json
+from lococode.context_budget import estimate_tokens
+
+DEFAULT_MODEL = "google/gemma-3n-e4b"
+CONFIG_FILE = "lococode.json"
+
+CALL_SITES = ("planner", "pair_planner", "sequence_planner", "code_edit", "general_question", "write_run")
+
+# Shorthands accepted in config files and --route
+ROUTE_GROUPS = {
+    "planners": ("planner", "pair_planner", "sequence_planner"),
+    "edits": ("code_edit", "write_run"),
+}
+
+
+class ModelRouter:
+    """Maps each call site to a model, with optional size-based escalation.
+
+    routes: {call_site: model}; call sites without a route use default_model.
+    escalation: rules like {"call_sites": ["code_edit"], "file_tokens": 4000,
+    "instruction_tokens": 500, "model": "qwen/qwen3-14b"}. A rule matches when
+    the target file or the instruction reaches either threshold; the first
+    matching rule wins.
+    """
+
+    def __init__(self, default_model=DEFAULT_MODEL, routes=None, escalation=None):
+        self.default_model = default_model
+        self.routes = {}
+        self.escalation = []
+        for site, model in (routes or {}).items():
+            self.set_route(site, model)
+        for rule in escalation or []:
+            self.add_escalation(rule)
+
+    def set_route(self, site, model):
+        sites = ROUTE_GROUPS.get(site, (site,))
+        for name in sites:
+            if name not in CALL_SITES:
+                raise ValueError(f"Unknown call site '{name}'. Known: {', '.join(CALL_SITES)}")
+            self.routes[name] = model
+
+    def add_escalation(self, rule):
+        if not rule.get("model"):
+            raise ValueError("Escalation rule needs a 'model'.")
+        sites = rule.get("call_sites") or list(ROUTE_GROUPS["edits"])
+        if isinstance(sites, str):
+            sites = [sites]
+        expanded = [name for site in sites for name in ROUTE_GROUPS.get(site, (site,))]
+        for name in expanded:
+            if name not in CALL_SITES:
+                raise ValueError(f"Unknown call site '{name}'. Known: {', '.join(CALL_SITES)}")
+        self.escalation.append({
+            "call_sites": expanded,
+            "file_tokens": rule.get("file_tokens"),
+            "instruction_tokens": rule.get("instruction_tokens"),
+            "model": rule["model"],
+        })
+
+    def model_for(self, call_site, file_text="", instruction=""):
+        """Model to use for call_site; file_text and instruction drive escalation."""
+        for rule in self.escalation:
+            if call_site not in rule["call_sites"]:
+                continue
+            if rule["file_tokens"] is not None and file_text and estimate_tokens(file_text) >= rule["file_tokens"]:
+                return rule["model"]
+            if rule["instruction_tokens"] is not None and instruction and estimate_tokens(instruction) >= rule["instruction_tokens"]:
+                return rule["model"]
+        return self.routes.get(call_site, self.default_model)
+
+    def models(self):
+        """Every model the routing table can pick, default first (for loading at startup)."""
+        ordered = [self.default_model]
+        for model in list(self.routes.values()) + [rule["model"] for rule in self.escalation]:
+            if model not in ordered:
+                ordered.append(model)
+        return ordered
+
+    def describe(self):
+        lines = [f"  {site:<17} {self.routes.get(site, self.default_model)}" for site in CALL_SITES]
+        for rule in self.escalation:
+            limits = []
+            if rule["file_tokens"] is not None:
+                limits.append(f"file >= {rule['file_tokens']} tokens")
+            if rule["instruction_tokens"] is not None:
+                limits.append(f"instruction >= {rule['instruction_tokens']} tokens")
+            lines.append(f"  {'/'.join(rule['call_sites'])} -> {rule['model']} when {' or '.join(limits)}")
+        return "\n".join(lines)
+
+    @classmethod
+    def from_config(cls, path=None, args=None):
+        """Builds the router from lococode.json (if present) overlaid with command-line flags.
+
+        Config format:
+          {"models": {"default": "...", "planners": "...", "code_edit": "..."},
+           "escalation": [{"call_sites": ["code_edit"], "file_tokens": 4000, "model": "..."}]}
+        """
+        config = {}
+        path = path or (getattr(args, "config", None) if args else None) or CONFIG_FILE
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        models = dict(config.get("models") or {})
+        default_model = models.pop("default", DEFAULT_MODEL)
+        if args is not None and getattr(args, "model", None):
+            default_model = args.model
+        router = cls(default_model, routes=models, escalation=config.get("escalation"))
+        if args is None:
+            return router
+        if getattr(args, "planner_model", None):
+            router.set_route("planners", args.planner_model)
+        if getattr(args, "edit_model", None):
+            router.set_route("edits", args.edit_model)
+        for spec in getattr(args, "route", None) or []:
+            site, sep, model = spec.partition("=")
+            if not sep or not model:
+                raise ValueError(f"Bad --route '{spec}', expected CALL_SITE=MODEL.")
+            router.set_route(site.strip(), model.strip())
+        for spec in getattr(args, "escalate", None) or []:
+            model, sep, tokens = spec.rpartition("@")
+            if not sep or not tokens.isdigit():
+                raise ValueError(f"Bad --escalate '{spec}', expected MODEL@FILE_TOKENS.")
+            router.add_escalation({"call_sites": ["edits"], "file_tokens": int(tokens), "model": model})
+        return router
+
+
+def add_arguments(parser):
+    """Routing flags for the command-line parser."""
+    parser.add_argument("--config", help=f"Routing config file (default: {CONFIG_FILE} if present)")
+    parser.add_argument("--model", help=f"Default model for every call site (default: {DEFAULT_MODEL})")
+    parser.add_argument("--planner-model", help="Model for intent, /pair and /sequence planning")
+    parser.add_argument("--edit-model", help="Model for code edits and /write_run")
+    parser.add_argument("--route", action="append", metavar="SITE=MODEL",
+                        help=f"Route one call site ({', '.join(CALL_SITES)}) to a model; repeatable")
+    parser.add_argument("--escalate", action="append", metavar="MODEL@TOKENS",
+                        help="Use MODEL for edits when the target file is at least TOKENS tokens; repeatable")
+
+
+def model_for(context, call_site, file_text="", instruction=""):
+    """Routed model for call_site, falling back to the session's model_id when no router is set up."""
+    router = context.get("model_router")
+    if router is None:
+        return context.get("model_id") or DEFAULT_MODEL
+    return router.model_for(call_site, file_text, instruction)
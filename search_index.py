@@ -0,0 +1,292 @@
+import os
+import re
+import json
+import math
+import threading
+
+INDEX_PATH = os.path.join(".lococode", "search_index.json")
+INDEX_VERSION = 2
+
+CHUNK_LINES = 40
+MAX_FILE_BYTES = 512 * 1024
+INDEXED_EXTENSIONS = {
+    ".py", ".js", ".jsx", ".ts", ".tsx", ".html", ".htm", ".css", ".scss", ".json", ".md", ".txt",
+    ".rs", ".go", ".java", ".kt", ".c", ".h", ".cpp", ".hpp", ".cs", ".rb", ".php", ".sh", ".bat",
+    ".toml", ".yaml", ".yml", ".ini", ".cfg", ".sql", ".lua", ".swift", ".vue", ".svelte",
+}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_SUBWORD_RE = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+_STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "from", "into", "make", "add", "use", "new", "can",
+    "should", "would", "when", "then", "than", "are", "was", "not", "all", "any", "its", "but", "also",
+    "file", "code", "please", "want", "need", "change", "update", "fix",
+}
+
+
+def _terms(text):
+    """Lowercased search terms: whole identifiers plus their camelCase/snake_case parts."""
+    terms = []
+    for ident in _IDENT_RE.findall(text):
+        lower = ident.lower()
+        if len(lower) >= 2:
+            terms.append(lower)
+        parts = [p.lower() for p in _SUBWORD_RE.findall(ident)]
+        if len(parts) > 1:
+            terms.extend(p for p in parts if len(p) >= 2)
+    return terms
+
+
+def _looks_like_identifier(word):
+    """snake_case, camelCase, digits or long words are worth a fuzzy identifier lookup."""
+    if len(word) < 4 or word.lower() in _STOPWORDS:
+        return False
+    return "_" in word or any(c.isdigit() for c in word) or word[1:] != word[1:].lower() or len(word) >= 8
+
+
+def _trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    """Persistent offline code search over the project.
+
+    BM25 over fixed-size line chunks finds relevant code for natural-language
+    instructions; a trigram index over identifiers catches near-miss names
+    (e.g. 'stream_respone'). Files are re-chunked only when their mtime or size
+    changes, and the chunks are saved as JSON under .lococode between sessions
+    (the postings and identifier maps are rebuilt from them on load).
+    """
+
+    def __init__(self, project_index, path=INDEX_PATH):
+        self.project_index = project_index
+        self.path = path
+        self._lock = threading.RLock()
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.files = {}  # rel path -> (mtime, size, [chunk ids])
+        self.chunks = {}  # chunk id -> (rel path, start line, end line, length, {term: tf}, identifiers)
+        self.postings = {}  # term -> {chunk id: tf}
+        self.identifiers = {}  # identifier -> set(chunk ids)
+        self.ident_trigrams = {}  # trigram -> set(identifiers)
+        self.total_length = 0
+        self.next_id = 0
+        self.dirty = False
+
+    def _load(self):
+        """Restores a saved index; anything unreadable or from another version just means a rebuild."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION or data.get("root") != self.project_index.root:
+                return
+            for rel, (mtime, size, chunk_ids) in data["files"].items():
+                self.files[rel] = (float(mtime), int(size), [int(cid) for cid in chunk_ids])
+            for cid, (rel, start, end, length, tfs, idents) in data["chunks"].items():
+                chunk = (str(rel), int(start), int(end), int(length),
+                         {str(term): int(tf) for term, tf in tfs.items()}, {str(ident) for ident in idents})
+                self._index_chunk(int(cid), chunk)
+            self.next_id = int(data["next_id"])
+        except Exception:
+            self._reset()
+
+    def save(self):
+        with self._lock:
+            if not self.dirty:
+                return
+            data = {"version": INDEX_VERSION, "root": self.project_index.root, "next_id": self.next_id,
+                    "files": {rel: [mtime, size, chunk_ids] for rel, (mtime, size, chunk_ids) in self.files.items()},
+                    "chunks": {str(cid): [rel, start, end, length, tfs, sorted(idents)]
+                               for cid, (rel, start, end, length, tfs, idents) in self.chunks.items()}}
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp = self.path + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+                os.replace(tmp, self.path)
+                self.dirty = False
+            except OSError:
+                pass
+
+    def _index_chunk(self, cid, chunk):
+        """Adds a chunk and its postings, identifiers and identifier trigrams."""
+        _, _, _, length, tfs, idents = chunk
+        self.chunks[cid] = chunk
+        self.total_length += length
+        for term, tf in tfs.items():
+            self.postings.setdefault(term, {})[cid] = tf
+        for ident in idents:
+            if ident not in self.identifiers:
+                self.identifiers[ident] = set()
+                for tri in _trigrams(ident):
+                    self.ident_trigrams.setdefault(tri, set()).add(ident)
+            self.identifiers[ident].add(cid)
+
+    def _remove_file(self, rel):
+        _, _, chunk_ids = self.files.pop(rel)
+        for cid in chunk_ids:
+            _, _, _, length, tfs, idents = self.chunks.pop(cid)
+            self.total_length -= length
+            for term in tfs:
+                bucket = self.postings.get(term)
+                if bucket is not None:
+                    bucket.pop(cid, None)
+                    if not bucket:
+                        del self.postings[term]
+            for ident in idents:
+                ids = self.identifiers.get(ident)
+                if ids is None:
+                    continue
+                ids.discard(cid)
+                if not ids:
+                    del self.identifiers[ident]
+                    for tri in _trigrams(ident):
+                        names = self.ident_trigrams.get(tri)
+                        if names is not None:
+                            names.discard(ident)
+                            if not names:
+                                del self.ident_trigrams[tri]
+
+    def _add_file(self, rel, mtime, size):
+        try:
+            with open(os.path.join(self.project_index.root, rel), "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except (OSError, UnicodeDecodeError):
+            self.files[rel] = (mtime, size, [])  # Binary or unreadable: remember it so we don't retry
+            return
+        chunk_ids = []
+        for start in range(0, max(1, len(lines)), CHUNK_LINES):
+            text = "\n".join(lines[start:start + CHUNK_LINES])
+            terms = _terms(text)
+            if not terms:
+                continue
+            cid = self.next_id
+            self.next_id += 1
+            tfs = {}
+            for term in terms:
+                tfs[term] = tfs.get(term, 0) + 1
+            idents = {ident for ident in _IDENT_RE.findall(text) if len(ident) >= 4}
+            self._index_chunk(cid, (rel, start + 1, min(len(lines), start + CHUNK_LINES), len(terms), tfs, idents))
+            chunk_ids.append(cid)
+        self.files[rel] = (mtime, size, chunk_ids)
+
+    def update(self):
+        """Re-indexes files whose mtime or size changed and drops deleted ones. Returns the number of changes."""
+        with self._lock:
+            current = {}
+            root = self.project_index.root
+            for rel in self.project_index.files():
+                if os.path.splitext(rel)[1].lower() not in INDEXED_EXTENSIONS:
+                    continue
+                # Stat files directly: in-place edits change a file's mtime but not its directory's
+                try:
+                    st = os.stat(os.path.join(root, rel))
+                except OSError:
+                    continue
+                if st.st_size <= MAX_FILE_BYTES:
+                    current[rel] = (st.st_size, st.st_mtime)
+            changes = 0
+            for rel in [r for r in self.files if r not in current]:
+                self._remove_file(rel)
+                changes += 1
+            for rel, (size, mtime) in current.items():
+                known = self.files.get(rel)
+                if known and known[0] == mtime and known[1] == size:
+                    continue
+                if known:
+                    self._remove_file(rel)
+                self._add_file(rel, mtime, size)
+                changes += 1
+            if changes:
+                self.dirty = True
+            return changes
+
+    def rebuild(self):
+        with self._lock:
+            self._reset()
+            self.update()
+            self.dirty = True
+            self.save()
+
+    def _similar_identifiers(self, word, min_similarity=0.5, limit=5):
+        grams = _trigrams(word)
+        counts = {}
+        for tri in grams:
+            for ident in self.ident_trigrams.get(tri, ()):
+                counts[ident] = counts.get(ident, 0) + 1
+        scored = []
+        for ident, shared in counts.items():
+            similarity = shared / len(grams | _trigrams(ident))
+            if similarity >= min_similarity:
+                scored.append((similarity, ident))
+        scored.sort(reverse=True)
+        return scored[:limit]
+
+    def search(self, query, k=5, exclude=()):
+        """Top-k chunks for query as (score, rel path, start line, end line), best first."""
+        with self._lock:
+            n = len(self.chunks)
+            if not n:
+                return []
+            avg_len = self.total_length / n
+            scores = {}
+            for term in set(t for t in _terms(query) if t not in _STOPWORDS):
+                bucket = self.postings.get(term)
+                if not bucket:
+                    continue
+                idf = math.log(1 + (n - len(bucket) + 0.5) / (len(bucket) + 0.5))
+                for cid, tf in bucket.items():
+                    length = self.chunks[cid][3]
+                    scores[cid] = scores.get(cid, 0.0) + idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg_len))
+
+            # Identifier-looking words get a fuzzy boost through the trigram index
+            for word in set(_IDENT_RE.findall(query)):
+                if not _looks_like_identifier(word):
+                    continue
+                for similarity, ident in self._similar_identifiers(word):
+                    ids = self.identifiers.get(ident, ())
+                    boost = 2.0 * similarity * math.log(1 + n / (1 + len(ids)))
+                    for cid in ids:
+                        scores[cid] = scores.get(cid, 0.0) + boost
+
+            excluded = {e.replace(os.sep, "/") for e in exclude}
+            ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+            results = []
+            for cid, score in ranked:
+                rel, start, end = self.chunks[cid][:3]
+                if rel in excluded:
+                    continue
+                results.append((score, rel, start, end))
+                if len(results) >= k:
+                    break
+            return results
+
+    def snippets(self, query, k=5, exclude=()):
+        """(key, text) RESEARCH sections for the top-k chunks, read fresh from disk."""
+        sections = []
+        for score, rel, start, end in self.search(query, k=k, exclude=exclude):
+            try:
+                with open(os.path.join(self.project_index.root, rel), "r", encoding="utf-8") as f:
+                    lines = f.read().splitlines()[start - 1:end]
+            except (OSError, UnicodeDecodeError):
+                continue
+            body = "\n".join(lines)
+            sections.append((f"{rel}:{start}-{end}", f"Snippet from {rel} (lines {start}-{end}):\n```\n{body}\n```"))
+        return sections
+
+
+def get_search_index(context):
+    """Returns the session's SearchIndex, creating it (and its on-exit save) on first use."""
+    index = context.get("search_index")
+    if index is None and context.get("project_index") is not None:
+        import atexit
+        index = context["search_index"] = SearchIndex(context["project_index"])
+        atexit.register(index.save)
+    return index
@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import threading
+
+from lococode import tracing
+
+SNAPSHOT_DIR = os.path.join(".lococode", "snapshots")
+
+# Retention: versions older than MAX_AGE_DAYS go first, then the oldest versions until
+# the compressed blobs fit in MAX_BYTES. The newest version of each file is always kept.
+MAX_BYTES = 128 * 1024 * 1024
+MAX_AGE_DAYS = 30
+MAX_VERSIONS_PER_FILE = 200
+PRUNE_EVERY = 50  # Snapshots between automatic prunes
+
+
+class SnapshotStore:
+    """Content-addressed, zlib-compressed snapshots of project files.
+
+    Blobs live under objects/ keyed by the SHA-256 of the content, so an unchanged
+    file costs nothing to snapshot again; each file has an append-only JSONL version
+    log under logs/. Retention evicts by age, per-file count and total size, then
+    drops blobs no log references.
+    """
+
+    def __init__(self, root=None, path=SNAPSHOT_DIR, max_bytes=MAX_BYTES, max_age_days=MAX_AGE_DAYS,
+                 max_versions=MAX_VERSIONS_PER_FILE):
+        self.root = os.path.abspath(root or os.getcwd())
+        self.path = path if os.path.isabs(path) else os.path.join(self.root, path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.max_versions = max_versions
+        self._lock = threading.RLock()
+        self._since_prune = 0
+
+    # ── Storage ──
+
+    def _rel(self, file_path):
+        return os.path.relpath(os.path.abspath(file_path), self.root).replace(os.sep, "/")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.path, "objects", digest[:2], digest[2:])
+
+    def _log_path(self, rel):
+        return os.path.join(self.path, "logs", hashlib.sha256(rel.encode("utf-8")).hexdigest()[:20] + ".jsonl")
+
+    def _write_blob(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(digest)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp = f"{blob_path}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(zlib.compress(data, 6))
+            os.replace(tmp, blob_path)
+        return digest
+
+    def read(self, digest):
+        """Content of a stored blob as bytes."""
+        with open(self._blob_path(digest), "rb") as f:
+            return zlib.decompress(f.read())
+
+    def _read_log(self, rel):
+        versions = []
+        try:
+            with open(self._log_path(rel), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        versions.append(json.loads(line))
+                    except ValueError:
+                        continue  # A torn last line from a crash
+        except OSError:
+            pass
+        return versions
+
+    def _append_log(self, rel, entry):
+        log_path = self._log_path(rel)
+        os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def _rewrite_log(self, rel, versions):
+        log_path = self._log_path(rel)
+        if not versions:
+            try:
+                os.remove(log_path)
+            except OSError:
+                pass
+            return
+        tmp = log_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for entry in versions:
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp, log_path)
+
+    # ── Snapshots ──
+
+    def snapshot(self, file_path, reason="edit", **extra):
+        """Records the file's current content. Returns the version entry, or None if the
+        file does not exist or matches the latest version already."""
+        try:
+            with open(file_path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        rel = self._rel(file_path)
+        with self._lock:
+            versions = self._read_log(rel)
+            digest = hashlib.sha256(data).hexdigest()
+            if versions and versions[-1]["hash"] == digest and not extra:
+                return None
+            self._write_blob(data)
+            entry = {"path": rel, "hash": digest, "size": len(data), "time": time.time(), "reason": reason}
+            entry.update(extra)
+            self._append_log(rel, entry)
+            self._since_prune += 1
+            if self._since_prune >= PRUNE_EVERY:
+                self.prune()
+            return entry
+
+    def history(self, file_path):
+        """Versions of a file, oldest first."""
+        with self._lock:
+            return self._read_log(self._rel(file_path))
+
+    def _current_hash(self, file_path):
+        try:
+            with open(file_path, "rb") as f:
+                return hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return None
+
+    def _write_file(self, file_path, data):
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(data)
+
+    def find(self, file_path, ref):
+        """Version index for ref: a 1-based position in history() or a hash prefix. None if absent."""
+        versions = self.history(file_path)
+        ref = str(ref).strip()
+        if ref.isdigit() and 1 <= int(ref) <= len(versions) and len(ref) < 4:
+            return int(ref) - 1
+        matches = [i for i, v in enumerate(versions) if v["hash"].startswith(ref.lower())]
+        return matches[-1] if matches and len(ref) >= 4 else None
+
+    def restore(self, file_path, index):
+        """Writes version `index` back to the file, snapshotting the current content first. Returns the entry."""
+        with self._lock:
+            versions = self.history(file_path)
+            entry = versions[index]
+            self.snapshot(file_path, reason="restore")
+            self._write_file(file_path, self.read(entry["hash"]))
+            return entry
+
+    def undo(self, file_path):
+        """Steps the file back to the previous differing version.
+
+        Repeated undos keep walking back: each undo logs the content it replaced with
+        a pointer to the version it restored, and the next undo continues from there.
+        Returns the restored entry, or None when there is nothing to undo.
+        """
+        with self._lock:
+            versions = self.history(file_path)
+            current = self._current_hash(file_path)
+            start = len(versions) - 1
+            if versions and versions[-1].get("reason") == "undo":
+                start = versions[-1]["restored"] - 1
+            for i in range(start, -1, -1):
+                entry = versions[i]
+                if entry.get("reason") == "undo" or entry["hash"] == current:
+                    continue
+                if current is not None:
+                    self.snapshot(file_path, reason="undo", restored=i)
+                self._write_file(file_path, self.read(entry["hash"]))
+                return entry
+            return None
+
+    # ── Retention ──
+
+    def _all_logs(self):
+        logs_dir = os.path.join(self.path, "logs")
+        result = {}
+        if not os.path.isdir(logs_dir):
+            return result
+        for entry in os.scandir(logs_dir):
+            if not entry.name.endswith(".jsonl"):
+                continue
+            versions = []
+            with open(entry.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        versions.append(json.loads(line))
+                    except ValueError:
+                        continue
+            if versions:
+                result[versions[0]["path"]] = versions
+        return result
+
+    def _blobs(self):
+        objects = os.path.join(self.path, "objects")
+        blobs = {}
+        if not os.path.isdir(objects):
+            return blobs
+        for shard in os.scandir(objects):
+            if shard.is_dir():
+                for blob in os.scandir(shard.path):
+                    if not blob.name.endswith(".tmp"):
+                        blobs[shard.name + blob.name] = blob.stat().st_size
+        return blobs
+
+    def prune(self):
+        """Applies age, per-file and size retention. Returns (versions dropped, bytes freed)."""
+        with self._lock:
+            self._since_prune = 0
+            logs = self._all_logs()
+            original = {rel: list(versions) for rel, versions in logs.items()}
+            cutoff = time.time() - self.max_age
+            dropped = 0
+            for rel, versions in logs.items():
+                # Never drop the newest version; undo pointers are remapped after trimming
+                keep = [v for v in versions[:-1] if v["time"] >= cutoff][-(self.max_versions - 1):] + versions[-1:]
+                if len(keep) != len(versions):
+                    dropped += len(versions) - len(keep)
+                    logs[rel] = keep
+
+            blobs = self._blobs()
+            referenced = {v["hash"] for versions in logs.values() for v in versions}
+            total = sum(size for digest, size in blobs.items() if digest in referenced)
+            if total > self.max_bytes:
+                # Oldest first across all files, always sparing each file's newest version
+                candidates = sorted((v["time"], rel, i) for rel, versions in logs.items() for i, v in enumerate(versions[:-1]))
+                removed = {}
+                refcount = {}
+                for versions in logs.values():
+                    for v in versions:
+                        refcount[v["hash"]] = refcount.get(v["hash"], 0) + 1
+                for _, rel, i in candidates:
+                    if total <= self.max_bytes:
+                        break
+                    digest = logs[rel][i]["hash"]
+                    removed.setdefault(rel, set()).add(i)
+                    refcount[digest] -= 1
+                    if refcount[digest] == 0:
+                        total -= blobs.get(digest, 0)
+                for rel, indexes in removed.items():
+                    logs[rel] = [v for i, v in enumerate(logs[rel]) if i not in indexes]
+                    dropped += len(indexes)
+
+            for rel, versions in logs.items():
+                if len(versions) != len(original[rel]):
+                    self._remap_undo(original[rel], versions)
+                self._rewrite_log(rel, versions)
+
+            referenced = {v["hash"] for versions in logs.values() for v in versions}
+            freed = 0
+            for digest, size in blobs.items():
+                if digest not in referenced:
+                    try:
+                        os.remove(self._blob_path(digest))
+                        freed += size
+                    except OSError:
+                        pass
+            return dropped, freed
+
+    @staticmethod
+    def _remap_undo(before, after):
+        """Rewrites the restored indexes of undo entries in after (a trimmed before) to their new positions.
+
+        When the restored version itself was dropped, the next undo resumes from the
+        nearest earlier version that survived (or finds nothing left to undo).
+        """
+        new_index = {id(v): i for i, v in enumerate(after)}
+        for v in after:
+            if v.get("reason") != "undo":
+                continue
+            old = min(v.get("restored", 0), len(before) - 1)
+            if id(before[old]) in new_index:
+                v["restored"] = new_index[id(before[old])]
+                continue
+            earlier = next((new_index[id(e)] for e in reversed(before[:old]) if id(e) in new_index), None)
+            # undo starts at restored - 1, so point just past the surviving version
+            v["restored"] = 0 if earlier is None else earlier + 1
+
+    def stats(self):
+        with self._lock:
+            logs = self._all_logs()
+            blobs = self._blobs()
+            return {"files": len(logs), "versions": sum(len(v) for v in logs.values()),
+                    "blobs": len(blobs), "bytes": sum(blobs.values()),
+                    "raw_bytes": sum(v["size"] for versions in logs.values() for v in versions)}
+
+
+def get_snapshot_store(context):
+    """Returns the session's SnapshotStore, creating it on first use."""
+    store = context.get("snapshot_store")
+    if store is None:
+        index = context.get("project_index")
+        store = context["snapshot_store"] = SnapshotStore(index.root if index else None)
+    return store
+
+
+def _print_warning(message):
+    print(f"\033[33m{message}\033[0m")
+
+
+def save_backup(context, file_path, reason="edit", notify=None):
+    """Snapshots file_path before it is overwritten or deleted (the context['save_backup'] hook).
+
+    notify(message) reports a failed snapshot; it prints when not given.
+    """
+    try:
+        with tracing.span("snapshot", cat="io", file=file_path, reason=reason):
+            return get_snapshot_store(context).snapshot(file_path, reason=reason)
+    except OSError as e:
+        (notify or _print_warning)(f"Warning: could not snapshot {file_path}: {e}")
+        return None
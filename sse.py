@@ -0,0 +1,175 @@
+import json
+import time
+import codecs
+
+# Bytes requested per read from the HTTP stream. Chunked responses still yield as
+# soon as each HTTP chunk arrives, so this bounds batching without adding latency.
+SSE_READ_SIZE = 64 * 1024
+
+_scanstring = json.decoder.scanstring
+
+
+class SSEDecoder:
+    """Incremental Server-Sent Events decoder for OpenAI-style streaming responses.
+
+    feed() takes raw bytes in chunks of any size (multi-byte UTF-8 characters and
+    CRLF pairs may be split across chunks) and returns the completed events' data
+    payloads. Multi-line 'data:' fields are joined with newlines as the SSE spec
+    requires. parse_delta() pulls the delta content out of a payload, taking a
+    string-scanning fast path for the common chunk shape and counting payloads that
+    fail to parse instead of silently dropping them.
+    """
+
+    def __init__(self):
+        self._utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._buffer = ""
+        self._data_lines = []
+        self.events = 0
+        self.fast_path = 0
+        self.slow_path = 0
+        self.malformed = 0
+        self.bytes = 0
+
+    def feed(self, chunk):
+        self.bytes += len(chunk)
+        text = self._utf8.decode(chunk)
+        if not text:
+            return []
+        buffer = self._buffer + text
+        if "\r" in buffer:
+            # Hold back a trailing CR in case its LF is in the next chunk
+            hold = buffer.endswith("\r")
+            if hold:
+                buffer = buffer[:-1]
+            buffer = buffer.replace("\r\n", "\n").replace("\r", "\n")
+            if hold:
+                buffer += "\r"
+        lines = buffer.split("\n")
+        self._buffer = lines.pop()
+        events = []
+        for line in lines:
+            if not line:
+                if self._data_lines:
+                    events.append("\n".join(self._data_lines))
+                    self._data_lines = []
+                    self.events += 1
+            elif line.startswith("data:"):
+                value = line[5:]
+                self._data_lines.append(value[1:] if value.startswith(" ") else value)
+            # Comments (':') and event/id/retry fields carry nothing we use
+        return events
+
+    def flush(self):
+        """Returns a final event left without a terminating blank line (servers that just close)."""
+        if not self._buffer and not self._data_lines:
+            return []
+        events = self.feed(b"\n\n")
+        self.bytes -= 2  # Not part of the stream
+        return events
+
+    def parse_delta(self, data):
+        """Parses one chunk payload into (content, finish_reason, usage, extra).
+
+        extra is the parsed choice delta when the slow path ran (None on the fast
+        path), so callers can read fields beyond 'content'. Returns None for a
+        malformed payload.
+        """
+        if ('"finish_reason":null' in data and '"usage":{' not in data
+                and '"reasoning' not in data and data.count('"content":') == 1):
+            idx = data.index('"content":') + 10
+            while data[idx] == " ":
+                idx += 1
+            if data.startswith('"', idx):
+                try:
+                    content, _ = _scanstring(data, idx + 1)
+                    self.fast_path += 1
+                    return content, None, None, None
+                except ValueError:
+                    pass
+            elif data.startswith("null", idx):
+                self.fast_path += 1
+                return "", None, None, None
+
+        self.slow_path += 1
+        try:
+            chunk = json.loads(data)
+            choices = chunk.get("choices") or []
+            choice = choices[0] if choices else {}
+            delta = choice.get("delta") or {}
+            return delta.get("content") or "", choice.get("finish_reason"), chunk.get("usage") or None, delta
+        except (ValueError, AttributeError, TypeError, IndexError):
+            self.malformed += 1
+            return None
+
+
+def _synthetic_stream(tokens, chunk_events):
+    """Builds an SSE byte stream of `tokens` delta events, grouped `chunk_events` per network chunk."""
+    words = ["def", " stream", "_response", "(", "model", "_id", ",", " messages", "):\n", "    ", "return", " \"ok\\n\"", " ñ", " 日本"]
+    events = []
+    for i in range(tokens):
+        payload = {
+            "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": 0, "model": "bench",
+            "choices": [{"index": 0, "delta": {"content": words[i % len(words)]}, "finish_reason": None}],
+        }
+        events.append(f"data: {json.dumps(payload, separators=(',', ':'))}\n\n".encode("utf-8"))
+    events.append(b'data: {"choices":[{"index":0,"delta":{},"finish_reason":"stop"}]}\n\ndata: [DONE]\n\n')
+    chunks = [b"".join(events[i:i + chunk_events]) for i in range(0, len(events), chunk_events)]
+    return chunks
+
+
+def _legacy_parse(chunks):
+    """The previous hot path: requests-style iter_lines + json.loads per line."""
+    out = []
+    pending = None
+    for chunk in chunks:
+        if pending is not None:
+            chunk = pending + chunk
+        lines = chunk.splitlines()
+        pending = lines.pop() if lines and chunk and lines[-1] and lines[-1][-1] == chunk[-1] else None
+        for line in lines:
+            if line:
+                decoded = line.decode("utf-8")
+                if decoded.startswith("data: "):
+                    data_str = decoded[6:]
+                    if data_str.strip() == "[DONE]":
+                        return out
+                    try:
+                        out.append(json.loads(data_str)["choices"][0].get("delta", {}).get("content", ""))
+                    except Exception:
+                        continue
+    return out
+
+
+def _decoder_parse(chunks):
+    decoder = SSEDecoder()
+    out = []
+    for chunk in chunks:
+        for data in decoder.feed(chunk):
+            if data == "[DONE]":
+                return out
+            parsed = decoder.parse_delta(data)
+            if parsed:
+                out.append(parsed[0])
+    return out
+
+
+def benchmark(tokens=10000, repeat=5):
+    """Client-side parsing cost per `tokens` streamed deltas, legacy path vs SSEDecoder."""
+    print(f"SSE client overhead per {tokens} tokens (best of {repeat}):")
+    for label, chunk_events in (("1 event/chunk", 1), ("16 events/chunk", 16), ("512 events/chunk", 512)):
+        chunks = _synthetic_stream(tokens, chunk_events)
+        results = {}
+        for name, fn in (("legacy", _legacy_parse), ("decoder", _decoder_parse)):
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                content = fn(chunks)
+                best = min(best, time.perf_counter() - start)
+            results[name] = (best, "".join(c or "" for c in content))
+        same = "ok" if results["legacy"][1] == results["decoder"][1] else "MISMATCH"
+        legacy, decoder = results["legacy"][0], results["decoder"][0]
+        print(f"  {label:<17} legacy {legacy * 1000:7.2f} ms | decoder {decoder * 1000:7.2f} ms | {legacy / decoder:4.1f}x  [{same}]")
+
+
+if __name__ == "__main__":
+    benchmark()
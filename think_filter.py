@@ -0,0 +1,88 @@
+OPEN_TAG = "<think>"
+CLOSE_TAG = "</think>"
+
+# "hide" collapses reasoning to a token counter while it streams, "dim" shows it in gray
+# "budget" overrides every call site's reasoning_budget: "default" keeps them, None removes the limit
+settings = {"display": "hide", "budget": "default"}
+
+REPROMPT = "Stop reasoning now. Do not think any further; reply immediately with only the final answer in the requested format."
+
+
+class ThinkFilter:
+    """Splits a streamed response into visible text and <think> reasoning as it arrives.
+
+    Tags may be split across deltas; a possible partial tag at the end of a delta is
+    held back until the next one decides it. Reasoning sent by the server in a
+    separate field (delta.reasoning_content) is added with add_reasoning().
+    """
+
+    def __init__(self):
+        self.in_think = False
+        self.visible = []
+        self.reasoning = []
+        self.reasoning_deltas = 0  # One delta is ~one token on streaming servers
+        self._pending = ""
+
+    def feed(self, text):
+        """Consumes one content delta and returns the newly visible text."""
+        data = self._pending + text
+        self._pending = ""
+        out = []
+        had_reasoning = False
+        while data:
+            tag = CLOSE_TAG if self.in_think else OPEN_TAG
+            idx = data.find(tag)
+            if idx == -1:
+                keep = self._partial_tag_len(data, tag)
+                body, self._pending = (data[:-keep], data[-keep:]) if keep else (data, "")
+                if self.in_think:
+                    if body:
+                        self.reasoning.append(body)
+                        had_reasoning = True
+                else:
+                    out.append(body)
+                break
+            if self.in_think:
+                if idx:
+                    self.reasoning.append(data[:idx])
+                    had_reasoning = True
+            else:
+                out.append(data[:idx])
+            data = data[idx + len(tag):]
+            self.in_think = not self.in_think
+        if had_reasoning:
+            self.reasoning_deltas += 1
+        visible = "".join(out)
+        if visible:
+            self.visible.append(visible)
+        return visible
+
+    def add_reasoning(self, text):
+        if text:
+            self.reasoning.append(text)
+            self.reasoning_deltas += 1
+
+    def finish(self):
+        """Flushes a held-back partial tag (it was ordinary text after all)."""
+        tail, self._pending = self._pending, ""
+        if tail:
+            if self.in_think:
+                self.reasoning.append(tail)
+            else:
+                self.visible.append(tail)
+        return tail if not self.in_think else ""
+
+    @staticmethod
+    def _partial_tag_len(data, tag):
+        for n in range(min(len(tag) - 1, len(data)), 0, -1):
+            if data.endswith(tag[:n]):
+                return n
+        return 0
+
+    @property
+    def visible_text(self):
+        return "".join(self.visible)
+
+    @property
+    def reasoning_text(self):
+        return "".join(self.reasoning)
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import atexit
+import threading
+
+# Events kept in memory before new ones are dropped (a very long session still saves)
+MAX_EVENTS = 500000
+
+
+class _NullSpan:
+    """Returned while tracing is off so instrumented code pays one attribute check."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+    def end(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """A complete ('X') trace event; use as a context manager or call end() explicitly."""
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.tid = threading.get_ident()
+        self.start = tracer.now()
+        self.ended = False
+
+    def set(self, **args):
+        self.args.update(args)
+
+    def end(self, **args):
+        if self.ended:
+            return
+        self.ended = True
+        self.args.update(args)
+        self.tracer.add({"name": self.name, "cat": self.cat, "ph": "X", "ts": self.start,
+                         "dur": max(0.0, self.tracer.now() - self.start), "tid": self.tid, "args": self.args})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.end()
+        return False
+
+
+class Tracer:
+    """Collects Chrome trace events (load the saved JSON in Perfetto or chrome://tracing).
+
+    Spans nest by time on each thread, so a /loop iteration shows its plan,
+    completion, parse/apply and file write underneath it.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.events = []
+        self.dropped = 0
+        self.pid = os.getpid()
+        self._t0 = time.perf_counter()
+        self._threads = set()
+        self._lock = threading.Lock()
+
+    def now(self):
+        """Microseconds since the tracer was created."""
+        return (time.perf_counter() - self._t0) * 1e6
+
+    def add(self, event):
+        event["pid"] = self.pid
+        with self._lock:
+            if len(self.events) >= MAX_EVENTS:
+                self.dropped += 1
+                return
+            tid = event.get("tid")
+            if tid is not None and tid not in self._threads:
+                self._threads.add(tid)
+                name = next((t.name for t in threading.enumerate() if t.ident == tid), str(tid))
+                self.events.append({"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}})
+            self.events.append(event)
+
+    def start(self, path):
+        self.path = path
+        self.enabled = True
+        self.events.append({"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": "lococode"}})
+
+    def save(self, path=None):
+        """Writes the trace file. Returns its path, or None if nothing was traced."""
+        path = path or self.path
+        if not path:
+            return None
+        with self._lock:
+            events = list(self.events)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"dropped_events": self.dropped}}, f)
+        return path
+
+
+tracer = Tracer()
+
+
+def enable(path):
+    """Starts tracing; the file is written at exit (and by save())."""
+    tracer.start(path)
+    atexit.register(save)
+
+
+def enabled():
+    return tracer.enabled
+
+
+def span(name, cat="session", **args):
+    """Context manager timing a phase, or call .end() on it later; a no-op while tracing is off."""
+    if not tracer.enabled:
+        return _NULL_SPAN
+    return Span(tracer, name, cat, args)
+
+
+def instant(name, cat="session", **args):
+    if tracer.enabled:
+        tracer.add({"name": name, "cat": cat, "ph": "i", "s": "t", "ts": tracer.now(),
+                    "tid": threading.get_ident(), "args": args})
+
+
+def save(path=None):
+    if not tracer.enabled:
+        return None
+    try:
+        return tracer.save(path)
+    except OSError as e:
+        print(f"\033[31mError writing trace: {e}\033[0m")
+        return None